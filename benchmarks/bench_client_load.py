@@ -0,0 +1,118 @@
+"""Load test for the synchronous ThumbtackClient.
+
+Runs a number of threads that issue a mix of list and mount/unmount requests through one
+thread-safe ThumbtackClient for a fixed time, and reports request throughput and latency
+percentiles per operation. By default the requests go to an in-process FakeThumbtackServer whose
+latency and error rates can be set; ``--url`` points the load at a real server instead::
+
+    python benchmarks/bench_client_load.py --threads 16 --duration 10 --latency 0.005
+    python benchmarks/bench_client_load.py --in-progress-rate 0.1 --error-rate 0.01
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+
+from thumbtack_client import ThumbtackClient
+from thumbtack_client.FakeThumbtackServer import FakeThumbtackServer
+
+# operation name to the relative weight it is picked with
+MIX = {"list_mounted_images": 6, "list_images": 2, "mount_image": 1, "unmount_image": 1}
+# operations that take an image path; left out of the mix when no images are given
+IMAGE_OPS = ("mount_image", "unmount_image")
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def worker(client, images, deadline, latencies, errors, lock, seed):
+    rng = random.Random(seed)
+    ops = [op for op in MIX if images or op not in IMAGE_OPS]
+    weights = [MIX[op] for op in ops]
+    local_latencies = defaultdict(list)
+    local_errors = defaultdict(int)
+    while time.perf_counter() < deadline:
+        op = rng.choices(ops, weights)[0]
+        args = (rng.choice(images),) if op in IMAGE_OPS else ()
+        start = time.perf_counter()
+        try:
+            getattr(client, op)(*args)
+        except Exception as e:
+            local_errors[(op, type(e).__name__)] += 1
+        local_latencies[op].append(time.perf_counter() - start)
+    with lock:
+        for op, values in local_latencies.items():
+            latencies[op].extend(values)
+        for key, count in local_errors.items():
+            errors[key] += count
+
+
+def run(url, images, threads, duration, **client_kwargs):
+    client = ThumbtackClient(url, thread_safe=True, pool_maxsize=threads, **client_kwargs)
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    pool = [
+        threading.Thread(target=worker, args=(client, images, deadline, latencies, errors, lock, i))
+        for i in range(threads)
+    ]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return latencies, errors, time.perf_counter() - start
+
+
+def report(latencies, errors, elapsed):
+    total = sum(len(v) for v in latencies.values())
+    print(f"{total} requests in {elapsed:.2f}s: {total / elapsed:.0f} requests/s")
+    print(f"{'operation':<22} {'count':>8} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for op in sorted(latencies):
+        values = sorted(latencies[op])
+        print(f"{op:<22} {len(values):>8} {len(values) / elapsed:>9.0f} {percentile(values, 50) * 1000:>9.2f} "
+              f"{percentile(values, 99) * 1000:>9.2f} {values[-1] * 1000:>9.2f}")
+    for (op, name), count in sorted(errors.items()):
+        print(f"errors: {op} {name} x{count}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="a Thumbtack server to load instead of the in-process fake")
+    parser.add_argument("--images", nargs="+", help="image paths to mount and unmount; with --url and no images, only listings are requested")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds to run for")
+    parser.add_argument("--latency", type=float, default=0.0, help="fake server latency, in seconds")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="fake server latency jitter, in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of fake server requests that fail")
+    parser.add_argument("--in-progress-rate", type=float, default=0.0,
+                        help="share of fake server mounts that report a mount attempt in progress")
+    parser.add_argument("--max-retries", type=int, default=0)
+    parser.add_argument("--no-keep-alive", action="store_true")
+    args = parser.parse_args(argv)
+
+    client_kwargs = {"max_retries": args.max_retries, "keep_alive": not args.no_keep_alive}
+    if args.url:
+        latencies, errors, elapsed = run(args.url, args.images or [], args.threads, args.duration, **client_kwargs)
+    else:
+        images = args.images or [f"/images/disk{i:02d}.E01" for i in range(32)]
+        server = FakeThumbtackServer(
+            images=images, latency=args.latency, latency_jitter=args.latency_jitter,
+            error_rate=args.error_rate, in_progress_rate=args.in_progress_rate,
+            record_requests=False, keep_alive=not args.no_keep_alive,
+        )
+        with server:
+            latencies, errors, elapsed = run(server.url, images, args.threads, args.duration, **client_kwargs)
+    report(latencies, errors, elapsed)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""Import-time benchmark for the package's entry points.
+
+Each module is imported in a fresh interpreter several times and the fastest wall time is kept,
+next to the time of a bare interpreter start. Short-lived pool workers that only walk volumes
+should not pay for the HTTP stack; ``--max-ms`` makes the run fail if importing a walk module
+costs more than that on top of interpreter start-up::
+
+    python benchmarks/bench_import.py --max-ms 50
+"""
+import argparse
+import subprocess
+import sys
+import time
+
+MODULES = [
+    "thumbtack_client.ScandirWalker",
+    "thumbtack_client.MountedDiskImage",
+    "thumbtack_client.ParallelWalker",
+    "thumbtack_client.VolumeMapper",
+    "thumbtack_client.AsyncThumbtackClient",
+]
+WALK_MODULES = MODULES[:4]
+
+
+def best_time(statement, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, "-c", statement])
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, help="fail if a walk module adds more than this to start-up")
+    args = parser.parse_args(argv)
+
+    baseline = best_time("pass", args.repeat)
+    print(f"{'interpreter start-up':<44} {baseline * 1000:>8.1f} ms")
+    statements = [(m, f"import {m}") for m in MODULES]
+    statements.append(("ThumbtackClient()", "from thumbtack_client import ThumbtackClient; ThumbtackClient()"))
+    failed = False
+    for name, statement in statements:
+        added = (best_time(statement, args.repeat) - baseline) * 1000
+        print(f"{name:<44} {added:>+8.1f} ms")
+        if args.max_ms is not None and name in WALK_MODULES and added > args.max_ms:
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
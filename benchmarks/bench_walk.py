@@ -0,0 +1,150 @@
+"""Walk-throughput benchmark suite over synthetic volume trees.
+
+Every walk engine is run over every synthetic tree (see synthetic_trees.py) and measured in
+files/sec and peak Python memory. Results can be saved as JSON and compared with a baseline to
+catch regressions in the walk hot path before a release::
+
+    python benchmarks/bench_walk.py --output baseline.json
+    python benchmarks/bench_walk.py --compare baseline.json --threshold 0.2
+
+With ``--compare`` the exit status is 1 if any engine got slower, or used more memory, by more
+than the threshold fraction. ``--path`` benchmarks an existing directory instead.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from synthetic_trees import TREES
+
+from thumbtack_client.MountedDiskImage import MountedDiskImage
+from thumbtack_client.MountedDiskImageVolume import MountedDiskImageVolume
+from thumbtack_client.ParallelWalker import ParallelWalker
+
+
+def _parallel(volume):
+    image = MountedDiskImage({"mountpoint": None, "name": "bench", "volumes": [], "paths": None})
+    image.volumes = [volume]
+    return ParallelWalker(image, workers=8, safe=True)
+
+
+# engine name to (callable returning an iterable of results, whether it skips broken files)
+ENGINES = {
+    "walk": (lambda v: v.walk(), False),
+    "safe_walk": (lambda v: v.safe_walk(), True),
+    "scandir_walk": (lambda v: v.scandir_walk(), False),
+    "safe_scandir_walk": (lambda v: v.safe_scandir_walk(), True),
+    "parallel_safe_walk": (_parallel, True),
+}
+
+
+def make_volume(root):
+    return MountedDiskImageVolume({
+        "fsdescription": None, "fstype": None, "index": 0, "label": None,
+        "mountpoint": root, "offset": 0, "size": 0,
+    })
+
+
+def measure(volume, engine, repeat):
+    walk, _ = ENGINES[engine]
+    best = None
+    count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = sum(1 for _ in walk(volume))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    # memory is measured in a separate run, since tracing allocations slows the walk down
+    tracemalloc.start()
+    for _ in walk(volume):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"files": count, "seconds": best, "files_per_sec": count / best if best else 0.0, "peak_bytes": peak}
+
+
+def run(trees, engines, scale, repeat, path=None):
+    results = []
+    for tree in trees:
+        tmpdir = None
+        root = path
+        if root is None:
+            tmpdir = tempfile.mkdtemp(prefix=f"thumbtack-bench-{tree}-")
+            root = tmpdir
+            TREES[tree](root, scale)
+        try:
+            volume = make_volume(root)
+            counts = {}
+            for engine in engines:
+                result = measure(volume, engine, repeat)
+                result.update(tree=tree, engine=engine)
+                results.append(result)
+                counts.setdefault(ENGINES[engine][1], set()).add(result["files"])
+                print(f"{tree:<14} {engine:<20} {result['files']:>9} {result['seconds']:>9.3f}s "
+                      f"{result['files_per_sec']:>11.0f} files/s {result['peak_bytes'] / 1024:>9.0f} KiB peak")
+            for safe, seen in counts.items():
+                if len(seen) > 1:
+                    print(f"WARNING: {'safe' if safe else 'plain'} engines disagree on {tree}: {sorted(seen)}")
+        finally:
+            if tmpdir is not None:
+                shutil.rmtree(tmpdir)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Returns a line for every result that regressed by more than `threshold` against `baseline`."""
+    previous = {(r["tree"], r["engine"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        old = previous.get((r["tree"], r["engine"]))
+        if old is None:
+            continue
+        if r["files_per_sec"] < old["files_per_sec"] * (1 - threshold):
+            regressions.append(f"{r['tree']}/{r['engine']}: {old['files_per_sec']:.0f} -> {r['files_per_sec']:.0f} files/s")
+        if r["peak_bytes"] > old["peak_bytes"] * (1 + threshold) and r["peak_bytes"] - old["peak_bytes"] > 64 * 1024:
+            regressions.append(f"{r['tree']}/{r['engine']}: {old['peak_bytes']} -> {r['peak_bytes']} peak bytes")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", help="existing directory to walk instead of the synthetic trees")
+    parser.add_argument("--trees", nargs="+", choices=sorted(TREES), default=sorted(TREES))
+    parser.add_argument("--engines", nargs="+", choices=list(ENGINES), default=list(ENGINES))
+    parser.add_argument("--scale", type=int, default=1, help="multiplies the size of every synthetic tree")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per engine; the fastest is kept")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="a JSON results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed regression, as a fraction")
+    args = parser.parse_args(argv)
+
+    trees = ["path"] if args.path else args.trees
+    results = run(trees, args.engines, args.scale, args.repeat, path=args.path)
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "scale": args.scale,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
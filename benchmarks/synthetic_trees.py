@@ -0,0 +1,90 @@
+"""Builders for synthetic mounted-volume trees used by the walk benchmarks.
+
+Each builder takes a root directory and a scale factor and returns nothing; the shapes mimic
+what shows up on real mounted images:
+
+deep
+    long chains of nested directories
+wide
+    many directories with a few files each
+tiny_files
+    many directories full of one-byte files
+huge_dir
+    a single directory with a very large number of entries
+broken_links
+    a tree where a share of the entries are broken symlinks, like NTFS reparse points
+special_files
+    a tree mixing regular files with FIFOs and unreadable files
+"""
+import os
+
+
+def _touch(path, data=b"x"):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def deep(root, scale):
+    for chain in range(10 * scale):
+        dirpath = os.path.join(root, f"chain{chain:04d}")
+        for depth in range(40):
+            dirpath = os.path.join(dirpath, f"level{depth:02d}")
+            os.makedirs(dirpath, exist_ok=True)
+            _touch(os.path.join(dirpath, "file.dat"))
+
+
+def wide(root, scale):
+    for d in range(1000 * scale):
+        dirpath = os.path.join(root, f"group{d // 100:03d}", f"dir{d:06d}")
+        os.makedirs(dirpath)
+        for f in range(5):
+            _touch(os.path.join(dirpath, f"file{f}.dat"), b"x" * 4096)
+
+
+def tiny_files(root, scale):
+    for d in range(100 * scale):
+        dirpath = os.path.join(root, f"dir{d:05d}")
+        os.makedirs(dirpath)
+        for f in range(200):
+            _touch(os.path.join(dirpath, f"f{f:04d}"))
+
+
+def huge_dir(root, scale):
+    dirpath = os.path.join(root, "WinSxS")
+    os.makedirs(dirpath)
+    for f in range(20000 * scale):
+        _touch(os.path.join(dirpath, f"amd64_component_{f:08d}.manifest"))
+
+
+def broken_links(root, scale):
+    for d in range(100 * scale):
+        dirpath = os.path.join(root, f"dir{d:05d}")
+        os.makedirs(dirpath)
+        for f in range(50):
+            _touch(os.path.join(dirpath, f"f{f:04d}"))
+        for f in range(50):
+            os.symlink(os.path.join(root, "missing", str(f)), os.path.join(dirpath, f"link{f:04d}"))
+
+
+def special_files(root, scale):
+    for d in range(100 * scale):
+        dirpath = os.path.join(root, f"dir{d:05d}")
+        os.makedirs(dirpath)
+        for f in range(80):
+            _touch(os.path.join(dirpath, f"f{f:04d}"))
+        for f in range(10):
+            os.mkfifo(os.path.join(dirpath, f"fifo{f:04d}"))
+        for f in range(10):
+            path = os.path.join(dirpath, f"locked{f:04d}")
+            _touch(path)
+            os.chmod(path, 0)
+
+
+TREES = {
+    "deep": deep,
+    "wide": wide,
+    "tiny_files": tiny_files,
+    "huge_dir": huge_dir,
+    "broken_links": broken_links,
+    "special_files": special_files,
+}
@@ -15,11 +15,15 @@ VERSION = "0.4.0"
 
 REQUIRED = ["requests"]
 
+async_requires = [
+    "aiohttp",
+]
+
 doc_requires = [
     "sphinx",
 ]
 
-test_requires = [
+test_requires = async_requires + [
     "coverage",
     "pytest",
     "pytest-cov",
@@ -39,6 +43,7 @@ dev_requires = (
 )
 
 EXTRAS = {
+    "async": async_requires,
     "dev": dev_requires,
     "docs": doc_requires,
     "test": test_requires,
@@ -84,4 +89,7 @@ setup(
     install_requires=REQUIRED,
     extras_require=EXTRAS,
     include_package_data=True,
+    entry_points={
+        "console_scripts": ["thumbtack-client = thumbtack_client.cli:main"],
+    },
 )
@@ -0,0 +1,239 @@
+import asyncio
+import json
+import time
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+from thumbtack_client import _check_status, _create_key
+from thumbtack_client.Metrics import endpoint_of
+from thumbtack_client.MountedDiskImage import MountedDiskImage
+from thumbtack_client.ThumbtackServerUnavailableException import ThumbtackServerUnavailableException
+
+
+class AsyncThumbtackClient(object):
+    """
+    An asyncio counterpart of :class:`~thumbtack_client.ThumbtackClient` built on
+    `aiohttp <https://docs.aiohttp.org/>`_, so that many Thumbtack server calls can be in flight
+    on a single event loop. It has the same methods, as coroutines, and raises the same
+    :class:`~thumbtack_client.ThumbtackClientException.ThumbtackClientException` and
+    :class:`~thumbtack_client.DuplicateMountAttemptException.DuplicateMountAttemptException`
+    errors.
+
+    Requires the ``async`` extra: ``pip install thumbtack_client[async]``.
+
+    Examples
+    --------
+    >>> async with AsyncThumbtackClient() as client:
+    ...     mounts = await asyncio.gather(*(client.mount_image(p) for p in image_paths))
+    """
+
+    def __init__(self, url="http://127.0.0.1:8208", session=None, limit=100, metrics=None):
+        """
+        Parameters
+        ----------
+        url : str
+            default url is http://127.0.0.1:8208
+        session : aiohttp.ClientSession, optional
+            A session to send requests with. By default one is created on first use and closed
+            by :meth:`close`.
+        limit : int
+            The maximum number of simultaneous connections of the default session.
+        metrics : thumbtack_client.Metrics.Metrics, optional
+            Records the latency and status of every request.
+        """
+        if aiohttp is None:
+            raise ImportError("AsyncThumbtackClient requires aiohttp: pip install thumbtack_client[async]")
+        self._url = url
+        self._session = session
+        self._owns_session = session is None
+        self._limit = limit
+        self.metrics = metrics
+
+    @property
+    def url(self):
+        """The base url of the Thumbtack server."""
+        return self._url
+
+    @property
+    def session(self):
+        # created lazily, since an aiohttp session must be created inside a running event loop
+        if self._session is None:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self._limit))
+        return self._session
+
+    async def close(self):
+        """Closes the session, if it was created by this client."""
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def list_mounted_images(self):
+        """
+        Returns
+        -------
+        list
+            A list of JSON serialized dictionaries of all mounted images in: 'http://127.0.0.1:8208/mounts/'
+        """
+        url = f"{self._url}/mounts/"
+        return await self._get(url, expected_status=200)
+
+    async def list_mounted_disk_images(self):
+        """
+        Returns
+        -------
+        list of MountedDiskImage
+            All mounted images as MountedDiskImage objects
+        """
+        return [MountedDiskImage(d) for d in await self.list_mounted_images()]
+
+    async def list_images(self):
+        """
+        Returns
+        -------
+        list
+            A list of JSON serialized dictionaries of all images in: 'http://127.0.0.1:8208/images'
+        """
+        url = f"{self._url}/images"
+        return await self._get(url, expected_status=200)
+
+    async def mount_image(self, image_path, creds=None):
+        """
+        Parameters
+        ----------
+        image_path : str
+            file path of the image to be mounted
+        creds : dict, optional
+            credentials for encrypted volumes, see :meth:`create_key`
+
+        Returns
+        -------
+        dict
+            the JSON serialized dictionary of the mounted image
+        """
+        url = f"{self._url}/mounts/{image_path.lstrip('/')}"
+        creds_mapping = self.create_key(creds)
+        if creds_mapping:
+            return await self._put(url, expected_status=200, params=creds_mapping)
+        return await self._put(url, expected_status=200)
+
+    async def add_mountpoint(self, image_path=None, mountpoint_path=None):
+        """
+        Parameters
+        ----------
+        image_path : str
+            file path of the disk image
+        mountpoint_path : str
+            absolute path of the mountpoint
+
+        Returns
+        -------
+        dict
+            the JSON serialized response
+        """
+        url = f"{self._url}/add_mountpoint"
+        params = {
+            "image_path": image_path,
+            "mountpoint_path": mountpoint_path,
+        }
+        return await self._put(url, expected_status=200, params=params)
+
+    async def unmount_image(self, image_path):
+        """Deletes supplied image from list of mounted images
+
+        Parameters
+        ----------
+        image_path : str
+            file path of the image to be deleted
+
+        Returns
+        -------
+        dict
+            the JSON serialized response
+        """
+        url = f"{self._url}/mounts/{image_path.lstrip('/')}"
+        return await self._delete(url, expected_status=200)
+
+    async def update_image_dir(self, image_dir):
+        """
+        Parameters
+        ----------
+        image_dir : str
+            the new directory to monitor
+
+        Returns
+        -------
+        dict
+            the JSON serialized response
+        """
+        url = f"{self._url}/image_dir"
+        return await self._put(url, expected_status=200, params={"image_dir": image_dir})
+
+    async def get_image_dir(self):
+        """
+        Returns
+        -------
+        string
+            A string of the current directory being monitored.
+        """
+        url = f"{self._url}/image_dir"
+        return await self._get(url, expected_status=200)
+
+    def create_key(self, creds):
+        return _create_key(creds)
+
+    async def _put(self, url, expected_status=None, **kwargs):
+        return await self._do_method_checked("put", url, expected_status, **kwargs)
+
+    async def _get(self, url, expected_status=None, **kwargs):
+        return await self._do_method_checked("get", url, expected_status, **kwargs)
+
+    async def _delete(self, url, expected_status=None, **kwargs):
+        return await self._do_method_checked("delete", url, expected_status, **kwargs)
+
+    async def _do_method_checked(self, method, url, expected_status, **kwargs):
+        """This checks that the received response to the requested method was successful, otherwise
+        raises exception and displays the status code received.
+
+        Parameters
+        ----------
+        method : str
+            'put', 'get', or 'delete'
+        url : str
+            same url used to mount or unmount the image
+        expected_status: int, list of int, or None
+            HTTP response codes that are expected
+        kwargs : optional
+            optional arguments that `aiohttp.ClientSession.request <https://docs.aiohttp.org/en/stable/client_reference.html#aiohttp.ClientSession.request>`_ takes
+
+        Returns
+        -------
+        object
+            The JSON-decoded response body
+        """
+        params = kwargs.pop("params", None)
+        if params:
+            # requests drops None-valued parameters, aiohttp rejects them
+            kwargs["params"] = {k: v for k, v in params.items() if v is not None}
+        start = time.perf_counter()
+        try:
+            async with self.session.request(method.upper(), url, **kwargs) as response:
+                text = await response.text()
+                status = response.status
+        except (aiohttp.ClientConnectionError, aiohttp.ServerTimeoutError, asyncio.TimeoutError) as e:
+            # a session timeout raises a bare asyncio.TimeoutError, which has no message
+            if self.metrics is not None:
+                self.metrics.observe_request(method.upper(), endpoint_of(self._url, url), "error", time.perf_counter() - start)
+            raise ThumbtackServerUnavailableException(str(e) or f"{method.upper()} {url} timed out")
+        if self.metrics is not None:
+            self.metrics.observe_request(method.upper(), endpoint_of(self._url, url), status, time.perf_counter() - start)
+        _check_status(status, expected_status, url, method.upper(), text)
+        return json.loads(text) if text else None
@@ -0,0 +1,221 @@
+import json
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+DUPLICATE_MOUNT_MESSAGE = "Mount attempt is already in progress for this image."
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    request_queue_size = 128
+
+
+class FakeThumbtackServer(object):
+    """An in-process, in-memory stand-in for the Thumbtack REST API.
+
+    Serves ``/images``, ``/image_dir``, ``/add_mountpoint`` and ``/mounts/`` on a local port,
+    so that clients can be tested and load-tested without a real server or disk images. Mounting
+    only records the image; the returned mountpoints do not exist.
+
+    Server behaviour can be degraded to see how clients cope: every request can be delayed by
+    `latency` (plus up to `latency_jitter`), a share `error_rate` of requests is answered with
+    `error_status`, and a share `in_progress_rate` of mount requests is answered with Thumbtack's
+    "Mount attempt is already in progress" error. Images in :attr:`in_progress` always get that
+    error. The attributes can be changed while the server runs.
+
+    Examples
+    --------
+    >>> with FakeThumbtackServer(latency=0.01, error_rate=0.05) as server:
+    ...     client = ThumbtackClient(server.url)
+    ...     client.mount_image("/images/a.E01")
+
+    Attributes
+    ----------
+    images : list of str
+        The image paths the server knows about
+    mounts : dict
+        Image path to the JSON serialized mounted image
+    in_progress : set of str
+        Image paths that have a mount attempt in progress
+    requests : list of tuple (str, str, dict)
+        (method, path, query parameters) of every request, if `record_requests` is set
+    request_count : int
+        The number of requests handled
+    """
+
+    def __init__(self, images=None, host="127.0.0.1", port=0, latency=0.0, latency_jitter=0.0,
+                 error_rate=0.0, error_status=500, in_progress_rate=0.0, mount_root="/tmp/thumbtack",
+                 record_requests=True, keep_alive=True, seed=None):
+        """Create a FakeThumbtackServer object.
+
+        Parameters
+        ----------
+        images : list of str, optional
+            The image paths the server knows about, by default two sample images
+        host : str, optional
+            The address to listen on
+        port : int, optional
+            The port to listen on; by default a free port is picked
+        latency : float, optional
+            Seconds every request is delayed by
+        latency_jitter : float, optional
+            Up to this many extra seconds, chosen uniformly, are added to `latency`
+        error_rate : float, optional
+            The share of requests that fail with `error_status`
+        error_status : int, optional
+            The HTTP status of injected errors
+        in_progress_rate : float, optional
+            The share of mount requests that fail because a mount attempt is in progress
+        mount_root : str, optional
+            The directory the reported mountpoints are placed in
+        record_requests : bool, optional
+            Whether to keep every request in :attr:`requests`; turn off for long load tests
+        keep_alive : bool, optional
+            Whether to speak HTTP/1.1 and keep connections open between requests
+        seed : int, optional
+            Seeds the random choices of latency jitter and injected errors
+        """
+        self.images = list(images) if images is not None else ["/images/a.E01", "/images/b.E01"]
+        self.mounts = {}
+        self.in_progress = set()
+        self.image_dir = "/images"
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.in_progress_rate = in_progress_rate
+        self.mount_root = mount_root
+        self.record_requests = record_requests
+        self.requests = []
+        self.request_count = 0
+        self.lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._connections = set()
+        self._thread = None
+        self._httpd = _HTTPServer((host, port), self._handler(keep_alive))
+        self.url = f"http://{host}:{self._httpd.server_address[1]}"
+
+    def start(self):
+        """Starts serving on a background thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops serving and closes the connections that are still open."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        with self.lock:
+            connections = list(self._connections)
+        for conn in connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def handle(self, method, path, params):
+        """Answers one request.
+
+        Returns
+        -------
+        tuple (int, object)
+            The HTTP status and the JSON serializable response body
+        """
+        with self.lock:
+            self.request_count += 1
+            if self.record_requests:
+                self.requests.append((method, path, params))
+            delay = self.latency + (self._random.uniform(0, self.latency_jitter) if self.latency_jitter else 0.0)
+            fail = self.error_rate and self._random.random() < self.error_rate
+            busy = self.in_progress_rate and self._random.random() < self.in_progress_rate
+        if delay:
+            time.sleep(delay)
+        if fail:
+            return self.error_status, {"message": "Injected error"}
+
+        with self.lock:
+            if path == "/images" and method == "GET":
+                return 200, [{"relative_path": p.lstrip("/"), "full_path": p} for p in self.images]
+            if path == "/image_dir":
+                if method == "PUT":
+                    self.image_dir = params["image_dir"]
+                return 200, self.image_dir
+            if path == "/add_mountpoint" and method == "PUT":
+                return 200, {"image_path": params.get("image_path"), "mountpoint_path": params.get("mountpoint_path")}
+            if path == "/mounts/" and method == "GET":
+                return 200, list(self.mounts.values())
+            if path.startswith("/mounts/"):
+                image_path = "/" + path[len("/mounts/"):]
+                if image_path in self.in_progress or (busy and method == "PUT"):
+                    return 400, {"message": DUPLICATE_MOUNT_MESSAGE}
+                if image_path not in self.images:
+                    return 404, {"message": f"Image {image_path} not found"}
+                if method == "PUT":
+                    self.mounts.setdefault(image_path, self.disk(image_path))
+                    return 200, self.mounts[image_path]
+                if method == "DELETE":
+                    if image_path not in self.mounts:
+                        return 404, {"message": "Image not mounted"}
+                    return 200, self.mounts.pop(image_path)
+            return 404, {"message": "Not found"}
+
+    def disk(self, image_path):
+        """Returns the JSON serialized mounted image reported for `image_path`."""
+        name = image_path.rsplit("/", 1)[-1]
+        mountpoint = f"{self.mount_root}/{name}"
+        return {
+            "name": name,
+            "mountpoint": mountpoint,
+            "paths": {"nbd": f"/dev/nbd{len(self.mounts)}"},
+            "volumes": [{
+                "fsdescription": "primary volume", "fstype": "ntfs", "index": 2, "label": None,
+                "mountpoint": f"{mountpoint}/vol2", "offset": 1048576, "size": 1073741824,
+            }],
+        }
+
+    def _handler(self, keep_alive):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" if keep_alive else "HTTP/1.0"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with server.lock:
+                    server._connections.add(self.connection)
+
+            def finish(self):
+                with server.lock:
+                    server._connections.discard(self.connection)
+                super().finish()
+
+            def _respond(self):
+                parts = urlsplit(self.path)
+                params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                status, body = server.handle(self.command, unquote(parts.path), params)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_PUT = do_DELETE = _respond
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
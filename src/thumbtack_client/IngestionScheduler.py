@@ -0,0 +1,335 @@
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from thumbtack_client.DuplicateMountAttemptException import DuplicateMountAttemptException
+from thumbtack_client.MountedDiskImage import MountedDiskImage
+from thumbtack_client.ThumbtackClientException import ThumbtackClientException
+
+logger = logging.getLogger("thumbtack_client")
+
+QUEUED = "queued"
+MOUNTING = "mounting"
+MOUNTED = "mounted"
+DONE = "done"
+FAILED = "failed"
+
+
+def smallest_first(image):
+    """The default priority: images the server reports as smaller, or that are smaller on disk, first.
+
+    Images whose size is unknown, e.g. because the image directory is not visible to the
+    client, come after all images of known size.
+    """
+    size = image.get("size")
+    if size is None:
+        try:
+            size = os.path.getsize(image["full_path"])
+        except (KeyError, TypeError, OSError):
+            return (1, 0)
+    return (0, size)
+
+
+class _Image(object):
+    def __init__(self, image_path, image, discovered):
+        self.image_path = image_path
+        self.image = image
+        self.discovered = discovered
+        self.state = QUEUED
+        self.removed = False
+
+
+class IngestionScheduler(object):
+    """Mounts and processes images as they appear in the server's image directory.
+
+    Each :meth:`poll` lists the images the server can mount and compares the listing with the
+    previous one: new images are queued by `priority`, smallest first by default, and queued
+    images that disappeared are dropped. Queued images are mounted on a pool of `concurrency`
+    threads, handed to `process` on a pool of `workers` threads, and unmounted once `process`
+    returns. :meth:`start` polls every `poll_interval` seconds on a background thread.
+
+    Mounting is throttled by the processing side: no new mount is started while `max_mounted`
+    images are mounted or being mounted but not yet processed. When processing falls behind,
+    images wait in the queue rather than holding nbd devices, and :attr:`queue_depth` grows.
+
+    Images that were listed once are not mounted again while they stay listed, whether their
+    processing succeeded or failed; an image that is removed and added back is ingested again.
+    Unmounting after processing also unmounts images that another client had mounted before.
+
+    Examples
+    --------
+    >>> scheduler = IngestionScheduler(client, process=index_disk, workers=4, metrics=metrics)
+    >>> scheduler.start()
+    >>> ...
+    >>> scheduler.stop()
+
+    Attributes
+    ----------
+    discovered, dropped, processed, failed : int
+        Counts of the images queued, dropped from the queue because they were removed, processed
+        successfully, and that failed to mount or process
+    time_to_mount : float
+        The total seconds from discovery to mount of the images mounted so far
+    mounts : int
+        The number of images mounted so far
+    """
+
+    def __init__(self, client, process, concurrency=2, workers=2, max_mounted=None, priority=smallest_first,
+                 poll_interval=30.0, creds=None, unmount=True, skip_existing=False, metrics=None):
+        """Create an IngestionScheduler object.
+
+        Parameters
+        ----------
+        client : thumbtack_client.ThumbtackClient
+            The client used to list, mount and unmount images
+        process : callable
+            Called with the MountedDiskImage of every mounted image, on a worker thread
+        concurrency : int, optional
+            The maximum number of mount requests in flight
+        workers : int, optional
+            The number of images processed at the same time
+        max_mounted : int, optional
+            The maximum number of images being mounted, waiting to be processed or being
+            processed; by default twice `workers`, so every worker has an image ready
+        priority : callable, optional
+            Returns the sort key of an image, given its entry of
+            :meth:`~thumbtack_client.ThumbtackClient.list_images`; lower keys are mounted first
+        poll_interval : float, optional
+            Seconds between polls of the image list by :meth:`start`
+        creds : dict or callable, optional
+            Credentials passed to :meth:`~thumbtack_client.ThumbtackClient.mount_image` for every
+            image, or a callable that accepts an image path and returns its credentials
+        unmount : bool, optional
+            Whether to unmount images once they are processed
+        skip_existing : bool, optional
+            Whether to ignore the images listed by the first poll, only ingesting later ones
+        metrics : thumbtack_client.Metrics.Metrics, optional
+            Receives the time-to-mount of every image and the queue depth after every change
+        """
+        self.client = client
+        self.process = process
+        self.concurrency = concurrency
+        self.workers = workers
+        self.max_mounted = max_mounted if max_mounted is not None else 2 * workers
+        self.priority = priority
+        self.poll_interval = poll_interval
+        self.creds = creds
+        self.unmount = unmount
+        self.skip_existing = skip_existing
+        self.metrics = metrics
+        self.discovered = 0
+        self.dropped = 0
+        self.processed = 0
+        self.failed = 0
+        self.time_to_mount = 0.0
+        self.mounts = 0
+        self._images = {}
+        self._queue = []
+        self._deferred = []
+        self._sequence = itertools.count()
+        self._polled = False
+        self._mounting = 0
+        self._mounted = 0
+        self._cond = threading.Condition()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._mount_pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="thumbtack-mount")
+        self._process_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbtack-process")
+
+    @property
+    def queue_depth(self):
+        """The number of images waiting to be mounted."""
+        with self._cond:
+            return self._queue_depth()
+
+    @property
+    def in_flight(self):
+        """The number of images being mounted, waiting to be processed or being processed."""
+        with self._cond:
+            return self._mounting + self._mounted
+
+    @property
+    def mean_time_to_mount(self):
+        return self.time_to_mount / self.mounts if self.mounts else 0.0
+
+    def poll(self):
+        """Lists the images once, queues the new ones and starts as many mounts as the limits allow.
+
+        Returns
+        -------
+        tuple (list of str, list of str)
+            The image paths that were added and removed since the previous poll
+        """
+        self.client.invalidate_cache()
+        listed = {image["relative_path"]: image for image in self.client.list_images()}
+        now = time.monotonic()
+        with self._cond:
+            added = [p for p in listed if p not in self._images]
+            removed = [p for p in self._images if p not in listed]
+            for image_path in removed:
+                item = self._images[image_path]
+                if item.state == QUEUED:
+                    self.dropped += 1
+                if item.state in (QUEUED, DONE, FAILED):
+                    del self._images[image_path]
+                else:
+                    # forgotten once its processing finishes
+                    item.removed = True
+            for image_path in added:
+                item = self._images[image_path] = _Image(image_path, listed[image_path], now)
+                if self.skip_existing and not self._polled:
+                    item.state = DONE
+                    continue
+                self.discovered += 1
+                self._push(item)
+            # images another client was mounting are retried once per poll
+            for item in self._deferred:
+                if not item.removed:
+                    self._push(item)
+            self._deferred = []
+            self._polled = True
+            self._dispatch()
+        if added or removed:
+            logger.info(f"Image list changed: {len(added)} added, {len(removed)} removed, "
+                        f"{self.queue_depth} queued, {self.in_flight} in flight")
+        return added, removed
+
+    def run(self):
+        """Polls every `poll_interval` seconds until :meth:`stop` is called."""
+        while not self._stopped.is_set():
+            try:
+                self.poll()
+            except ThumbtackClientException as e:
+                logger.warning(f"Failed to list images: {e}")
+            self._stopped.wait(self.poll_interval)
+
+    def start(self):
+        """Runs :meth:`run` on a background thread."""
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self.run, name="thumbtack-ingest", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, wait=True):
+        """Stops polling and starting mounts. Queued images are left unmounted.
+
+        Parameters
+        ----------
+        wait : bool, optional
+            Whether to wait for the images in flight to be processed and unmounted
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._mount_pool.shutdown(wait=wait)
+        self._process_pool.shutdown(wait=wait)
+
+    def wait_idle(self, timeout=None):
+        """Waits until the image list has been polled and no image is queued or in flight.
+
+        Returns
+        -------
+        bool
+            False if `timeout` seconds passed first
+        """
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: self._polled and (not self._queue_depth() or self._stopped.is_set())
+                and not self._mounting + self._mounted,
+                timeout,
+            )
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _queue_depth(self):
+        return sum(1 for item in self._images.values() if item.state == QUEUED)
+
+    def _push(self, item):
+        item.state = QUEUED
+        heapq.heappush(self._queue, (self.priority(item.image), next(self._sequence), item))
+
+    def _dispatch(self):
+        """Starts mounts while under the limits. Must be called with the lock held."""
+        while (self._queue and not self._stopped.is_set() and self._mounting < self.concurrency
+               and self._mounting + self._mounted < self.max_mounted):
+            _, _, item = heapq.heappop(self._queue)
+            if item.state != QUEUED or self._images.get(item.image_path) is not item:
+                # removed while queued
+                continue
+            item.state = MOUNTING
+            self._mounting += 1
+            self._mount_pool.submit(self._mount, item)
+        if self.metrics is not None:
+            self.metrics.set_queue_depth(self._queue_depth())
+        self._cond.notify_all()
+
+    def _mount(self, item):
+        creds = self.creds(item.image_path) if callable(self.creds) else self.creds
+        try:
+            disk = MountedDiskImage(self.client.mount_image(item.image_path, creds=creds))
+        except DuplicateMountAttemptException:
+            logger.debug(f'Another mount attempt of "{item.image_path}" is in progress; retrying after the next poll')
+            with self._cond:
+                self._mounting -= 1
+                item.state = QUEUED
+                self._deferred.append(item)
+                self._dispatch()
+            return
+        except Exception as e:
+            logger.warning(f'Failed to mount "{item.image_path}": {e}')
+            with self._cond:
+                self._mounting -= 1
+                self._finish(item, FAILED)
+            return
+
+        seconds = time.monotonic() - item.discovered
+        logger.info(f'Mounted "{item.image_path}" {seconds:.1f}s after it was discovered')
+        with self._cond:
+            self._mounting -= 1
+            self._mounted += 1
+            self.mounts += 1
+            self.time_to_mount += seconds
+            item.state = MOUNTED
+        if self.metrics is not None:
+            self.metrics.observe_mount(seconds)
+        try:
+            self._process_pool.submit(self._process, item, disk)
+        except RuntimeError:
+            # stopped without waiting; still process and unmount the image
+            self._process(item, disk)
+
+    def _process(self, item, disk):
+        state = DONE
+        try:
+            self.process(disk)
+        except Exception:
+            logger.exception(f'Failed to process "{item.image_path}"')
+            state = FAILED
+        if self.unmount:
+            try:
+                self.client.unmount_image(item.image_path)
+            except Exception as e:
+                logger.warning(f'Failed to unmount processed image "{item.image_path}": {e}')
+        with self._cond:
+            self._mounted -= 1
+            self._finish(item, state)
+
+    def _finish(self, item, state):
+        """Records the outcome of an image and starts the next mounts. Must be called with the lock held."""
+        item.state = state
+        if state == DONE:
+            self.processed += 1
+        else:
+            self.failed += 1
+        if item.removed:
+            del self._images[item.image_path]
+        self._dispatch()
@@ -0,0 +1,231 @@
+import errno
+import logging
+import os
+import struct
+import time
+from collections import deque
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not on Windows
+    fcntl = None
+
+from thumbtack_client.ScandirWalker import batched
+
+logger = logging.getLogger("thumbtack_client")
+
+ORDERS = ("extent", "inode", "walk")
+
+# files are read whole, so larger ones are skipped unless asked for
+DEFAULT_MAX_FILE_SIZE = 64 << 20
+
+# from linux/fs.h and linux/fiemap.h
+FS_IOC_FIEMAP = 0xC020660B
+_FIEMAP_HEADER = struct.Struct("=QQIIII")
+_FIEMAP_EXTENT_SIZE = 56
+
+
+def first_extent(fd):
+    """Returns the physical byte offset of the first extent of an open file, using FIEMAP.
+
+    Returns
+    -------
+    int or None
+        None if the file has no mapped extents, e.g. because it is empty or inline
+
+    Raises
+    ------
+    OSError
+        If the filesystem does not support FIEMAP
+    """
+    request = bytearray(_FIEMAP_HEADER.pack(0, 0xFFFFFFFFFFFFFFFF, 0, 0, 1, 0)) + bytearray(_FIEMAP_EXTENT_SIZE)
+    fcntl.ioctl(fd, FS_IOC_FIEMAP, request, True)
+    mapped = _FIEMAP_HEADER.unpack_from(request)[3]
+    if not mapped:
+        return None
+    # fe_logical, then fe_physical
+    return struct.unpack_from("=Q", request, _FIEMAP_HEADER.size + 8)[0]
+
+
+class LocalityReader(object):
+    """Reads the contents of a volume's files in on-disk order rather than directory order.
+
+    Walked files are collected in batches of `batch_size`, and each batch is read in the order
+    of the files' first physical extent, found with the FIEMAP ioctl, or of their inode numbers
+    where FIEMAP is not supported, which on most filesystems roughly follows allocation order.
+    This turns the random seeks of a directory-order read into a mostly forward sweep, which
+    matters on spinning disks and network image stores behind nbd. The next `readahead` files are
+    opened ahead of time and hinted with ``posix_fadvise(POSIX_FADV_WILLNEED)`` so the kernel can
+    fetch them while the current one is processed.
+
+    Each file is read whole into its own buffer, so memory use is bounded by `max_file_size`,
+    64 MiB by default; larger files, such as page and hibernation files, are skipped and counted
+    in :attr:`skipped_large`. Pass ``max_file_size=None`` to read files of any size.
+
+    Examples
+    --------
+    >>> reader = volume.read_files(order="extent", readahead=16)
+    >>> for path_within_volume, data in reader:
+    ...     scan(path_within_volume, data)
+    >>> print(reader.order_used, reader.bytes_per_second)
+
+    Attributes
+    ----------
+    files, bytes, errors, skipped_large : int
+        Counts of the files read, the bytes read, the files that could not be read and the files
+        larger than `max_file_size`
+    seconds : float
+        How long the run took
+    order_used : str
+        The order actually used: ``extent`` falls back to ``inode`` when FIEMAP is not supported
+    """
+
+    def __init__(self, volume, order="extent", batch_size=1024, readahead=8, max_file_size=DEFAULT_MAX_FILE_SIZE,
+                 file_filter=None):
+        """Create a LocalityReader object.
+
+        Parameters
+        ----------
+        volume : thumbtack_client.MountedDiskImageVolume.MountedDiskImageVolume
+            The volume to read. Files are listed with its ``safe_scandir_walk``.
+        order : str, optional
+            ``extent``, ``inode``, or ``walk`` to read in walk order
+        batch_size : int, optional
+            The number of files reordered together
+        readahead : int, optional
+            The number of upcoming files hinted to the kernel; 0 disables the hints
+        max_file_size : int or None, optional
+            Skip files larger than this many bytes; None reads files of any size
+        file_filter : callable or thumbtack_client.WalkFilter.WalkFilter, optional
+            Limits the files read, as for ``safe_walk``.
+        """
+        if order not in ORDERS:
+            raise ValueError(f"Unknown read order {order!r}; expected one of {ORDERS}")
+        self.volume = volume
+        self.order = order
+        self.batch_size = batch_size
+        self.readahead = readahead
+        self.max_file_size = max_file_size
+        self.file_filter = file_filter
+        self.order_used = order if order != "extent" or fcntl is not None else "inode"
+        self.files = 0
+        self.bytes = 0
+        self.errors = 0
+        self.skipped_large = 0
+        self.seconds = 0.0
+
+    @property
+    def bytes_per_second(self):
+        return self.bytes / self.seconds if self.seconds else 0.0
+
+    def __iter__(self):
+        return self.run()
+
+    def run(self):
+        """Reads every file of the volume.
+
+        Yields
+        ------
+        tuple (str, memoryview)
+            (path in volume, contents), in the reordered sequence
+        """
+        start = time.perf_counter()
+        try:
+            for batch in batched(self.volume.safe_scandir_walk(self.file_filter), self.batch_size):
+                for item in self._read_batch(self._sorted(batch)):
+                    yield item
+        finally:
+            self.seconds = time.perf_counter() - start
+            logger.info(
+                f'Read {self.files} files ({self.bytes} bytes, {self.errors} errors) from "{self.volume.mountpoint}" '
+                f"in {self.order_used} order in {self.seconds:.1f}s: {self.bytes_per_second / (1 << 20):.1f} MiB/s"
+            )
+
+    def _sorted(self, batch):
+        if self.order_used == "walk":
+            return batch
+        # FIEMAP support is per filesystem, so a fallback to inode order happens on the first file
+        # keyed, before any extent key was taken
+        keys = [self._locality_key(full_path) for full_path, _ in batch]
+        return [item for _, _, item in sorted(zip(keys, range(len(batch)), batch))]
+
+    def _locality_key(self, full_path):
+        try:
+            if self.order_used == "extent":
+                fd = os.open(full_path, os.O_RDONLY)
+                try:
+                    physical = first_extent(fd)
+                except OSError as e:
+                    if e.errno not in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL):
+                        raise
+                    logger.info(f'FIEMAP is not supported on "{self.volume.mountpoint}"; ordering reads by inode')
+                    self.order_used = "inode"
+                else:
+                    # files without extents have nothing to seek to; read them first
+                    return physical or 0
+                finally:
+                    os.close(fd)
+            return os.stat(full_path).st_ino
+        except OSError:
+            return 0
+
+    def _open(self, full_path):
+        fd = os.open(full_path, os.O_RDONLY)
+        if self.readahead and hasattr(os, "posix_fadvise"):
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            except OSError:
+                pass
+        return fd
+
+    def _read_batch(self, batch):
+        # files opened ahead of the one being read: (full path, path in volume, fd or the error)
+        window = deque()
+        upcoming = iter(batch)
+        try:
+            while True:
+                while len(window) <= self.readahead:
+                    item = next(upcoming, None)
+                    if item is None:
+                        break
+                    try:
+                        window.append((item[0], item[1], self._open(item[0])))
+                    except OSError as e:
+                        window.append((item[0], item[1], e))
+                if not window:
+                    return
+                full_path, path_within_volume, fd = window.popleft()
+                data = self._read(full_path, path_within_volume, fd)
+                if data is not None:
+                    yield path_within_volume, data
+        finally:
+            for _, _, fd in window:
+                if not isinstance(fd, OSError):
+                    os.close(fd)
+
+    def _read(self, full_path, path_within_volume, fd):
+        if isinstance(fd, OSError):
+            self.errors += 1
+            logger.warning(f'Could not read "{full_path}": {fd}')
+            return None
+        try:
+            with open(fd, "rb", buffering=0) as f:
+                size = os.fstat(fd).st_size
+                if self.max_file_size is not None and size > self.max_file_size:
+                    self.skipped_large += 1
+                    return None
+                buf = bytearray(size)
+                view = memoryview(buf)
+                n = 0
+                while n < size:
+                    read = f.readinto(view[n:])
+                    if not read:
+                        break
+                    n += read
+        except OSError as e:
+            self.errors += 1
+            logger.warning(f'Could not read "{full_path}": {e}')
+            return None
+        self.files += 1
+        self.bytes += n
+        return view[:n]
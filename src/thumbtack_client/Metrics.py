@@ -0,0 +1,204 @@
+import bisect
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+class _Histogram(object):
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics(object):
+    """Collects client request and volume walk metrics.
+
+    Pass an instance as the `metrics` argument of
+    :class:`~thumbtack_client.ThumbtackClient`,
+    :class:`~thumbtack_client.AsyncThumbtackClient.AsyncThumbtackClient`, the volume walk methods
+    or :class:`~thumbtack_client.ParallelWalker.ParallelWalker`. When no instance is passed,
+    nothing is recorded.
+
+    Requests are recorded as latency histograms per method and endpoint, plus counts per status
+    code; ``error`` is used as the status of requests that failed to connect or timed out. Walks
+    are recorded as file, byte and skip counts, with skips broken down by reason. Bytes are only
+    known for files that were ``stat``-ed, i.e. in safe walks or walks filtered on size or mtime.
+
+    Image ingestion is recorded as a histogram of the time from an image being discovered to it
+    being mounted, and the current depth of the queue of images waiting to be mounted.
+
+    Hooks are called synchronously with ``(event, data)`` after each event is recorded, where
+    event is ``"request"``, ``"walk"``, ``"mount"`` or ``"queue"`` and data is a dict of its values. They can forward
+    metrics to another system; :meth:`to_prometheus` renders the Prometheus text format.
+
+    Attributes
+    ----------
+    requests : dict
+        ``(method, endpoint)`` to latency histogram
+    statuses : dict
+        ``(method, endpoint, status)`` to count
+    walk_files, walk_bytes : int
+        files yielded and their total size across all walks
+    walk_seconds : float
+        the total time spent walking
+    walk_skips : dict
+        skip reason to count
+    time_to_mount : histogram
+        seconds from discovery to mount of ingested images
+    queue_depth : int
+        the number of images waiting to be mounted
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """Create a Metrics object.
+
+        Parameters
+        ----------
+        buckets : sequence of float, optional
+            Upper bounds of the request latency histogram buckets, in seconds.
+        """
+        self.buckets = tuple(sorted(buckets))
+        self.requests = {}
+        self.statuses = {}
+        self.walk_files = 0
+        self.walk_bytes = 0
+        self.walk_seconds = 0.0
+        self.walk_skips = {}
+        self.time_to_mount = _Histogram(self.buckets)
+        self.queue_depth = 0
+        self.hooks = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook):
+        """Registers a callable that accepts ``(event, data)``."""
+        self.hooks.append(hook)
+
+    def observe_request(self, method, endpoint, status, seconds):
+        """Records a single server request.
+
+        Parameters
+        ----------
+        method : str
+            The HTTP method, e.g. ``GET``
+        endpoint : str
+            The url path with image paths replaced by a placeholder, e.g. ``/mounts/{image_path}``
+        status : int or str
+            The response status, or ``"error"`` if no response was received
+        seconds : float
+            The request latency
+        """
+        with self._lock:
+            histogram = self.requests.get((method, endpoint))
+            if histogram is None:
+                histogram = self.requests[(method, endpoint)] = _Histogram(self.buckets)
+            histogram.observe(seconds)
+            key = (method, endpoint, status)
+            self.statuses[key] = self.statuses.get(key, 0) + 1
+        if self.hooks:
+            self._emit("request", {"method": method, "endpoint": endpoint, "status": status, "seconds": seconds})
+
+    def observe_walk(self, stats, seconds):
+        """Records a finished walk.
+
+        Parameters
+        ----------
+        stats : thumbtack_client.ScandirWalker.WalkStats
+            The counts collected by the walk
+        seconds : float
+            How long the walk took
+        """
+        with self._lock:
+            self.walk_files += stats.files
+            self.walk_bytes += stats.bytes
+            self.walk_seconds += seconds
+            for reason, count in stats.skipped.items():
+                self.walk_skips[reason] = self.walk_skips.get(reason, 0) + count
+        if self.hooks:
+            self._emit("walk", {
+                "files": stats.files, "bytes": stats.bytes, "skipped": dict(stats.skipped), "seconds": seconds,
+            })
+
+    def observe_mount(self, seconds):
+        """Records the time from an image being discovered to it being mounted, in seconds."""
+        with self._lock:
+            self.time_to_mount.observe(seconds)
+        if self.hooks:
+            self._emit("mount", {"seconds": seconds})
+
+    def set_queue_depth(self, depth):
+        """Records the number of images waiting to be mounted."""
+        with self._lock:
+            self.queue_depth = depth
+        if self.hooks:
+            self._emit("queue", {"depth": depth})
+
+    @property
+    def walk_files_per_second(self):
+        return self.walk_files / self.walk_seconds if self.walk_seconds else 0.0
+
+    def to_prometheus(self, prefix="thumbtack_client"):
+        """Renders the collected metrics in the Prometheus text exposition format.
+
+        Returns
+        -------
+        str
+            The metrics, one sample per line
+        """
+        lines = [
+            f"# TYPE {prefix}_request_seconds histogram",
+        ]
+        with self._lock:
+            for (method, endpoint), histogram in sorted(self.requests.items()):
+                labels = f'method="{method}",endpoint="{endpoint}"'
+                lines.extend(self._histogram_lines(f"{prefix}_request_seconds", labels, histogram))
+
+            lines.append(f"# TYPE {prefix}_requests_total counter")
+            for (method, endpoint, status), count in sorted(self.statuses.items(), key=str):
+                lines.append(f'{prefix}_requests_total{{method="{method}",endpoint="{endpoint}",status="{status}"}} {count}')
+
+            lines.append(f"# TYPE {prefix}_walk_files_total counter")
+            lines.append(f"{prefix}_walk_files_total {self.walk_files}")
+            lines.append(f"# TYPE {prefix}_walk_bytes_total counter")
+            lines.append(f"{prefix}_walk_bytes_total {self.walk_bytes}")
+            lines.append(f"# TYPE {prefix}_walk_seconds_total counter")
+            lines.append(f"{prefix}_walk_seconds_total {self.walk_seconds}")
+            lines.append(f"# TYPE {prefix}_walk_skipped_total counter")
+            for reason, count in sorted(self.walk_skips.items()):
+                lines.append(f'{prefix}_walk_skipped_total{{reason="{reason}"}} {count}')
+
+            lines.append(f"# TYPE {prefix}_time_to_mount_seconds histogram")
+            lines.extend(self._histogram_lines(f"{prefix}_time_to_mount_seconds", "", self.time_to_mount))
+            lines.append(f"# TYPE {prefix}_ingest_queue_depth gauge")
+            lines.append(f"{prefix}_ingest_queue_depth {self.queue_depth}")
+        return "\n".join(lines) + "\n"
+
+    def _histogram_lines(self, name, labels, histogram):
+        sep = "," if labels else ""
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), histogram.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            yield f'{name}_bucket{{{labels}{sep}le="{le}"}} {cumulative}'
+        suffix = f"{{{labels}}}" if labels else ""
+        yield f"{name}_sum{suffix} {histogram.sum}"
+        yield f"{name}_count{suffix} {histogram.count}"
+
+    def _emit(self, event, data):
+        for hook in self.hooks:
+            hook(event, data)
+
+
+def endpoint_of(base_url, url):
+    """Returns the path of `url` below `base_url`, with image paths replaced by a placeholder."""
+    path = url[len(base_url):] if url.startswith(base_url) else url
+    path = path.split("?", 1)[0]
+    if path.startswith("/mounts/") and len(path) > len("/mounts/"):
+        return "/mounts/{image_path}"
+    return path
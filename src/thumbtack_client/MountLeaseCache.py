@@ -0,0 +1,218 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from thumbtack_client.MountedDiskImage import MountedDiskImage
+
+logger = logging.getLogger("thumbtack_client")
+
+
+class _Lease(object):
+    def __init__(self):
+        self.disk = None
+        self.error = None
+        self.refcount = 0
+        self.last_used = None
+
+
+class MountLeaseCache(object):
+    """Keeps recently used images mounted between jobs.
+
+    Leases are reference counted in-process: an image is mounted by the first lease, stays
+    mounted while any lease is held, and is kept mounted after the last lease is released until
+    it has been idle for `idle_ttl` seconds or it is the least recently used idle image when a
+    capacity limit is exceeded. Concurrent leases of an image that is not yet mounted share a
+    single mount request.
+
+    Evicting an image unmounts it on the server, even if it was mounted by another client
+    before it was first leased.
+
+    Examples
+    --------
+    >>> cache = MountLeaseCache(client, idle_ttl=600, max_devices=16)
+    >>> with cache.lease("/images/a.E01") as disk:
+    ...     for volume in disk.mounted_volumes:
+    ...         ...
+    """
+
+    def __init__(self, client, idle_ttl=300, max_mounts=None, max_devices=None, reap_interval=None):
+        """Create a MountLeaseCache object.
+
+        Parameters
+        ----------
+        client : thumbtack_client.ThumbtackClient
+            The client used to mount and unmount images.
+        idle_ttl : float or None
+            Seconds an unleased image stays mounted. None keeps idle images until capacity
+            evicts them.
+        max_mounts : int, optional
+            The maximum number of mounted images, leased or idle.
+        max_devices : int, optional
+            The maximum number of nbd devices in use by mounted images.
+        reap_interval : float, optional
+            If set, a background thread evicts idle images every `reap_interval` seconds.
+            Otherwise idle images are only evicted when a lease is acquired or released, or
+            when :meth:`evict_idle` is called.
+        """
+        self.client = client
+        self.idle_ttl = idle_ttl
+        self.max_mounts = max_mounts
+        self.max_devices = max_devices
+        self._leases = OrderedDict()
+        self._unmounting = set()
+        self._cond = threading.Condition()
+        self._closed = threading.Event()
+        self._reaper = None
+        if reap_interval is not None:
+            self._reaper = threading.Thread(target=self._reap, args=(reap_interval,), daemon=True)
+            self._reaper.start()
+
+    @contextmanager
+    def lease(self, image_path, creds=None):
+        """Leases a mounted image for the duration of a ``with`` block.
+
+        Parameters
+        ----------
+        image_path : str
+            file path of the image to be mounted
+        creds : dict, optional
+            credentials passed to :meth:`~thumbtack_client.ThumbtackClient.mount_image`
+
+        Yields
+        ------
+        MountedDiskImage
+            The mounted disk image
+        """
+        disk = self.acquire(image_path, creds=creds)
+        try:
+            yield disk
+        finally:
+            self.release(image_path)
+
+    def acquire(self, image_path, creds=None):
+        """Leases a mounted image, mounting it if needed. Each call must be paired with :meth:`release`.
+
+        Returns
+        -------
+        MountedDiskImage
+            The mounted disk image
+        """
+        with self._cond:
+            while image_path in self._unmounting:
+                self._cond.wait()
+            lease = self._leases.get(image_path)
+            if lease is not None:
+                lease.refcount += 1
+                self._leases.move_to_end(image_path)
+                while lease.disk is None and lease.error is None:
+                    self._cond.wait()
+                if lease.error is not None:
+                    raise lease.error
+                return lease.disk
+
+            lease = _Lease()
+            lease.refcount = 1
+            self._leases[image_path] = lease
+
+        try:
+            disk = MountedDiskImage(self.client.mount_image(image_path, creds=creds))
+        except BaseException as e:
+            with self._cond:
+                lease.error = e
+                del self._leases[image_path]
+                self._cond.notify_all()
+            raise
+
+        with self._cond:
+            lease.disk = disk
+            self._cond.notify_all()
+            evicted = self._collect_evictions()
+        self._unmount(evicted)
+        return disk
+
+    def release(self, image_path):
+        """Releases a lease taken by :meth:`acquire`."""
+        with self._cond:
+            lease = self._leases[image_path]
+            if lease.refcount <= 0:
+                raise ValueError(f"{image_path} is not leased")
+            lease.refcount -= 1
+            lease.last_used = time.monotonic()
+            evicted = self._collect_evictions()
+        self._unmount(evicted)
+
+    def evict_idle(self):
+        """Unmounts images that have been idle longer than `idle_ttl`, or exceed a capacity limit.
+
+        Returns
+        -------
+        list of str
+            The image paths that were unmounted
+        """
+        with self._cond:
+            evicted = self._collect_evictions()
+        self._unmount(evicted)
+        return evicted
+
+    def close(self):
+        """Stops the reaper and unmounts every idle image. Leased images stay mounted."""
+        self._closed.set()
+        with self._cond:
+            evicted = [p for p, lease in self._leases.items() if lease.refcount == 0]
+            self._begin_unmount(evicted)
+        self._unmount(evicted)
+
+    @property
+    def mounted(self):
+        """Paths of the images currently mounted through this cache, least recently used first."""
+        with self._cond:
+            return [p for p, lease in self._leases.items() if lease.disk is not None]
+
+    def _collect_evictions(self):
+        """Picks the idle leases to unmount. Must be called with the lock held."""
+        now = time.monotonic()
+        idle = [p for p, lease in self._leases.items() if lease.refcount == 0]
+        evicted = []
+        if self.idle_ttl is not None:
+            evicted = [p for p in idle if self._leases[p].last_used + self.idle_ttl <= now]
+
+        mounts = [lease for p, lease in self._leases.items() if p not in evicted]
+        n_mounts = len(mounts)
+        n_devices = sum(1 for lease in mounts if lease.disk is not None and lease.disk.device is not None)
+        # least recently used first, since acquire() moves leases to the end
+        for p in idle:
+            over_mounts = self.max_mounts is not None and n_mounts > self.max_mounts
+            over_devices = self.max_devices is not None and n_devices > self.max_devices
+            if not over_mounts and not over_devices:
+                break
+            if p in evicted:
+                continue
+            evicted.append(p)
+            n_mounts -= 1
+            if self._leases[p].disk.device is not None:
+                n_devices -= 1
+
+        self._begin_unmount(evicted)
+        return evicted
+
+    def _begin_unmount(self, image_paths):
+        for p in image_paths:
+            del self._leases[p]
+            self._unmounting.add(p)
+
+    def _unmount(self, image_paths):
+        for p in image_paths:
+            try:
+                self.client.unmount_image(p)
+            except Exception as e:
+                logger.warning(f'Failed to unmount evicted image "{p}": {e}')
+            finally:
+                with self._cond:
+                    self._unmounting.discard(p)
+                    self._cond.notify_all()
+
+    def _reap(self, interval):
+        while not self._closed.wait(interval):
+            self.evict_idle()
@@ -1,4 +1,16 @@
-from thumbtack_client.MountedDiskImageVolume import MountedDiskImageVolume
+import os
+
+from thumbtack_client.MountedDiskImageVolume import VOLUME_FIELDS, MountedDiskImageVolume
+
+
+def is_mount_of(mounted_disk_obj, image_path):
+    """Returns whether a JSON serialized mounted image, as listed by ``list_mounted_images``, is of `image_path`.
+
+    Thumbtack reports mounted images by name, the tail of the image path, so images with the same
+    file name in different directories can't be told apart; callers that mounted an image should
+    prefer the ownership they recorded themselves.
+    """
+    return isinstance(mounted_disk_obj, dict) and mounted_disk_obj.get("name") == os.path.split(image_path)[1]
 
 
 class MountedDiskImage(object):
@@ -17,8 +29,15 @@ class MountedDiskImage(object):
             This is a list of each MountedDiskImageVolume object in the specified disk image.
         mounted_volumes : list thumbtack.resources.MountedDiskImageVolume
             This is a list of the MountedDiskImageVolume objects with a valid mountpoint.
+
+        Disk images use ``__slots__`` and keep their volumes as plain tuples until `volumes` or
+        `mounted_volumes` is first accessed, so holding thousands of mounts is cheap. They compare
+        and hash by name, mountpoint, device and volumes without building the volume objects, so
+        snapshots of mount state can be diffed with sets.
         """
 
+    __slots__ = ("mountpoint", "name", "device", "_volume_rows", "_volumes", "_mounted_volumes")
+
     def __init__(self, mounted_disk_obj):
         """Create a MountedDiskImage object.
 
@@ -30,10 +49,86 @@ class MountedDiskImage(object):
         """
         self.mountpoint = mounted_disk_obj["mountpoint"]
         self.name = mounted_disk_obj["name"]
-        self.volumes = [MountedDiskImageVolume(v) for v in mounted_disk_obj["volumes"]]
+        self._volume_rows = tuple(tuple(v[f] for f in VOLUME_FIELDS) for v in mounted_disk_obj["volumes"])
+        self._volumes = None
+        self._mounted_volumes = None
         if mounted_disk_obj["paths"] is not None and "nbd" in mounted_disk_obj["paths"].keys():
             self.device = mounted_disk_obj["paths"]["nbd"]
         else:
             self.device = None
-        # only volumes with a non-empty mountpoint
-        self.mounted_volumes = [v for v in self.volumes if v.mountpoint]
+
+    @property
+    def volumes(self):
+        if self._volumes is None:
+            self._volumes = [MountedDiskImageVolume.from_row(row) for row in self._volume_rows]
+            self._volume_rows = None
+        return self._volumes
+
+    @volumes.setter
+    def volumes(self, volumes):
+        self._volumes = volumes
+        self._volume_rows = None
+        self._mounted_volumes = None
+
+    @property
+    def mounted_volumes(self):
+        if self._mounted_volumes is None:
+            # only volumes with a non-empty mountpoint
+            self._mounted_volumes = [v for v in self.volumes if v.mountpoint]
+        return self._mounted_volumes
+
+    @mounted_volumes.setter
+    def mounted_volumes(self, mounted_volumes):
+        self._mounted_volumes = mounted_volumes
+
+    def map(self, func, workers=None, chunksize=64, ordered=False, file_filter=None):
+        """Calls `func` on every file of every mounted volume on a process pool.
+
+        See :meth:`MountedDiskImageVolume.map`; the results' `volume_index` tells the volumes apart.
+
+        Returns
+        -------
+        thumbtack_client.VolumeMapper.VolumeMapper
+        """
+        from thumbtack_client.VolumeMapper import VolumeMapper
+        return VolumeMapper(
+            func, self.mounted_volumes, workers=workers, chunksize=chunksize, ordered=ordered, file_filter=file_filter
+        )
+
+    def volume_reader(self, volume, use_mmap=True):
+        """Opens a reader of the raw bytes of `volume` on this image's device.
+
+        Parameters
+        ----------
+        volume : thumbtack_client.MountedDiskImageVolume.MountedDiskImageVolume
+            One of this image's volumes
+        use_mmap : bool, optional
+            Whether to try to memory map the volume
+
+        Returns
+        -------
+        thumbtack_client.VolumeReader.VolumeReader
+        """
+        from thumbtack_client.VolumeReader import VolumeReader
+
+        if self.device is None:
+            raise ValueError(f"{self.name} has no device to read from")
+        return VolumeReader(self.device, volume.offset, volume.size, use_mmap=use_mmap)
+
+    def _key(self):
+        if self._volumes is None:
+            volumes = self._volume_rows
+        else:
+            volumes = tuple(v._key() for v in self._volumes)
+        return (self.name, self.mountpoint, self.device, volumes)
+
+    def __eq__(self, other):
+        if not isinstance(other, MountedDiskImage):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return f"<MountedDiskImage name={self.name!r} mountpoint={self.mountpoint!r} device={self.device!r}>"
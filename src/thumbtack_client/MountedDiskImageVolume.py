@@ -1,7 +1,19 @@
 import os
 import stat
+import time
 
-from thumbtack_client import logger
+from thumbtack_client.LocalityReader import DEFAULT_MAX_FILE_SIZE
+from thumbtack_client.ScandirWalker import (
+    SKIP_BROKEN_SYMLINK,
+    SKIP_NOT_REGULAR,
+    SKIP_UNREADABLE,
+    ScandirWalker,
+    WalkStats,
+)
+from thumbtack_client.WalkFilter import WalkFilter
+
+# the attributes of a volume, in the order used by MountedDiskImageVolume.from_row
+VOLUME_FIELDS = ("fsdescription", "fstype", "index", "label", "mountpoint", "offset", "size")
 
 
 class MountedDiskImageVolume(object):
@@ -26,8 +38,13 @@ class MountedDiskImageVolume(object):
             The offset of the volume in the disk in bytes
         size : int
             The size of the volume in bytes.
+
+        Volumes use ``__slots__`` to keep large mount snapshots small, and compare and hash by
+        their attributes, so snapshots of mount state can be diffed with sets.
         """
 
+    __slots__ = VOLUME_FIELDS
+
     def __init__(self, mounted_volume_obj):
         """Create a MountedDiskImageVolume object.
 
@@ -45,16 +62,42 @@ class MountedDiskImageVolume(object):
         self.offset = mounted_volume_obj["offset"]
         self.size = mounted_volume_obj["size"]
 
-    def walk(self, file_filter=None):
+    @classmethod
+    def from_row(cls, row):
+        """Create a MountedDiskImageVolume object from a tuple of values ordered like `VOLUME_FIELDS`."""
+        volume = cls.__new__(cls)
+        for field, value in zip(VOLUME_FIELDS, row):
+            setattr(volume, field, value)
+        return volume
+
+    def _key(self):
+        return (self.fsdescription, self.fstype, self.index, self.label, self.mountpoint, self.offset, self.size)
+
+    def __eq__(self, other):
+        if not isinstance(other, MountedDiskImageVolume):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return f"<MountedDiskImageVolume index={self.index!r} fstype={self.fstype!r} mountpoint={self.mountpoint!r}>"
+
+    def walk(self, file_filter=None, metrics=None):
         """Walks through every file in a given mountpoint directory.
 
         Parameters
         ----------
-        file_filter : callable, optional
+        file_filter : callable or thumbtack_client.WalkFilter.WalkFilter, optional
             A callable that accepts `mounted_file_path_on_disk` and returns a boolean
             of whether to yield that file. For example, you can call
             `volume.walk(lambda x: x.endswith(".exe"))` to find all of the files
-            with the `.exe` extension.
+            with the `.exe` extension. A WalkFilter is evaluated against directory
+            entries before any path work and prunes excluded directories, e.g.
+            `volume.walk(WalkFilter(exclude_dirs=["Windows/WinSxS"], extensions=[".exe"]))`.
+        metrics : thumbtack_client.Metrics.Metrics, optional
+            Receives the file, byte and skip counts of the walk once it completes.
 
         Yields
         ------
@@ -75,15 +118,25 @@ class MountedDiskImageVolume(object):
         ...     # print file path as it appears in the volume
         ...     print(file_path_within_volume)
         """
+        if isinstance(file_filter, WalkFilter):
+            # structured filters need directory entries, which only the scandir engine has
+            yield from ScandirWalker(self.mountpoint, file_filter=file_filter, metrics=metrics).walk()
+            return
+
+        start = time.perf_counter()
+        stats = WalkStats()
         for dirpath, _, filenames in os.walk(self.mountpoint):
             for f in filenames:
                 full_path = os.path.join(dirpath, f)
                 if file_filter is None or file_filter(full_path):
                     # remove mounted prefix; eg '/tmp/thumbtack/im_x30_s3s'
                     path_within_volume = os.path.relpath(full_path, start=self.mountpoint)
+                    stats.files += 1
                     yield full_path, path_within_volume
+        if metrics is not None:
+            metrics.observe_walk(stats, time.perf_counter() - start)
 
-    def safe_walk(self, file_filter=None):
+    def safe_walk(self, file_filter=None, metrics=None):
         """Walks through every file in a given mountpoint directory, skipping broken files.
 
         This is the preferred method over :meth:`~thumbtack.resources.MountedDiskImageVolume.walk()`
@@ -92,17 +145,25 @@ class MountedDiskImageVolume(object):
 
         Parameters
         ----------
-        file_filter : callable, optional
+        file_filter : callable or thumbtack_client.WalkFilter.WalkFilter, optional
             A callable that accepts `mounted_file_path_on_disk` and returns a boolean
             of whether to yield that file.  For example, you can call
             `volume.walk(lambda x: x.endswith(".exe"))` to find all of the files
-            with the `.exe` extension.
+            with the `.exe` extension. See :meth:`walk` for WalkFilter support.
+        metrics : thumbtack_client.Metrics.Metrics, optional
+            Receives the file, byte and skip counts of the walk once it completes.
 
         Yields
         ------
         tuple (str, str)
             A tuple that contains (absolute path, path in volume)
         """
+        if isinstance(file_filter, WalkFilter):
+            yield from ScandirWalker(self.mountpoint, file_filter=file_filter, safe=True, metrics=metrics).walk()
+            return
+
+        start = time.perf_counter()
+        stats = WalkStats()
         for full_path, path_within_volume in self.walk(file_filter):
             skip_file = False
             msg = None
@@ -110,20 +171,258 @@ class MountedDiskImageVolume(object):
             # Check for broken symlinks, observed on mounted NTFS reparse points
             if not os.path.exists(full_path):
                 skip_file = True
-                msg = "Path does not exist (broken symlink?)"
+                msg = SKIP_BROKEN_SYMLINK
 
             # Check for files that can't be read
             if not skip_file and not os.access(full_path, os.R_OK):
                 skip_file = True
-                msg = "File not accessible for reading"
+                msg = SKIP_UNREADABLE
 
             # Ensure is regular file. Avoids named pipes, among other things
-            if not skip_file and not stat.S_ISREG(os.stat(full_path).st_mode):
-                skip_file = True
-                msg = "File is not a regular file"
+            if not skip_file:
+                st = os.stat(full_path)
+                if not stat.S_ISREG(st.st_mode):
+                    skip_file = True
+                    msg = SKIP_NOT_REGULAR
 
             if skip_file:
-                logger.info(f'Not processing mounted file "{full_path}": {msg}')
+                stats.skip(msg, full_path)
                 continue
 
+            stats.files += 1
+            stats.bytes += st.st_size
             yield (full_path, path_within_volume)
+
+        stats.log_summary(self.mountpoint)
+        if metrics is not None:
+            metrics.observe_walk(stats, time.perf_counter() - start)
+
+    def scandir_walk(self, file_filter=None, metrics=None):
+        """Walks through every file in a given mountpoint directory using :func:`os.scandir`.
+
+        This yields the same tuples as :meth:`walk`, but avoids the per-file path joining and
+        :func:`os.path.relpath` calls, which makes it considerably faster on large volumes.
+
+        Parameters
+        ----------
+        file_filter : callable or thumbtack_client.WalkFilter.WalkFilter, optional
+            A callable that accepts `mounted_file_path_on_disk` and returns a boolean
+            of whether to yield that file, or a WalkFilter.
+        metrics : thumbtack_client.Metrics.Metrics, optional
+            Receives the file, byte and skip counts of the walk once it completes.
+
+        Yields
+        ------
+        tuple (str, str)
+            A tuple that contains (absolute path, path in volume)
+        """
+        return ScandirWalker(self.mountpoint, file_filter=file_filter, metrics=metrics).walk()
+
+    def safe_scandir_walk(self, file_filter=None, metrics=None):
+        """Walks through every file in a given mountpoint directory, skipping broken files.
+
+        This skips the same files as :meth:`safe_walk`, but performs a single ``stat`` per file
+        instead of separate ``exists``, ``access`` and ``stat`` calls. See
+        :class:`~thumbtack_client.ScandirWalker.ScandirWalker` for details.
+
+        Parameters
+        ----------
+        file_filter : callable or thumbtack_client.WalkFilter.WalkFilter, optional
+            A callable that accepts `mounted_file_path_on_disk` and returns a boolean
+            of whether to yield that file, or a WalkFilter.
+        metrics : thumbtack_client.Metrics.Metrics, optional
+            Receives the file, byte and skip counts of the walk once it completes.
+
+        Yields
+        ------
+        tuple (str, str)
+            A tuple that contains (absolute path, path in volume)
+        """
+        return ScandirWalker(self.mountpoint, file_filter=file_filter, safe=True, metrics=metrics).walk()
+
+    def resumable_walk(self, cursor=None, checkpoint_path=None, checkpoint_every=1000, unit=None, file_filter=None,
+                       safe=True, metrics=None):
+        """Walks the volume in a stable order that can be resumed from a cursor or checkpoint file.
+
+        Parameters
+        ----------
+        cursor : str, optional
+            Resume after this cursor, as returned by the walker's `cursor`
+        checkpoint_path : str, optional
+            A file the cursor is saved to every `checkpoint_every` files, and resumed from
+        checkpoint_every : int, optional
+            The number of files between checkpoints
+        unit : thumbtack_client.ResumableWalker.WorkUnit, optional
+            Only walk this part of the volume, as planned by :meth:`plan_walk`
+        file_filter : callable or thumbtack_client.WalkFilter.WalkFilter, optional
+            Limits the files yielded, as for :meth:`safe_walk`
+        safe : bool, optional
+            Skip files :meth:`safe_walk` would skip
+
+        Returns
+        -------
+        thumbtack_client.ResumableWalker.ResumableWalker
+            An iterable of (absolute path, path in volume) tuples
+        """
+        from thumbtack_client.ResumableWalker import ResumableWalker
+        return ResumableWalker(
+            self.mountpoint, cursor=cursor, unit=unit, checkpoint_path=checkpoint_path,
+            checkpoint_every=checkpoint_every, file_filter=file_filter, safe=safe, metrics=metrics,
+        )
+
+    def plan_walk(self, units=64, file_filter=None):
+        """Splits the volume into about `units` work units for :meth:`resumable_walk`.
+
+        Returns
+        -------
+        list of thumbtack_client.ResumableWalker.WorkUnit
+            Units that together cover every file once; their outputs can be joined with
+            :func:`thumbtack_client.ResumableWalker.merge_units`
+        """
+        from thumbtack_client.ResumableWalker import plan_units
+        return plan_units(self.mountpoint, count=units, file_filter=file_filter)
+
+    def hash_files(self, algorithms=("md5", "sha1", "sha256"), workers=None, buffer_size=1 << 20, file_filter=None):
+        """Hashes every file of the volume on a process pool, reading each file once.
+
+        Parameters
+        ----------
+        algorithms : sequence of str, optional
+            Names accepted by :func:`hashlib.new`
+        workers : int, optional
+            The number of worker processes, by default the number of CPUs
+        buffer_size : int, optional
+            The size of each read, in bytes
+        file_filter : callable or thumbtack_client.WalkFilter.WalkFilter, optional
+            Limits the files hashed, as for :meth:`safe_walk`.
+
+        Returns
+        -------
+        thumbtack_client.VolumeHasher.VolumeHasher
+            An iterable of (path in volume, size, algorithm name to hex digest) tuples. Its
+            `files_per_second` and `bytes_per_second` are set once iteration finishes.
+
+        Examples
+        --------
+        >>> hasher = volume.hash_files(workers=8)
+        >>> for path_within_volume, size, digests in hasher:
+        ...     print(digests["md5"], path_within_volume)
+        """
+        from thumbtack_client.VolumeHasher import VolumeHasher
+        return VolumeHasher(self, algorithms=algorithms, workers=workers, buffer_size=buffer_size, file_filter=file_filter)
+
+    def map(self, func, workers=None, chunksize=64, ordered=False, file_filter=None):
+        """Calls `func` on every file of the volume on a process pool.
+
+        Parameters
+        ----------
+        func : callable
+            A picklable function called with the absolute path of each file
+        workers : int, optional
+            The number of worker processes, by default the number of CPUs
+        chunksize : int, optional
+            The number of files sent to a worker at a time
+        ordered : bool, optional
+            Yield results in walk order instead of as they complete
+        file_filter : callable or thumbtack_client.WalkFilter.WalkFilter, optional
+            Limits the files mapped, as for :meth:`safe_walk`.
+
+        Returns
+        -------
+        thumbtack_client.VolumeMapper.VolumeMapper
+            An iterable of :class:`~thumbtack_client.VolumeMapper.MapResult`; exceptions raised by
+            `func` are returned in their `error` rather than raised
+        """
+        from thumbtack_client.VolumeMapper import VolumeMapper
+        return VolumeMapper(func, [self], workers=workers, chunksize=chunksize, ordered=ordered, file_filter=file_filter)
+
+    def read_files(self, order="extent", batch_size=1024, readahead=8, max_file_size=DEFAULT_MAX_FILE_SIZE,
+                   file_filter=None):
+        """Reads the contents of the volume's files, ordered by their location on disk.
+
+        Parameters
+        ----------
+        order : str, optional
+            ``extent`` to order each batch by the files' first physical extent (FIEMAP), falling
+            back to ``inode``; or ``walk`` to keep the walk order
+        batch_size : int, optional
+            The number of files reordered together
+        readahead : int, optional
+            The number of upcoming files hinted to the kernel with ``posix_fadvise``
+        max_file_size : int or None, optional
+            Skip files larger than this many bytes, 64 MiB by default; None reads files of any size
+        file_filter : callable or thumbtack_client.WalkFilter.WalkFilter, optional
+            Limits the files read, as for :meth:`safe_walk`.
+
+        Returns
+        -------
+        thumbtack_client.LocalityReader.LocalityReader
+            An iterable of (path in volume, memoryview of the contents) tuples
+        """
+        from thumbtack_client.LocalityReader import LocalityReader
+        return LocalityReader(
+            self, order=order, batch_size=batch_size, readahead=readahead, max_file_size=max_file_size,
+            file_filter=file_filter,
+        )
+
+    def diff(self, other, digest=None, compare_mtime=True, max_in_memory=100000, file_filter=None):
+        """Streams the files added, removed and changed in `other` compared with this volume.
+
+        Parameters
+        ----------
+        other : MountedDiskImageVolume or str
+            The volume to compare with, or a listing saved with :meth:`save_listing`
+        digest : str, optional
+            A :func:`hashlib.new` name to compare the contents of files of equal size with
+        compare_mtime : bool, optional
+            Whether a different mtime alone makes a file changed
+        max_in_memory : int, optional
+            The number of entries sorted in memory at a time; longer listings spill to disk
+        file_filter : callable or thumbtack_client.WalkFilter.WalkFilter, optional
+            Limits the files compared, as for :meth:`safe_walk`
+
+        Returns
+        -------
+        thumbtack_client.VolumeDiff.VolumeDiff
+            An iterable of :class:`~thumbtack_client.VolumeDiff.DiffEntry` in path order
+        """
+        from thumbtack_client.VolumeDiff import VolumeDiff
+        return VolumeDiff(
+            self, other, digest=digest, compare_mtime=compare_mtime, max_in_memory=max_in_memory,
+            file_filter=file_filter,
+        )
+
+    def save_listing(self, path, digest=None, max_in_memory=100000, file_filter=None):
+        """Saves the sorted listing of this volume, e.g. as a baseline for :meth:`diff`.
+
+        Returns
+        -------
+        int
+            The number of files listed
+        """
+        from thumbtack_client.VolumeDiff import save_listing
+        return save_listing(self, path, digest=digest, max_in_memory=max_in_memory, file_filter=file_filter)
+
+    def file_index(self, db_path, image_name, refresh=False):
+        """Opens the persistent file index of this volume, building it on first use.
+
+        Parameters
+        ----------
+        db_path : str
+            The SQLite database file, which can hold the indexes of many volumes
+        image_name : str
+            The name of the disk image this volume belongs to, e.g. `MountedDiskImage.name`
+        refresh : bool, optional
+            Re-list the directories whose mtime changed since the index was built, for writable
+            mountpoints
+
+        Returns
+        -------
+        thumbtack_client.VolumeIndex.VolumeIndex
+            The index, which answers walks, extension and glob queries without touching the volume
+        """
+        from thumbtack_client.VolumeIndex import VolumeIndex
+        index = VolumeIndex(db_path, image_name, self)
+        if refresh:
+            index.refresh()
+        return index.ensure()
@@ -0,0 +1,199 @@
+import queue
+import threading
+import time
+from collections import namedtuple
+
+from thumbtack_client.MountedDiskImage import MountedDiskImage
+from thumbtack_client.ScandirWalker import ScandirWalker, WalkStats
+
+WalkResult = namedtuple("WalkResult", ["image_name", "volume_index", "full_path", "path_within_volume"])
+
+# tells a worker to exit
+_STOP = object()
+# sent by every worker as it exits
+_EXITED = object()
+
+
+class ParallelWalker(object):
+    """Walks the mounted volumes of one or more disk images on a pool of threads.
+
+    Work is split at the directory level: each task lists a single directory with
+    :meth:`~thumbtack_client.ScandirWalker.ScandirWalker.scan_dir` and queues its subdirectories
+    as new tasks, so large volumes are spread across all workers rather than one per volume. A
+    worker keeps the first subdirectory of each directory for itself, so deep, narrow trees are
+    not handed from thread to thread. Files are streamed to the caller through a bounded queue,
+    so workers block instead of buffering the listing when the caller falls behind.
+
+    Results are :class:`WalkResult` tuples of ``(image_name, volume_index, full_path,
+    path_within_volume)``, in no particular order.
+
+    Examples
+    --------
+    >>> walker = ParallelWalker(client_mounts, workers=16, safe=True)
+    >>> for result in walker:
+    ...     print(result.image_name, result.volume_index, result.path_within_volume)
+
+    Leaving the loop early, or calling :meth:`cancel` from another thread, stops the workers.
+    """
+
+    def __init__(self, images, workers=8, queue_size=64, batch_size=256, file_filter=None, safe=False,
+                 metrics=None):
+        """Create a ParallelWalker object.
+
+        Parameters
+        ----------
+        images : MountedDiskImage or list of MountedDiskImage
+            The disk images whose mounted volumes should be walked.
+        workers : int, optional
+            The number of worker threads.
+        queue_size : int, optional
+            The maximum number of batches waiting to be consumed before workers block.
+        batch_size : int, optional
+            The maximum number of results handed over in a single queue operation.
+        file_filter : callable or thumbtack_client.WalkFilter.WalkFilter, optional
+            Applied to every volume, see :class:`~thumbtack_client.ScandirWalker.ScandirWalker`.
+        safe : bool, optional
+            Skip broken symlinks, files that can't be read, and named pipes.
+        metrics : thumbtack_client.Metrics.Metrics, optional
+            Receives the file, byte and skip counts of the walk once it completes.
+        """
+        if isinstance(images, MountedDiskImage):
+            images = [images]
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.images = list(images)
+        self.workers = workers
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.file_filter = file_filter
+        self.safe = safe
+        self.metrics = metrics
+        self.stats = WalkStats()
+
+        self._cancelled = threading.Event()
+        self._finished = threading.Event()
+        self._tasks = queue.Queue()
+        self._results = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._threads = []
+        self._error = None
+
+    def __iter__(self):
+        return self.walk()
+
+    def cancel(self):
+        """Stops the walk. Workers exit after their current directory entry."""
+        with self._lock:
+            if self._cancelled.is_set():
+                return
+            self._cancelled.set()
+        self._stop_workers()
+
+    def _stop_workers(self):
+        for _ in range(self.workers):
+            self._tasks.put(_STOP)
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def walk(self):
+        """Walks every mounted volume of every image.
+
+        Yields
+        ------
+        WalkResult
+            A tuple that contains (image name, volume index, absolute path, path in volume)
+        """
+        if self._threads:
+            raise RuntimeError("ParallelWalker.walk() can only be called once")
+        self._results = queue.Queue(maxsize=self.queue_size)
+
+        for image in self.images:
+            for volume in image.mounted_volumes:
+                walker = ScandirWalker(volume.mountpoint, file_filter=self.file_filter, safe=self.safe)
+                self._pending += 1
+                self._tasks.put((walker, image.name, volume.index, volume.mountpoint, ""))
+
+        if self._pending == 0:
+            return
+
+        start = time.perf_counter()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"ParallelWalker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+        # every worker sends _EXITED last, so the queue is empty once all of them have
+        exited = 0
+        try:
+            while exited < len(self._threads):
+                batch = self._results.get()
+                if batch is _EXITED:
+                    exited += 1
+                elif not self._cancelled.is_set():
+                    for result in batch:
+                        yield result
+        finally:
+            self.cancel()
+            # keep taking results so that no worker stays blocked on the full queue
+            while exited < len(self._threads):
+                if self._results.get() is _EXITED:
+                    exited += 1
+            for thread in self._threads:
+                thread.join()
+        if self._error is not None:
+            raise self._error
+        if self._finished.is_set():
+            self.stats.log_summary(", ".join(image.name for image in self.images))
+            if self.metrics is not None:
+                self.metrics.observe_walk(self.stats, time.perf_counter() - start)
+
+    def _worker(self):
+        stats = WalkStats()
+        try:
+            while True:
+                task = self._tasks.get()
+                if task is _STOP or self._cancelled.is_set():
+                    break
+                while task is not None:
+                    task = self._run_task(stats, *task)
+        except BaseException as e:
+            self._error = e
+            self.cancel()
+        finally:
+            with self._lock:
+                self.stats.merge(stats)
+            self._results.put(_EXITED)
+
+    def _run_task(self, stats, walker, image_name, volume_index, dirpath, relpath):
+        """Lists one directory and queues its subdirectories but the first, which is returned."""
+        subdirs = []
+        batch = []
+        for full_path, path_within_volume in walker.scan_dir(dirpath, relpath, subdirs, stats):
+            batch.append(WalkResult(image_name, volume_index, full_path, path_within_volume))
+            if len(batch) >= self.batch_size:
+                if not self._put(batch):
+                    return None
+                batch = []
+        if batch and not self._put(batch):
+            return None
+
+        with self._lock:
+            self._pending += len(subdirs) - 1
+            done = self._pending == 0
+        for sub_dirpath, sub_relpath in subdirs[1:]:
+            self._tasks.put((walker, image_name, volume_index, sub_dirpath, sub_relpath))
+        if done:
+            self._finished.set()
+            self._stop_workers()
+            return None
+        if subdirs:
+            return (walker, image_name, volume_index) + subdirs[0]
+        return None
+
+    def _put(self, batch):
+        """Puts `batch` on the result queue, returning False if the walk is cancelled."""
+        self._results.put(batch)
+        return not self._cancelled.is_set()
@@ -0,0 +1,338 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("thumbtack_client")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    analytic TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    partial TEXT NOT NULL,
+    full TEXT NOT NULL,
+    result TEXT NOT NULL,
+    nbytes INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (analytic, size, partial, full)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+"""
+
+# cache hits whose last_used time is written together
+_TOUCH_EVERY = 256
+
+
+def _digest(f, length=None, buffer_size=1 << 20):
+    h = hashlib.blake2b(digest_size=20)
+    buf = bytearray(buffer_size)
+    view = memoryview(buf)
+    remaining = length
+    while remaining is None or remaining > 0:
+        n = f.readinto(buf if remaining is None or remaining >= buffer_size else view[:remaining])
+        if not n:
+            break
+        h.update(view[:n])
+        if remaining is not None:
+            remaining -= n
+    return h
+
+
+class ResultCache(object):
+    """A shared, size-bounded SQLite cache of analytic results keyed by file content.
+
+    Most files on images of the same operating system are identical, so an analytic's result for
+    one copy holds for all of them. Files are fingerprinted in two steps: first by size and a hash
+    of their first and last `partial_size` bytes, which rules out most files without reading them
+    whole, and then, only if a cached result has the same size and partial hash, by a hash of the
+    whole content. Files no longer than twice `partial_size` are hashed whole in the first step.
+    With ``verify=False`` the partial fingerprint alone is trusted, which saves reading cached
+    files whole at a small risk of returning the result of a different file.
+
+    A new result costs one full hash of its file, so that later copies can be verified. Results
+    are stored as JSON, so they must be JSON serializable and come back as the corresponding
+    JSON types, e.g. tuples as lists; nothing is unpickled, so a shared database can't run code
+    in its readers. The least recently used results are evicted once the stored results exceed
+    `max_bytes`. Several processes can share one database file: each new result is written in
+    its own short transaction, and the last-used times of hits are written in batches, so no
+    write lock is held while analytics run.
+
+    Attributes
+    ----------
+    full_hashes : int
+        The number of files this cache hashed whole, to verify a partial match or to key a new
+        result
+
+    Examples
+    --------
+    >>> with ResultCache("/var/cache/thumbtack/results.db") as cache:
+    ...     run = cache.run(scan_pe, volume.safe_scandir_walk(), analytic="scan_pe:2")
+    ...     for full_path, path_within_volume, result, cached in run:
+    ...         report(path_within_volume, result)
+    ...     print(f"{run.hit_rate:.0%} of files skipped")
+    """
+
+    def __init__(self, db_path, max_bytes=1 << 30, partial_size=1 << 16, verify=True, timeout=30.0):
+        """Create a ResultCache object.
+
+        Parameters
+        ----------
+        db_path : str
+            The SQLite database file, created if needed
+        max_bytes : int, optional
+            The total size of the JSON encoded results kept
+        partial_size : int, optional
+            The number of bytes hashed at each end of a file for the cheap fingerprint
+        verify : bool, optional
+            Confirm cache hits with a hash of the whole file
+        timeout : float, optional
+            Seconds to wait for another process's write to finish
+        """
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.partial_size = partial_size
+        self.verify = verify
+        self.full_hashes = 0
+        # autocommit; transactions are opened explicitly and kept short
+        self._db = sqlite3.connect(db_path, timeout=timeout, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._stored_bytes = self._db.execute("SELECT COALESCE(SUM(nbytes), 0) FROM results").fetchone()[0]
+        self._touched = {}
+
+    def close(self):
+        self.flush()
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def flush(self):
+        """Writes the last-used times of recent hits and evicts results beyond `max_bytes`."""
+        if self._touched:
+            touched, self._touched = self._touched, {}
+            with self._transaction():
+                self._db.executemany(
+                    "UPDATE results SET last_used = ? WHERE analytic = ? AND size = ? AND partial = ? AND full = ?",
+                    [(last_used,) + key for key, last_used in touched.items()],
+                )
+        if self._stored_bytes > self.max_bytes:
+            self._evict()
+
+    @contextmanager
+    def _transaction(self):
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def fingerprint(self, path):
+        """Returns the cheap ``(size, partial hash)`` fingerprint of a file."""
+        with open(path, "rb", buffering=0) as f:
+            size = os.fstat(f.fileno()).st_size
+            if size <= 2 * self.partial_size:
+                return size, _digest(f).hexdigest()
+            h = _digest(f, self.partial_size)
+            f.seek(size - self.partial_size)
+            h.update(_digest(f, self.partial_size).digest())
+            return size, h.hexdigest()
+
+    def full_hash(self, path):
+        """Returns the hash of the whole content of a file."""
+        self.full_hashes += 1
+        with open(path, "rb", buffering=0) as f:
+            return _digest(f).hexdigest()
+
+    def get(self, analytic, path):
+        """Looks up the cached result of `analytic` for the file at `path`.
+
+        Returns
+        -------
+        tuple (bool, object)
+            Whether a result was found, and the result
+        """
+        hit, result, _ = self._lookup(analytic, path)
+        return hit, result
+
+    def put(self, analytic, path, result):
+        """Stores the result of `analytic` for the file at `path`."""
+        size, partial = self.fingerprint(path)
+        self._store(analytic, size, partial, self._full(path, size, partial), result)
+
+    def run(self, func, files, analytic=None):
+        """Calls `func` on the files not already in the cache.
+
+        Parameters
+        ----------
+        func : callable
+            The analytic, called with the absolute path of each file
+        files : iterable of tuple (str, str)
+            (absolute path, path in volume) tuples, e.g. from a volume's ``safe_walk``
+        analytic : str, optional
+            The name results are cached under, by default the function's qualified name. Add a
+            version to it to invalidate results when the analytic changes.
+
+        Returns
+        -------
+        MemoizedRun
+            An iterable of (absolute path, path in volume, result, whether it was cached) tuples
+            with the hit rates of the run
+        """
+        if analytic is None:
+            analytic = f"{func.__module__}.{func.__qualname__}"
+        return MemoizedRun(self, func, files, analytic)
+
+    def _lookup(self, analytic, path):
+        """Returns (hit, result, fingerprint); fingerprint is None if the file cannot be read."""
+        try:
+            size, partial = self.fingerprint(path)
+        except OSError:
+            return False, None, None
+        rows = self._db.execute(
+            "SELECT full, result FROM results WHERE analytic = ? AND size = ? AND partial = ?",
+            (analytic, size, partial),
+        ).fetchall()
+        full = None
+        if rows and self.verify:
+            try:
+                full = self._full(path, size, partial)
+            except OSError:
+                return False, None, None
+            rows = [row for row in rows if row[0] == full]
+        fingerprint = (size, partial, full)
+        if not rows:
+            return False, None, fingerprint
+        stored_full, encoded = rows[0]
+        self._touched[(analytic, size, partial, stored_full)] = time.time()
+        if len(self._touched) >= _TOUCH_EVERY:
+            self.flush()
+        return True, json.loads(encoded), fingerprint
+
+    def _full(self, path, size, partial):
+        """Returns the full hash to key a result by, reading the file only if it is needed."""
+        if not self.verify:
+            return ""
+        if size <= 2 * self.partial_size:
+            # the partial hash already covers the whole file
+            return partial
+        return self.full_hash(path)
+
+    def _store(self, analytic, size, partial, full, result):
+        encoded = json.dumps(result)
+        self._db.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (analytic, size, partial, full, encoded, len(encoded), time.time()),
+        )
+        self._stored_bytes += len(encoded)
+
+    def _evict(self):
+        # other processes write to the same database, so the running total is only an estimate
+        total = self._db.execute("SELECT COALESCE(SUM(nbytes), 0) FROM results").fetchone()[0]
+        target = self.max_bytes * 0.9
+        evicted = 0
+        with self._transaction():
+            while total > target:
+                rows = self._db.execute(
+                    "SELECT analytic, size, partial, full, nbytes FROM results ORDER BY last_used LIMIT 256"
+                ).fetchall()
+                if not rows:
+                    break
+                for analytic, size, partial, full, nbytes in rows:
+                    if total <= target:
+                        break
+                    self._db.execute(
+                        "DELETE FROM results WHERE analytic = ? AND size = ? AND partial = ? AND full = ?",
+                        (analytic, size, partial, full),
+                    )
+                    total -= nbytes
+                    evicted += 1
+        self._stored_bytes = total
+        if evicted:
+            logger.info(f'Evicted {evicted} results from "{self.db_path}"')
+
+
+class MemoizedRun(object):
+    """One pass of an analytic over a set of files through a :class:`ResultCache`.
+
+    Attributes
+    ----------
+    hits, misses, uncached : int
+        Files answered from the cache, files the analytic ran on and stored, and files that
+        could not be fingerprinted, on which the analytic ran without caching
+    bytes_skipped : int
+        The total size of the files answered from the cache
+    full_hashes : int
+        The files that were hashed whole, to verify a partial match or to key a new result
+    seconds : float
+        How long the run took
+    """
+
+    def __init__(self, cache, func, files, analytic):
+        self.cache = cache
+        self.func = func
+        self.files = files
+        self.analytic = analytic
+        self.hits = 0
+        self.misses = 0
+        self.uncached = 0
+        self.bytes_skipped = 0
+        self.seconds = 0.0
+        self._full_hashes_start = None
+        self._full_hashes_end = None
+
+    @property
+    def full_hashes(self):
+        if self._full_hashes_start is None:
+            return 0
+        end = self._full_hashes_end if self._full_hashes_end is not None else self.cache.full_hashes
+        return end - self._full_hashes_start
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses + self.uncached
+        return self.hits / total if total else 0.0
+
+    def __iter__(self):
+        cache = self.cache
+        start = time.perf_counter()
+        self._full_hashes_start = cache.full_hashes
+        try:
+            for full_path, path_within_volume in self.files:
+                hit, result, fingerprint = cache._lookup(self.analytic, full_path)
+                if hit:
+                    self.hits += 1
+                    self.bytes_skipped += fingerprint[0]
+                    yield full_path, path_within_volume, result, True
+                    continue
+
+                result = self.func(full_path)
+                if fingerprint is None:
+                    self.uncached += 1
+                else:
+                    size, partial, full = fingerprint
+                    try:
+                        if full is None:
+                            full = cache._full(full_path, size, partial)
+                        cache._store(self.analytic, size, partial, full, result)
+                        self.misses += 1
+                    except OSError:
+                        self.uncached += 1
+                yield full_path, path_within_volume, result, False
+        finally:
+            self._full_hashes_end = cache.full_hashes
+            cache.flush()
+            self.seconds = time.perf_counter() - start
+            logger.info(
+                f"{self.analytic}: {self.hits} cache hits, {self.misses} misses, {self.uncached} uncached "
+                f"({self.hit_rate:.1%} hit rate, {self.bytes_skipped} bytes skipped) in {self.seconds:.1f}s"
+            )
@@ -0,0 +1,338 @@
+import heapq
+import itertools
+import json
+import os
+import time
+from collections import namedtuple
+
+from thumbtack_client.ScandirWalker import ScandirWalker, WalkStats
+
+# component types of a walk key; files sort before the subdirectories of the same directory
+FILE = 0
+DIR = 1
+
+FILES = "files"
+TREE = "tree"
+
+WorkUnit = namedtuple("WorkUnit", ["kind", "path", "start", "stop"], defaults=(None, None))
+WorkUnit.__doc__ = """A part of a volume's directory tree that can be walked on its own.
+
+`kind` is ``"files"`` for only the files directly in the directory `path`, or ``"tree"`` for
+everything below it. `path` is the path of the directory within the volume, ``""`` for the root.
+A ``"files"`` unit can be limited to the file names from `start` up to but not including `stop`,
+so that the files of one huge directory are shared by several units; None leaves that end open.
+Work units are JSON serializable as ``[kind, path, start, stop]`` lists; ``WorkUnit(*json.loads(s))``
+restores one, also from the ``[kind, path]`` lists of older checkpoints.
+"""
+
+
+def walk_key(path_within_volume):
+    """Returns the sort key of a file in the order resumable walks yield files.
+
+    The key is a tuple of ``(DIR, name)`` for each directory in the path followed by
+    ``(FILE, name)``, so that within a directory files come first, ordered by name, followed by
+    the subdirectories in name order, each walked depth-first.
+    """
+    parts = path_within_volume.split(os.sep)
+    return tuple((DIR, p) for p in parts[:-1]) + ((FILE, parts[-1]),)
+
+
+def _dir_key(path):
+    return tuple((DIR, p) for p in path.split(os.sep)) if path else ()
+
+
+def _unit_key(unit):
+    # the files of a directory come before its subdirectories
+    if unit.kind == FILES:
+        return _dir_key(unit.path) + ((FILE, unit.start or ""),)
+    return _dir_key(unit.path)
+
+
+def _in_range(unit, name):
+    return (unit.start is None or name >= unit.start) and (unit.stop is None or name < unit.stop)
+
+
+def dump_cursor(path_within_volume):
+    """Serializes the cursor after `path_within_volume` as a JSON string."""
+    return json.dumps([list(c) for c in walk_key(path_within_volume)])
+
+
+def load_cursor(cursor):
+    """Parses a cursor serialized by :func:`dump_cursor`, returning its walk key."""
+    return tuple((int(kind), name) for kind, name in json.loads(cursor))
+
+
+class ResumableWalker(object):
+    """A walk in a stable order that can be resumed after a crash, and split into work units.
+
+    Files are yielded in :func:`walk_key` order: within each directory, the files sorted by name,
+    then each subdirectory in name order, depth-first. Because the order only depends on the
+    names in the tree, the position of a walk is fully described by the last file yielded. That
+    position, :attr:`cursor`, is a JSON string; a walker created with it yields exactly the files
+    after it, listing only the directories on the path to it again.
+
+    With `checkpoint_path`, the cursor is written to that file atomically every
+    `checkpoint_every` files, and a new walker with the same `checkpoint_path` resumes from it. A
+    file counts as done once the next one is requested, so after a crash the file that was being
+    processed is yielded again.
+
+    :func:`plan_units` splits a tree into :class:`WorkUnit` objects for different workers, each
+    walked by a ResumableWalker created with `unit`, and :func:`merge_units` joins their outputs
+    back into the order of a single walk, checking for duplicates and gaps.
+
+    Each directory is listed completely and sorted before its files are yielded, so memory use
+    grows with the size of the largest directory rather than staying constant.
+
+    Examples
+    --------
+    >>> walker = volume.resumable_walk(checkpoint_path="/var/lib/jobs/vol2.json")
+    >>> for full_path, path_within_volume in walker:
+    ...     process(full_path)
+    """
+
+    def __init__(self, root, cursor=None, unit=None, checkpoint_path=None, checkpoint_every=1000,
+                 file_filter=None, safe=False, metrics=None):
+        """Create a ResumableWalker object.
+
+        Parameters
+        ----------
+        root : str
+            The absolute path of the directory to walk, usually a volume mountpoint
+        cursor : str, optional
+            Resume after this cursor, as returned by :attr:`cursor`
+        unit : WorkUnit, optional
+            Only walk this part of the tree
+        checkpoint_path : str, optional
+            A file the cursor is saved to, and resumed from if it exists and `cursor` is not given
+        checkpoint_every : int, optional
+            The number of files between checkpoints
+        file_filter : callable or thumbtack_client.WalkFilter.WalkFilter, optional
+            Limits the files yielded, as for ``safe_walk``
+        safe : bool, optional
+            Skip broken symlinks, files that can't be read, and files that are not regular files
+        metrics : thumbtack_client.Metrics.Metrics, optional
+            Receives the counts of each completed walk
+        """
+        self.root = root
+        self.unit = WorkUnit(*unit) if unit is not None else WorkUnit(TREE, "")
+        if self.unit.kind not in (FILES, TREE):
+            raise ValueError(f"Unknown work unit kind {self.unit.kind!r}")
+        if self.unit.kind == TREE and (self.unit.start is not None or self.unit.stop is not None):
+            raise ValueError(f"Only files work units can have a name range: {self.unit}")
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.done = False
+        self._scanner = ScandirWalker(root, file_filter=file_filter, safe=safe, metrics=metrics)
+        self._last = None
+        self._since_checkpoint = 0
+
+        if cursor is None and checkpoint_path is not None and os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as f:
+                saved = json.load(f)
+            if saved["root"] != root or WorkUnit(*saved["unit"]) != self.unit:
+                raise ValueError(f"Checkpoint {checkpoint_path} is of another walk: {saved['root']} {saved['unit']}")
+            cursor = saved["cursor"]
+            self.done = saved["done"]
+        self._after = load_cursor(cursor) if cursor is not None else None
+        self._resumed_from = cursor
+
+        prefix = _dir_key(self.unit.path)
+        if self._after is not None and self._after[:len(prefix)] != prefix:
+            raise ValueError(f"Cursor {cursor} is outside the work unit {self.unit}")
+
+    @property
+    def stats(self):
+        """The :class:`~thumbtack_client.ScandirWalker.WalkStats` of the walks done."""
+        return self._scanner.stats
+
+    @property
+    def cursor(self):
+        """The position after the last file that was processed, as a JSON string, or None."""
+        if self._last is None:
+            return self._resumed_from
+        return dump_cursor(self._last)
+
+    def __iter__(self):
+        return self.walk()
+
+    def walk(self):
+        """Walks the files after the cursor.
+
+        Yields
+        ------
+        tuple (str, str)
+            A tuple that contains (absolute path, path in volume)
+        """
+        if self.done:
+            return
+        start = time.perf_counter()
+        stats = WalkStats()
+        top = self.unit.path
+        top_dirpath = os.path.join(self.root, top) if top else self.root
+        stack = [(top_dirpath, top, self._after[len(_dir_key(top)):] if self._after else None)]
+        while stack:
+            dirpath, relpath, after = stack.pop()
+            head = after[0] if after else None
+            subdirs = []
+            files = sorted(self._scanner.scan_dir(dirpath, relpath, subdirs, stats))
+
+            if head is None or head[0] == FILE:
+                for full_path, path_within_volume in files:
+                    name = os.path.basename(full_path)
+                    if head is not None and name <= head[1]:
+                        continue
+                    if not _in_range(self.unit, name):
+                        continue
+                    yield full_path, path_within_volume
+                    self._advance(path_within_volume)
+
+            if self.unit.kind == FILES:
+                break
+            children = []
+            for sub_dirpath, sub_relpath in sorted(subdirs, key=lambda s: s[1]):
+                name = os.path.basename(sub_dirpath)
+                if head is None or head[0] == FILE or name > head[1]:
+                    children.append((sub_dirpath, sub_relpath, None))
+                elif name == head[1]:
+                    children.append((sub_dirpath, sub_relpath, after[1:]))
+            stack.extend(reversed(children))
+
+        self.done = True
+        self.checkpoint()
+        self._scanner.finish(stats, time.perf_counter() - start)
+
+    def _advance(self, path_within_volume):
+        self._last = path_within_volume
+        self._since_checkpoint += 1
+        if self._since_checkpoint >= self.checkpoint_every:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Saves the cursor to `checkpoint_path`, replacing the previous checkpoint atomically."""
+        self._since_checkpoint = 0
+        if self.checkpoint_path is None:
+            return
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"root": self.root, "unit": list(self.unit), "cursor": self.cursor, "done": self.done}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+
+def _count_tree(scanner, root):
+    """Returns ``[files, subdirectories, files in the subtree]`` for every directory below `root`."""
+    counts = {}
+    order = []
+    stack = [""]
+    stats = WalkStats()
+    while stack:
+        relpath = stack.pop()
+        subdirs = []
+        files = sum(1 for _ in scanner.scan_dir(os.path.join(root, relpath) if relpath else root, relpath,
+                                                subdirs, stats))
+        counts[relpath] = [files, [sub_relpath for _, sub_relpath in subdirs], files]
+        order.append(relpath)
+        stack.extend(sub_relpath for _, sub_relpath in subdirs)
+    # subdirectories come after their parents, so walking backwards totals them first
+    for relpath in reversed(order):
+        files, subdirs, _ = counts[relpath]
+        counts[relpath][2] = files + sum(counts[sub_relpath][2] for sub_relpath in subdirs)
+    return counts
+
+
+def _split_files(scanner, root, relpath, size):
+    names = sorted(os.path.basename(full_path) for full_path, _ in
+                   scanner.scan_dir(os.path.join(root, relpath) if relpath else root, relpath, [], WalkStats()))
+    bounds = names[size::size]
+    return [WorkUnit(FILES, relpath, start, stop) for start, stop in zip([None] + bounds, bounds + [None])]
+
+
+def plan_units(root, count=64, file_filter=None):
+    """Splits the directory tree below `root` into about `count` work units of similar size.
+
+    The files of every directory are counted first, so planning lists the whole tree once. The
+    unit with the most files is then split until no unit holds more than a `count`-th of the
+    files: a ``tree`` unit is replaced by a ``files`` unit for its directory and a ``tree`` unit
+    for each subdirectory, and a ``files`` unit by ``files`` units for ranges of its file names.
+    While there are fewer than `count` units, the largest ``tree`` units are split further. The
+    units do not overlap and together cover every file of the tree.
+
+    Parameters
+    ----------
+    root : str
+        The absolute path of the directory to split, usually a volume mountpoint
+    count : int, optional
+        The number of work units wanted
+    file_filter : thumbtack_client.WalkFilter.WalkFilter, optional
+        Directories it excludes are left out of the plan. Pass the same filter to the walkers.
+
+    Returns
+    -------
+    list of WorkUnit
+        In walk order
+    """
+    scanner = ScandirWalker(root, file_filter=file_filter)
+    counts = _count_tree(scanner, root)
+    target = max(1, -(-counts[""][2] // count))
+    sequence = itertools.count()
+    # the largest unit first
+    heap = [(-counts[""][2], next(sequence), WorkUnit(TREE, ""))]
+    units = []
+    while heap:
+        size, _, unit = heapq.heappop(heap)
+        size = -size
+        files, subdirs, _ = counts[unit.path]
+        if unit.kind == TREE and (size > target or (subdirs and len(units) + len(heap) < count)):
+            heapq.heappush(heap, (-files, next(sequence), WorkUnit(FILES, unit.path)))
+            for sub_relpath in subdirs:
+                heapq.heappush(heap, (-counts[sub_relpath][2], next(sequence), WorkUnit(TREE, sub_relpath)))
+        elif unit.kind == FILES and unit.start is None and unit.stop is None and size > target:
+            units.extend(_split_files(scanner, root, unit.path, target))
+        else:
+            units.append(unit)
+    return sorted(units, key=_unit_key)
+
+
+def merge_units(units, outputs):
+    """Joins the outputs of walks of work units into the order of a single walk.
+
+    Parameters
+    ----------
+    units : list of WorkUnit
+        The planned units, as returned by :func:`plan_units`
+    outputs : dict
+        Work unit to the iterable of (absolute path, path in volume) tuples its walk yielded
+
+    Yields
+    ------
+    tuple (str, str)
+        A tuple that contains (absolute path, path in volume)
+
+    Raises
+    ------
+    ValueError
+        If a unit has no output, an output belongs to no unit, or a file is yielded twice or by
+        the wrong unit
+    """
+    units = [WorkUnit(*u) for u in units]
+    outputs = {WorkUnit(*u): items for u, items in outputs.items()}
+    missing = [u for u in units if u not in outputs]
+    if missing:
+        raise ValueError(f"No output for work units {missing}")
+    unknown = [u for u in outputs if u not in set(units)]
+    if unknown:
+        raise ValueError(f"Output for work units that were not planned: {unknown}")
+
+    previous = None
+    for unit in sorted(units, key=_unit_key):
+        prefix = _dir_key(unit.path)
+        for item in outputs[unit]:
+            key = walk_key(item[1])
+            if key[:len(prefix)] != prefix or (unit.kind == FILES and (len(key) != len(prefix) + 1
+                                                                       or not _in_range(unit, key[-1][1]))):
+                raise ValueError(f"{item[1]} does not belong to work unit {unit}")
+            if previous is not None and key <= previous:
+                raise ValueError(f"{item[1]} is out of order or yielded twice")
+            previous = key
+            yield item
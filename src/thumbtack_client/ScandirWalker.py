@@ -0,0 +1,277 @@
+import logging
+import os
+import stat
+import time
+
+from thumbtack_client.WalkFilter import WalkFilter
+
+logger = logging.getLogger("thumbtack_client")
+
+SKIP_BROKEN_SYMLINK = "Path does not exist (broken symlink?)"
+SKIP_UNREADABLE = "File not accessible for reading"
+SKIP_NOT_REGULAR = "File is not a regular file"
+
+# short names of the skip reasons, used as metric labels
+SKIP_REASONS = {
+    SKIP_BROKEN_SYMLINK: "broken_symlink",
+    SKIP_UNREADABLE: "unreadable",
+    SKIP_NOT_REGULAR: "not_regular",
+}
+
+
+def batched(items, size):
+    """Groups an iterable into lists of `size` items; the last list may be shorter.
+
+    Yields
+    ------
+    list
+        The next `size` items
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class WalkStats(object):
+    """Counts the files yielded and skipped by a walk.
+
+    Skipped files are counted by reason, and only a sample of them is logged: the first
+    `log_first` of each reason, then every `log_every`-th. A summary is logged by :meth:`log_summary`.
+
+    Attributes
+    ----------
+    files : int
+        The number of files yielded
+    bytes : int
+        The total size of the yielded files that were ``stat``-ed
+    skipped : dict
+        Skip reason (see SKIP_REASONS) to the number of files skipped for it
+    """
+
+    def __init__(self, log_first=10, log_every=10000):
+        self.files = 0
+        self.bytes = 0
+        self.skipped = {}
+        self.log_first = log_first
+        self.log_every = log_every
+
+    def skip(self, msg, full_path):
+        """Counts a skipped file, logging it if it is part of the sample."""
+        reason = SKIP_REASONS.get(msg, msg)
+        n = self.skipped.get(reason, 0) + 1
+        self.skipped[reason] = n
+        if n <= self.log_first:
+            logger.info(f'Not processing mounted file "{full_path}": {msg}')
+        elif n % self.log_every == 0:
+            logger.info(f'Not processing mounted file "{full_path}": {msg} ({n} files skipped for this reason so far)')
+
+    def merge(self, other):
+        self.files += other.files
+        self.bytes += other.bytes
+        for reason, count in other.skipped.items():
+            self.skipped[reason] = self.skipped.get(reason, 0) + count
+
+    def log_summary(self, root):
+        if self.skipped:
+            counts = ", ".join(f"{count} {reason}" for reason, count in sorted(self.skipped.items()))
+            logger.info(f'Skipped files in "{root}": {counts}')
+
+
+class ScandirWalker(object):
+    """Walks a directory tree using :func:`os.scandir`.
+
+    This yields the same ``(absolute path, path in volume)`` tuples as
+    :meth:`~thumbtack_client.MountedDiskImageVolume.MountedDiskImageVolume.walk`, in the same
+    top-down order, but it reuses the type information returned with each directory entry and
+    builds the path within the volume incrementally instead of calling :func:`os.path.relpath`.
+
+    In safe mode the checks done by
+    :meth:`~thumbtack_client.MountedDiskImageVolume.MountedDiskImageVolume.safe_walk` are fused
+    into a single ``stat`` per file: a failed ``stat`` means the path does not exist (a broken
+    symlink), and readability is derived from the permission bits instead of calling
+    :func:`os.access`. POSIX ACLs are not consulted.
+
+    Attributes
+    ----------
+    root : str
+        The absolute path of the directory to walk.
+    file_filter : callable or None
+        A callable that accepts the absolute path of a file and returns whether to yield it.
+    walk_filter : thumbtack_client.WalkFilter.WalkFilter or None
+        A structured filter evaluated against each directory entry before any path work, which
+        also prunes excluded directories.
+    safe : bool
+        Whether to skip broken symlinks, unreadable files and files that are not regular files.
+    metrics : thumbtack_client.Metrics.Metrics or None
+        Receives the counts of each completed walk.
+    stats : WalkStats
+        The counts of the walks done with :meth:`walk`.
+    """
+
+    def __init__(self, root, file_filter=None, safe=False, metrics=None):
+        """Create a ScandirWalker object.
+
+        Parameters
+        ----------
+        root : str
+            The absolute path of the directory to walk, usually a volume mountpoint.
+        file_filter : callable or thumbtack_client.WalkFilter.WalkFilter, optional
+            A callable that accepts `mounted_file_path_on_disk` and returns a boolean
+            of whether to yield that file, or a WalkFilter.
+        safe : bool, optional
+            Skip broken symlinks, files that can't be read, and named pipes.
+        metrics : thumbtack_client.Metrics.Metrics, optional
+            Receives the counts of each completed walk.
+        """
+        self.root = root
+        if isinstance(file_filter, WalkFilter):
+            self.walk_filter = file_filter
+            self.file_filter = None
+        else:
+            self.walk_filter = None
+            self.file_filter = file_filter
+        self.safe = safe
+        self.metrics = metrics
+        self.stats = WalkStats()
+        # whether each yielded entry has already been stat-ed by the checks or the filter
+        self._stat_cached = safe or (self.walk_filter is not None and self.walk_filter.needs_stat)
+        self._uid = os.getuid()
+        self._gids = set(os.getgroups())
+        self._gids.add(os.getgid())
+
+    def __iter__(self):
+        return self.walk()
+
+    def walk(self):
+        """Walks through every file below :attr:`root`.
+
+        Yields
+        ------
+        tuple (str, str)
+            A tuple that contains (absolute path, path in volume)
+        """
+        start = time.perf_counter()
+        stats = WalkStats()
+        stack = [(self.root, "")]
+        while stack:
+            dirpath, relpath = stack.pop()
+            subdirs = []
+            for item in self.scan_dir(dirpath, relpath, subdirs, stats):
+                yield item
+            # reversed so that subdirectories are visited in listing order, like os.walk
+            stack.extend(reversed(subdirs))
+        self.finish(stats, time.perf_counter() - start)
+
+    def finish(self, stats, seconds):
+        """Records the counts of a completed walk in :attr:`stats` and :attr:`metrics`."""
+        stats.log_summary(self.root)
+        self.stats.merge(stats)
+        if self.metrics is not None:
+            self.metrics.observe_walk(stats, seconds)
+
+    def scan_dir(self, dirpath, relpath, subdirs, stats=None):
+        """Lists a single directory without descending into it.
+
+        Parameters
+        ----------
+        dirpath : str
+            The absolute path of the directory to list.
+        relpath : str
+            The path of the directory within the volume; the empty string for the root.
+        subdirs : list
+            Receives a ``(dirpath, relpath)`` tuple for each subdirectory to descend into.
+            Symlinks to directories are not followed, matching :func:`os.walk`, and directories
+            excluded by :attr:`walk_filter` are left out.
+        stats : WalkStats, optional
+            Receives the file and skip counts. Defaults to :attr:`stats`; callers listing
+            directories from several threads should pass one per thread.
+
+        Yields
+        ------
+        tuple (str, str)
+            A tuple that contains (absolute path, path in volume) for each file in the directory
+        """
+        try:
+            scandir_it = os.scandir(dirpath)
+        except OSError:
+            return
+
+        prefix = relpath + os.sep if relpath else ""
+        walk_filter = self.walk_filter
+        if stats is None:
+            stats = self.stats
+        with scandir_it:
+            while True:
+                # only the listing itself is guarded; errors raised by filters propagate
+                try:
+                    entry = next(scandir_it)
+                except StopIteration:
+                    return
+                except OSError:
+                    # the directory became unreadable part way through; keep what was listed
+                    return
+
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+
+                if is_dir:
+                    if not entry.is_symlink():
+                        sub_relpath = prefix + entry.name
+                        if walk_filter is None or walk_filter.include_dir(entry.name, sub_relpath):
+                            subdirs.append((entry.path, sub_relpath))
+                    continue
+
+                if walk_filter is not None and not walk_filter.include_entry(entry):
+                    continue
+                full_path = entry.path
+                if self.file_filter is not None and not self.file_filter(full_path):
+                    continue
+                if self.safe:
+                    msg = self._check_entry(entry)
+                    if msg is not None:
+                        stats.skip(msg, full_path)
+                        continue
+                if self._stat_cached:
+                    try:
+                        stats.bytes += entry.stat().st_size
+                    except OSError:
+                        pass
+                stats.files += 1
+                yield full_path, prefix + entry.name
+
+    def _check_entry(self, entry):
+        """Returns the reason to skip `entry`, or None if it is a readable regular file."""
+        # Entries that are known not to be regular files or symlinks need no stat at all
+        if not entry.is_symlink() and not entry.is_file(follow_symlinks=False):
+            return SKIP_NOT_REGULAR
+
+        try:
+            st = entry.stat()
+        except OSError:
+            # Check for broken symlinks, observed on mounted NTFS reparse points
+            return SKIP_BROKEN_SYMLINK
+
+        if not self._readable(st):
+            return SKIP_UNREADABLE
+
+        # Ensure is regular file. Avoids named pipes, among other things
+        if not stat.S_ISREG(st.st_mode):
+            return SKIP_NOT_REGULAR
+        return None
+
+    def _readable(self, st):
+        """Mirrors ``os.access(path, os.R_OK)`` using the permission bits from `st`."""
+        if self._uid == 0:
+            return True
+        if st.st_uid == self._uid:
+            return bool(st.st_mode & stat.S_IRUSR)
+        if st.st_gid in self._gids:
+            return bool(st.st_mode & stat.S_IRGRP)
+        return bool(st.st_mode & stat.S_IROTH)
@@ -0,0 +1,220 @@
+import bisect
+import hashlib
+import logging
+import os
+import threading
+import time
+
+import thumbtack_client
+from thumbtack_client.MountedDiskImage import is_mount_of
+from thumbtack_client.ThumbtackClientException import ThumbtackClientException
+from thumbtack_client.ThumbtackServerUnavailableException import ThumbtackServerUnavailableException
+
+logger = logging.getLogger("thumbtack_client")
+
+LEAST_LOADED = "least_loaded"
+CONSISTENT_HASH = "consistent_hash"
+
+
+class ThumbtackClientPool(object):
+    """Spreads mounts over several Thumbtack servers.
+
+    :meth:`mount_image` places each image on a server chosen by `policy`:
+
+    ``least_loaded``
+        the server with the fewest mounted images. The mounts of every server are listed at
+        most every `refresh_interval` seconds; in between, the pool counts the mounts and
+        unmounts it made itself and the mounts it has in flight
+    ``consistent_hash``
+        the server owning the image path on a hash ring, so an image always lands on the same
+        server while the set of servers is stable
+
+    An image that is already mounted on one of the servers, as of the last listing, is not
+    mounted again elsewhere. The pool remembers which server owns each mount so that
+    :meth:`unmount_image` is routed there. A server that cannot be reached, or fails to list its
+    mounts, is skipped for `failure_cooldown` seconds and the next candidate is tried.
+
+    Examples
+    --------
+    >>> pool = ThumbtackClientPool(["http://thumbtack1:8208", "http://thumbtack2:8208"])
+    >>> mount = pool.mount_image("/images/a.E01")
+    >>> pool.owner_of("/images/a.E01")
+    'http://thumbtack2:8208'
+    """
+
+    def __init__(self, servers, policy=LEAST_LOADED, failure_cooldown=30.0, refresh_interval=30.0, replicas=64,
+                 **client_kwargs):
+        """Create a ThumbtackClientPool object.
+
+        Parameters
+        ----------
+        servers : list of str or ThumbtackClient
+            Server urls, or clients that are already configured
+        policy : str, optional
+            ``least_loaded`` or ``consistent_hash``
+        failure_cooldown : float, optional
+            Seconds an unreachable server is skipped for
+        refresh_interval : float, optional
+            Seconds between listings of the servers' mounts by the ``least_loaded`` policy
+        replicas : int, optional
+            Points per server on the consistent hash ring
+        client_kwargs : optional
+            Arguments for the :class:`~thumbtack_client.ThumbtackClient` created for each url
+        """
+        if policy not in (LEAST_LOADED, CONSISTENT_HASH):
+            raise ValueError(f"Unknown placement policy {policy!r}")
+        self.policy = policy
+        self.failure_cooldown = failure_cooldown
+        self.refresh_interval = refresh_interval
+        self.clients = {}
+        for server in servers:
+            if isinstance(server, str):
+                server = thumbtack_client.ThumbtackClient(server, **client_kwargs)
+            self.clients[server.url] = server
+        if not self.clients:
+            raise ValueError("ThumbtackClientPool needs at least one server")
+
+        self._owners = {}
+        self._in_flight = {url: 0 for url in self.clients}
+        self._down_until = {}
+        # server url to the names of its mounted images, as last listed plus this pool's changes
+        self._names = {}
+        self._refreshed = None
+        self._lock = threading.Lock()
+        self._ring = sorted((_hash(f"{url}#{i}"), url) for url in self.clients for i in range(replicas))
+        self._ring_keys = [h for h, _ in self._ring]
+
+    def owner_of(self, image_path):
+        """Returns the url of the server this pool mounted `image_path` on, or None."""
+        with self._lock:
+            return self._owners.get(image_path)
+
+    def list_mounted_images(self):
+        """Lists the mounted images of every reachable server.
+
+        Servers that fail to answer are left out and skipped for `failure_cooldown` seconds.
+
+        Returns
+        -------
+        dict
+            Server url to its list of JSON serialized mounted image dictionaries
+        """
+        mounts = {}
+        for url in self._available(list(self.clients)):
+            try:
+                mounts[url] = self.clients[url].list_mounted_images()
+            except ThumbtackClientException as e:
+                self._mark_down(url, e)
+        names = {url: {mount.get("name") for mount in images if isinstance(mount, dict)}
+                 for url, images in mounts.items()}
+        with self._lock:
+            self._names = names
+            self._refreshed = time.monotonic()
+        return mounts
+
+    def mount_image(self, image_path, creds=None):
+        """Mounts `image_path` on the server chosen by the placement policy.
+
+        Returns
+        -------
+        dict
+            The JSON serialized dictionary of the mounted image
+
+        Raises
+        ------
+        ThumbtackServerUnavailableException
+            If no server could be reached
+        """
+        candidates = self._candidates(image_path)
+        last_error = None
+        for url in candidates:
+            with self._lock:
+                self._in_flight[url] += 1
+            try:
+                mount = self.clients[url].mount_image(image_path, creds=creds)
+            except ThumbtackServerUnavailableException as e:
+                self._mark_down(url, e)
+                last_error = e
+                continue
+            finally:
+                with self._lock:
+                    self._in_flight[url] -= 1
+            with self._lock:
+                self._owners[image_path] = url
+                if url in self._names:
+                    self._names[url].add(os.path.split(image_path)[1])
+            return mount
+        raise ThumbtackServerUnavailableException(f"No Thumbtack server could mount {image_path}: {last_error}")
+
+    def unmount_image(self, image_path):
+        """Unmounts `image_path` from the server that owns it.
+
+        If the owner is not known, e.g. after a restart, the servers are asked for their mounts.
+
+        Returns
+        -------
+        dict
+            The JSON serialized response
+        """
+        url = self.owner_of(image_path)
+        if url is None:
+            url = self._find_owner(image_path)
+            if url is None:
+                raise ThumbtackClientException(f"{image_path} is not mounted on any server in the pool")
+        response = self.clients[url].unmount_image(image_path)
+        with self._lock:
+            self._owners.pop(image_path, None)
+            self._names.get(url, set()).discard(os.path.split(image_path)[1])
+        return response
+
+    def _candidates(self, image_path):
+        """Returns the servers to try for a mount, best first."""
+        if self.policy == CONSISTENT_HASH:
+            urls = []
+            start = bisect.bisect(self._ring_keys, _hash(image_path))
+            for i in range(len(self._ring)):
+                url = self._ring[(start + i) % len(self._ring)][1]
+                if url not in urls:
+                    urls.append(url)
+            return self._available(urls)
+
+        with self._lock:
+            stale = self._refreshed is None or time.monotonic() - self._refreshed >= self.refresh_interval
+        if stale:
+            self.list_mounted_images()
+        name = os.path.split(image_path)[1]
+        with self._lock:
+            load = {url: len(names) + self._in_flight[url] for url, names in self._names.items()}
+            holder = self._owners.get(image_path)
+            if holder not in load:
+                holder = next((url for url, names in self._names.items() if name in names), None)
+        # the server that already holds the image first, then the least loaded
+        listed = sorted(load, key=lambda url: (url != holder, load[url]))
+        return self._available(listed) + [u for u in self._available(list(self.clients)) if u not in load]
+
+    def _find_owner(self, image_path):
+        for url, images in self.list_mounted_images().items():
+            if _contains(images, image_path):
+                return url
+        return None
+
+    def _available(self, urls):
+        """Drops servers in their failure cooldown, unless every server is."""
+        now = time.monotonic()
+        with self._lock:
+            up = [url for url in urls if self._down_until.get(url, 0) <= now]
+        return up or urls
+
+    def _mark_down(self, url, error):
+        logger.warning(f"Thumbtack server {url} failed, skipping it for {self.failure_cooldown}s: {error}")
+        with self._lock:
+            self._down_until[url] = time.monotonic() + self.failure_cooldown
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+def _contains(mounts, image_path):
+    """Whether one of the JSON serialized `mounts` is of `image_path`."""
+    return any(is_mount_of(mount, image_path) for mount in mounts)
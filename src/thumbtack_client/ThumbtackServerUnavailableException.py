@@ -0,0 +1,5 @@
+from thumbtack_client.ThumbtackClientException import ThumbtackClientException
+
+
+class ThumbtackServerUnavailableException(ThumbtackClientException):
+    pass
@@ -0,0 +1,268 @@
+import heapq
+import json
+import os
+import tempfile
+from collections import namedtuple
+
+from thumbtack_client.VolumeHasher import hash_file
+
+ADDED = "added"
+REMOVED = "removed"
+CHANGED = "changed"
+
+ListingEntry = namedtuple("ListingEntry", ["path_within_volume", "size", "mtime_ns", "digest"])
+ListingEntry.__doc__ = """One file of a sorted listing. `digest` is None unless the listing was hashed."""
+
+DiffEntry = namedtuple("DiffEntry", ["status", "path_within_volume", "old", "new", "reasons"])
+DiffEntry.__doc__ = """One difference between two listings.
+
+`status` is ``added``, ``removed`` or ``changed``; `old` and `new` are the
+:class:`ListingEntry` of each side, None for the side a file is missing from; `reasons` lists
+what changed: ``size``, ``mtime`` and ``hash``.
+"""
+
+
+def _dump(entry):
+    return json.dumps(list(entry)) + "\n"
+
+
+def _load(line):
+    return ListingEntry(*json.loads(line))
+
+
+def _entries(volume, digest, file_filter):
+    for full_path, path_within_volume in volume.safe_scandir_walk(file_filter):
+        try:
+            st = os.stat(full_path)
+            hexdigest = hash_file(full_path, (digest,))[1][digest] if digest else None
+        except OSError:
+            continue
+        yield ListingEntry(path_within_volume, st.st_size, st.st_mtime_ns, hexdigest)
+
+
+def sorted_listing(volume, digest=None, max_in_memory=100000, tmpdir=None, file_filter=None):
+    """Lists the files of a volume sorted by path, using an external merge sort.
+
+    Entries are sorted in memory in runs of `max_in_memory`; longer listings are spilled to
+    temporary files run by run and merged back, so memory use stays bounded however many
+    files the volume holds.
+
+    Parameters
+    ----------
+    volume : thumbtack_client.MountedDiskImageVolume.MountedDiskImageVolume
+        The volume to list, walked with ``safe_scandir_walk``
+    digest : str, optional
+        A :func:`hashlib.new` name to hash every file with
+    max_in_memory : int, optional
+        The number of entries sorted in memory at a time
+    tmpdir : str, optional
+        Where to put spilled runs
+    file_filter : callable or thumbtack_client.WalkFilter.WalkFilter, optional
+        Limits the files listed, as for ``safe_walk``
+
+    Yields
+    ------
+    ListingEntry
+        In path order
+    """
+    runs = []
+    run = []
+    try:
+        for entry in _entries(volume, digest, file_filter):
+            run.append(entry)
+            if len(run) >= max_in_memory:
+                run.sort()
+                spill = tempfile.TemporaryFile("w+", dir=tmpdir, prefix="thumbtack-listing-")
+                spill.writelines(_dump(e) for e in run)
+                spill.seek(0)
+                runs.append(spill)
+                run = []
+        run.sort()
+        if not runs:
+            for entry in run:
+                yield entry
+            return
+        for entry in heapq.merge(run, *[(_load(line) for line in spill) for spill in runs]):
+            yield entry
+    finally:
+        for spill in runs:
+            spill.close()
+
+
+def save_listing(volume, path, digest=None, max_in_memory=100000, tmpdir=None, file_filter=None):
+    """Saves the sorted listing of a volume as JSON lines, e.g. as the baseline of later diffs.
+
+    The first line is a header recording `digest`, so that diffs only compare the stored hashes
+    with hashes of the same algorithm.
+
+    Returns
+    -------
+    int
+        The number of files listed
+    """
+    count = 0
+    with open(path, "w") as f:
+        f.write(json.dumps({"digest": digest}) + "\n")
+        for entry in sorted_listing(volume, digest, max_in_memory, tmpdir, file_filter):
+            f.write(_dump(entry))
+            count += 1
+    return count
+
+
+def load_listing(path):
+    """Reads a listing saved by :func:`save_listing`.
+
+    Yields
+    ------
+    ListingEntry
+        In path order
+
+    Raises
+    ------
+    ValueError
+        If the listing is not sorted
+    """
+    previous = None
+    with open(path) as f:
+        for line in f:
+            if previous is None and line.startswith("{"):
+                # the header
+                continue
+            entry = _load(line)
+            if previous is not None and entry.path_within_volume <= previous:
+                raise ValueError(f"Listing {path} is not sorted at {entry.path_within_volume}")
+            previous = entry.path_within_volume
+            yield entry
+
+
+def listing_digest(path):
+    """Returns the digest name a listing saved by :func:`save_listing` was hashed with, or None."""
+    with open(path) as f:
+        line = f.readline()
+    if not line.startswith("{"):
+        # written before listings had a header
+        return None
+    return json.loads(line)["digest"]
+
+
+class VolumeDiff(object):
+    """Streams the differences between the files of two volumes, or a volume and a saved listing.
+
+    Both sides are turned into listings sorted by path, with :func:`sorted_listing` for a volume
+    or :func:`load_listing` for a saved listing, and merged in a single pass, so memory use is
+    bounded by `max_in_memory` entries rather than the number of files.
+
+    A file present on both sides is changed if its size differs, if its mtime differs and
+    `compare_mtime` is set, or, with `digest`, if its content hash differs. Hashes are only
+    computed for files of equal size, reading them from the volumes, or taken from a saved
+    listing that was hashed with the same `digest`; a saved listing hashed with another digest,
+    or without one, cannot be compared by content and raises ValueError.
+
+    Examples
+    --------
+    >>> for d in baseline_volume.diff(suspect_volume, digest="sha256"):
+    ...     print(d.status, d.path_within_volume, d.reasons)
+
+    Attributes
+    ----------
+    added, removed, changed, unchanged : int
+        Counts of the files compared so far
+    """
+
+    def __init__(self, old, new, digest=None, compare_mtime=True, max_in_memory=100000, tmpdir=None,
+                 file_filter=None):
+        """Create a VolumeDiff object.
+
+        Parameters
+        ----------
+        old, new : thumbtack_client.MountedDiskImageVolume.MountedDiskImageVolume or str
+            The volumes to compare, or paths of listings saved with :func:`save_listing`
+        digest : str, optional
+            A :func:`hashlib.new` name to compare the contents of files of equal size with
+        compare_mtime : bool, optional
+            Whether a different mtime alone makes a file changed
+        max_in_memory : int, optional
+            The number of entries sorted in memory at a time for each volume
+        tmpdir : str, optional
+            Where to put spilled runs
+        file_filter : callable or thumbtack_client.WalkFilter.WalkFilter, optional
+            Limits the files compared on volume sides, as for ``safe_walk``
+        """
+        self.old = old
+        self.new = new
+        self.digest = digest
+        self.compare_mtime = compare_mtime
+        self.max_in_memory = max_in_memory
+        self.tmpdir = tmpdir
+        self.file_filter = file_filter
+        self.added = 0
+        self.removed = 0
+        self.changed = 0
+        self.unchanged = 0
+
+    def __iter__(self):
+        return self.run()
+
+    def _listing(self, side):
+        if isinstance(side, str):
+            saved_digest = listing_digest(side)
+            if self.digest and saved_digest is None:
+                raise ValueError(f"Listing {side} was saved without hashes, so it can't be compared by {self.digest}")
+            if self.digest and saved_digest != self.digest:
+                raise ValueError(f"Listing {side} was hashed with {saved_digest}, not {self.digest}")
+            return load_listing(side)
+        return sorted_listing(side, max_in_memory=self.max_in_memory, tmpdir=self.tmpdir, file_filter=self.file_filter)
+
+    def _hash(self, side, entry):
+        if entry.digest is not None:
+            return entry.digest
+        if isinstance(side, str):
+            return None
+        try:
+            return hash_file(os.path.join(side.mountpoint, entry.path_within_volume), (self.digest,))[1][self.digest]
+        except OSError:
+            return None
+
+    def _reasons(self, old, new):
+        if old.size != new.size:
+            return ("size",)
+        reasons = []
+        if self.compare_mtime and old.mtime_ns != new.mtime_ns:
+            reasons.append("mtime")
+        if self.digest:
+            old_hash = self._hash(self.old, old)
+            new_hash = self._hash(self.new, new)
+            if old_hash is not None and new_hash is not None and old_hash != new_hash:
+                reasons.append("hash")
+        return tuple(reasons)
+
+    def run(self):
+        """Compares the two sides.
+
+        Yields
+        ------
+        DiffEntry
+            For each added, removed or changed file, in path order
+        """
+        old_it = self._listing(self.old)
+        new_it = self._listing(self.new)
+        old = next(old_it, None)
+        new = next(new_it, None)
+        while old is not None or new is not None:
+            if new is None or (old is not None and old.path_within_volume < new.path_within_volume):
+                self.removed += 1
+                yield DiffEntry(REMOVED, old.path_within_volume, old, None, ())
+                old = next(old_it, None)
+            elif old is None or new.path_within_volume < old.path_within_volume:
+                self.added += 1
+                yield DiffEntry(ADDED, new.path_within_volume, None, new, ())
+                new = next(new_it, None)
+            else:
+                reasons = self._reasons(old, new)
+                if reasons:
+                    self.changed += 1
+                    yield DiffEntry(CHANGED, new.path_within_volume, old, new, reasons)
+                else:
+                    self.unchanged += 1
+                old = next(old_it, None)
+                new = next(new_it, None)
@@ -0,0 +1,142 @@
+import functools
+import hashlib
+import logging
+import time
+
+from thumbtack_client.VolumeMapper import VolumeMapper
+
+logger = logging.getLogger("thumbtack_client")
+
+DEFAULT_ALGORITHMS = ("md5", "sha1", "sha256")
+
+
+def hash_file(path, algorithms=DEFAULT_ALGORITHMS, buffer_size=1 << 20):
+    """Computes several digests of a file in a single pass.
+
+    Parameters
+    ----------
+    path : str
+        The file to hash
+    algorithms : sequence of str
+        Names accepted by :func:`hashlib.new`
+    buffer_size : int
+        The size of each read, in bytes
+
+    Returns
+    -------
+    tuple (int, dict)
+        The number of bytes read and a dictionary of algorithm name to hex digest
+    """
+    hashers = [hashlib.new(a) for a in algorithms]
+    buf = bytearray(buffer_size)
+    view = memoryview(buf)
+    size = 0
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            chunk = view[:n]
+            for h in hashers:
+                h.update(chunk)
+            size += n
+    return size, {a: h.hexdigest() for a, h in zip(algorithms, hashers)}
+
+
+class VolumeHasher(object):
+    """Hashes every file of a mounted volume on a process pool.
+
+    Each file is read once with large unbuffered reads, updating every requested digest from the
+    same buffer. Files are sent to the pool in batches by a
+    :class:`~thumbtack_client.VolumeMapper.VolumeMapper`, which keeps only a bounded number of
+    batches in flight, so memory use does not grow with the number of files. Files that cannot be
+    read are logged and counted in :attr:`errors`.
+
+    Examples
+    --------
+    >>> hasher = volume.hash_files(workers=8)
+    >>> for path_within_volume, size, digests in hasher:
+    ...     print(digests["sha256"], path_within_volume)
+    >>> print(hasher.files_per_second, hasher.bytes_per_second)
+
+    Attributes
+    ----------
+    files, bytes, errors : int
+        Counts of the files hashed, the bytes read and the files that could not be read
+    seconds : float
+        How long the run took
+    """
+
+    def __init__(self, volume, algorithms=DEFAULT_ALGORITHMS, workers=None, buffer_size=1 << 20,
+                 batch_size=64, file_filter=None):
+        """Create a VolumeHasher object.
+
+        Parameters
+        ----------
+        volume : thumbtack_client.MountedDiskImageVolume.MountedDiskImageVolume
+            The volume to hash. Files are listed with its ``safe_scandir_walk``.
+        algorithms : sequence of str, optional
+            Names accepted by :func:`hashlib.new`
+        workers : int, optional
+            The number of worker processes, by default the number of CPUs. With 0, files are
+            hashed in the calling process.
+        buffer_size : int, optional
+            The size of each read, in bytes
+        batch_size : int, optional
+            The number of files sent to a worker at a time
+        file_filter : callable or thumbtack_client.WalkFilter.WalkFilter, optional
+            Limits the files hashed, as for ``safe_walk``.
+        """
+        for a in algorithms:
+            hashlib.new(a)
+        self.volume = volume
+        self.algorithms = tuple(algorithms)
+        self.workers = workers
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.file_filter = file_filter
+        self.files = 0
+        self.bytes = 0
+        self.errors = 0
+        self.seconds = 0.0
+
+    @property
+    def files_per_second(self):
+        return self.files / self.seconds if self.seconds else 0.0
+
+    @property
+    def bytes_per_second(self):
+        return self.bytes / self.seconds if self.seconds else 0.0
+
+    def __iter__(self):
+        return self.run()
+
+    def run(self):
+        """Hashes every file of the volume.
+
+        Yields
+        ------
+        tuple (str, int, dict)
+            (path in volume, size in bytes, algorithm name to hex digest), in completion order
+        """
+        func = functools.partial(hash_file, algorithms=self.algorithms, buffer_size=self.buffer_size)
+        mapper = VolumeMapper(func, [self.volume], workers=self.workers, chunksize=self.batch_size,
+                              file_filter=self.file_filter)
+        start = time.perf_counter()
+        try:
+            for r in mapper:
+                if r.error is not None:
+                    self.errors += 1
+                    logger.warning(f'Could not hash "{r.path_within_volume}": {r.error}')
+                    continue
+                size, digests = r.result
+                self.files += 1
+                self.bytes += size
+                yield r.path_within_volume, size, digests
+        finally:
+            self.seconds = time.perf_counter() - start
+            logger.info(
+                f'Hashed {self.files} files ({self.bytes} bytes, {self.errors} errors) from "{self.volume.mountpoint}" '
+                f"in {self.seconds:.1f}s: {self.files_per_second:.0f} files/s, "
+                f"{self.bytes_per_second / (1 << 20):.1f} MiB/s"
+            )
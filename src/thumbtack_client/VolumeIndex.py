@@ -0,0 +1,308 @@
+import logging
+import os
+import sqlite3
+import stat
+import time
+
+logger = logging.getLogger("thumbtack_client")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS volumes (
+    id INTEGER PRIMARY KEY,
+    image_name TEXT NOT NULL,
+    volume_index TEXT,
+    offset INTEGER,
+    size INTEGER,
+    built_at REAL,
+    UNIQUE (image_name, volume_index, offset, size)
+);
+CREATE TABLE IF NOT EXISTS dirs (
+    volume_id INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    parent TEXT,
+    mtime_ns INTEGER NOT NULL,
+    PRIMARY KEY (volume_id, path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs (volume_id, parent);
+CREATE TABLE IF NOT EXISTS files (
+    volume_id INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    dir TEXT NOT NULL,
+    ext TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    mode INTEGER NOT NULL,
+    PRIMARY KEY (volume_id, path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS files_dir ON files (volume_id, dir);
+CREATE INDEX IF NOT EXISTS files_ext ON files (volume_id, ext);
+"""
+
+
+class VolumeIndex(object):
+    """A persistent SQLite index of the files of a mounted volume.
+
+    Mounted images are read-only, so a volume's listing only needs to be walked once. The index
+    is keyed by image name and the volume's `index`, `offset` and `size` rather than its
+    mountpoint, so it stays valid when the image is mounted again elsewhere, and one database
+    file can hold many volumes.
+
+    For each file the index stores its path within the volume, size, mtime and mode, following
+    symlinks where possible; broken symlinks keep the mode of the link itself. :meth:`refresh`
+    updates the index of a writable mountpoint incrementally: only directories whose mtime
+    changed are listed again. Modifying a file in place does not change its directory's mtime,
+    so such changes are not picked up.
+
+    Examples
+    --------
+    >>> index = volume.file_index("/var/cache/thumbtack/index.db", disk.name)
+    >>> for full_path, path_within_volume in index.find_extensions([".exe", ".dll"]):
+    ...     print(path_within_volume)
+    """
+
+    def __init__(self, db_path, image_name, volume):
+        """Create a VolumeIndex object.
+
+        Parameters
+        ----------
+        db_path : str
+            The SQLite database file, created if needed
+        image_name : str
+            The name of the disk image the volume belongs to
+        volume : thumbtack_client.MountedDiskImageVolume.MountedDiskImageVolume
+            The volume to index
+        """
+        self.db_path = db_path
+        self.image_name = image_name
+        self.volume = volume
+        self._db = sqlite3.connect(db_path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._volume_id = self._lookup_volume_id()
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def built(self):
+        """Whether the volume has been indexed."""
+        return self._volume_id is not None
+
+    def ensure(self):
+        """Builds the index if the volume has not been indexed yet."""
+        if not self.built:
+            self.build()
+        return self
+
+    def build(self):
+        """Walks the whole volume and replaces its index.
+
+        Returns
+        -------
+        int
+            The number of files indexed
+        """
+        start = time.perf_counter()
+        with self._db:
+            if self._volume_id is not None:
+                self._db.execute("DELETE FROM dirs WHERE volume_id = ?", (self._volume_id,))
+                self._db.execute("DELETE FROM files WHERE volume_id = ?", (self._volume_id,))
+                self._db.execute("DELETE FROM volumes WHERE id = ?", (self._volume_id,))
+            cursor = self._db.execute(
+                "INSERT INTO volumes (image_name, volume_index, offset, size, built_at) VALUES (?, ?, ?, ?, ?)",
+                (self.image_name, str(self.volume.index), self.volume.offset, self.volume.size, time.time()),
+            )
+            self._volume_id = cursor.lastrowid
+            count = self._index_tree("", None)
+        logger.info(f'Indexed {count} files of "{self.volume.mountpoint}" in {time.perf_counter() - start:.1f}s')
+        return count
+
+    def refresh(self):
+        """Re-lists the directories whose mtime changed since the index was built or refreshed.
+
+        Returns
+        -------
+        int
+            The number of directories that were listed again
+        """
+        if not self.built:
+            self.build()
+            return 0
+        with self._db:
+            return self._refresh_dir("", None)
+
+    def walk(self, safe=False):
+        """Lists the indexed files, like :meth:`MountedDiskImageVolume.walk`.
+
+        Parameters
+        ----------
+        safe : bool
+            Only yield regular files, like :meth:`MountedDiskImageVolume.safe_walk`. Readability
+            is not recorded in the index, so unreadable files are still yielded.
+
+        Yields
+        ------
+        tuple (str, str)
+            A tuple that contains (absolute path, path in volume), ordered by path in volume
+        """
+        return self._query("", (), safe)
+
+    def find_extensions(self, extensions, safe=False):
+        """Lists the indexed files with one of `extensions`, compared case-insensitively.
+
+        Yields
+        ------
+        tuple (str, str)
+            A tuple that contains (absolute path, path in volume)
+        """
+        exts = [(e if e.startswith(".") else "." + e).lower() for e in extensions]
+        if not exts:
+            return iter(())
+        placeholders = ", ".join("?" * len(exts))
+        return self._query(f"AND ext IN ({placeholders})", exts, safe)
+
+    def glob(self, pattern, safe=False):
+        """Lists the indexed files whose path in volume matches `pattern`.
+
+        Parameters
+        ----------
+        pattern : str
+            An SQLite GLOB pattern, e.g. ``Windows/System32/*.dll``. Matching is case-sensitive and
+            ``*`` also matches path separators.
+
+        Yields
+        ------
+        tuple (str, str)
+            A tuple that contains (absolute path, path in volume)
+        """
+        return self._query("AND path GLOB ?", (pattern.replace("/", os.sep),), safe)
+
+    def stat(self, path_within_volume):
+        """Returns the indexed ``(size, mtime, mode)`` of a file, or None if it is not indexed."""
+        return self._db.execute(
+            "SELECT size, mtime, mode FROM files WHERE volume_id = ? AND path = ?",
+            (self._volume_id, path_within_volume),
+        ).fetchone()
+
+    def _query(self, where, params, safe):
+        if not self.built:
+            raise ValueError(f"Volume {self.volume.index} of {self.image_name} has not been indexed")
+        sql = f"SELECT path, mode FROM files WHERE volume_id = ? {where} ORDER BY path"
+        mountpoint = self.volume.mountpoint
+        for path, mode in self._db.execute(sql, (self._volume_id,) + tuple(params)):
+            if safe and not stat.S_ISREG(mode):
+                continue
+            yield os.path.join(mountpoint, path), path
+
+    def _lookup_volume_id(self):
+        row = self._db.execute(
+            "SELECT id FROM volumes WHERE image_name = ? AND volume_index = ? AND offset = ? AND size = ?",
+            (self.image_name, str(self.volume.index), self.volume.offset, self.volume.size),
+        ).fetchone()
+        return row[0] if row else None
+
+    def _full_path(self, path_within_volume):
+        if not path_within_volume:
+            return self.volume.mountpoint
+        return os.path.join(self.volume.mountpoint, path_within_volume)
+
+    def _list_dir(self, relpath):
+        """Lists a directory, returning its mtime, its file rows and its subdirectory paths."""
+        dirpath = self._full_path(relpath)
+        try:
+            mtime_ns = os.stat(dirpath).st_mtime_ns
+            entries = list(os.scandir(dirpath))
+        except OSError:
+            return None, [], []
+
+        prefix = relpath + os.sep if relpath else ""
+        files = []
+        subdirs = []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if is_dir:
+                if not entry.is_symlink():
+                    subdirs.append(prefix + entry.name)
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                st = entry.stat(follow_symlinks=False)
+            files.append((
+                self._volume_id, prefix + entry.name, relpath, os.path.splitext(entry.name)[1].lower(),
+                st.st_size, st.st_mtime, st.st_mode,
+            ))
+        return mtime_ns, files, subdirs
+
+    def _index_tree(self, relpath, parent):
+        count = 0
+        stack = [(relpath, parent)]
+        while stack:
+            relpath, parent = stack.pop()
+            mtime_ns, files, subdirs = self._list_dir(relpath)
+            if mtime_ns is None:
+                continue
+            self._db.execute(
+                "INSERT OR REPLACE INTO dirs (volume_id, path, parent, mtime_ns) VALUES (?, ?, ?, ?)",
+                (self._volume_id, relpath, parent, mtime_ns),
+            )
+            self._db.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", files)
+            count += len(files)
+            stack.extend((sub, relpath) for sub in subdirs)
+        return count
+
+    def _refresh_dir(self, relpath, parent):
+        relisted = 0
+        stack = [(relpath, parent)]
+        while stack:
+            relpath, parent = stack.pop()
+            row = self._db.execute(
+                "SELECT mtime_ns FROM dirs WHERE volume_id = ? AND path = ?", (self._volume_id, relpath)
+            ).fetchone()
+            known_subdirs = [r[0] for r in self._db.execute(
+                "SELECT path FROM dirs WHERE volume_id = ? AND parent = ?", (self._volume_id, relpath)
+            )]
+            try:
+                mtime_ns = os.stat(self._full_path(relpath)).st_mtime_ns
+            except OSError:
+                mtime_ns = None
+
+            if row is not None and mtime_ns == row[0]:
+                stack.extend((sub, relpath) for sub in known_subdirs)
+                continue
+
+            relisted += 1
+            self._db.execute("DELETE FROM files WHERE volume_id = ? AND dir = ?", (self._volume_id, relpath))
+            mtime_ns, files, subdirs = self._list_dir(relpath)
+            for sub in set(known_subdirs) - set(subdirs):
+                self._delete_tree(sub)
+            if mtime_ns is None:
+                self._delete_tree(relpath)
+                continue
+            self._db.execute(
+                "INSERT OR REPLACE INTO dirs (volume_id, path, parent, mtime_ns) VALUES (?, ?, ?, ?)",
+                (self._volume_id, relpath, parent, mtime_ns),
+            )
+            self._db.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", files)
+            stack.extend((sub, relpath) for sub in subdirs)
+        return relisted
+
+    def _delete_tree(self, relpath):
+        stack = [relpath]
+        while stack:
+            path = stack.pop()
+            stack.extend(r[0] for r in self._db.execute(
+                "SELECT path FROM dirs WHERE volume_id = ? AND parent = ?", (self._volume_id, path)
+            ))
+            self._db.execute("DELETE FROM files WHERE volume_id = ? AND dir = ?", (self._volume_id, path))
+            self._db.execute("DELETE FROM dirs WHERE volume_id = ? AND path = ?", (self._volume_id, path))
@@ -0,0 +1,169 @@
+import logging
+import os
+import pickle
+import time
+import traceback
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from thumbtack_client.ScandirWalker import batched
+
+logger = logging.getLogger("thumbtack_client")
+
+MapResult = namedtuple("MapResult", ["volume_index", "full_path", "path_within_volume", "result", "error"])
+MapResult.__doc__ = """The outcome of calling the mapped function on one file.
+
+`error` is None if the call succeeded, otherwise the exception it raised, with the formatted
+traceback from the worker in its ``traceback`` attribute; `result` is None then.
+"""
+
+
+def _picklable(error):
+    try:
+        pickle.dumps(error)
+    except Exception:
+        return RuntimeError(repr(error))
+    return error
+
+
+def _map_batch(func, batch):
+    results = []
+    for volume_index, full_path, path_within_volume in batch:
+        try:
+            result, error = func(full_path), None
+        except Exception as e:
+            result, error = None, _picklable(e)
+            try:
+                error.traceback = traceback.format_exc()
+            except AttributeError:
+                pass
+        results.append(MapResult(volume_index, full_path, path_within_volume, result, error))
+    return results
+
+
+class VolumeMapper(object):
+    """Calls a function on every file of one or more volumes on a process pool.
+
+    Files are listed with ``safe_scandir_walk`` and sent to the pool in batches of `chunksize`
+    paths. Only a bounded number of batches is in flight at a time, so memory use does not grow
+    with the number of files however slowly the results are consumed. Exceptions raised by the
+    function are caught per file and returned in :attr:`MapResult.error`; the run goes on.
+
+    The function is called with the absolute path of each file and must be picklable, i.e.
+    defined at the top level of a module, as must its return value.
+
+    Examples
+    --------
+    >>> def entropy(path): ...
+    >>> for r in volume.map(entropy, workers=8):
+    ...     if r.error is None:
+    ...         print(r.path_within_volume, r.result)
+
+    Attributes
+    ----------
+    files, errors : int
+        Counts of the files the function was called on and the calls that raised
+    seconds : float
+        How long the run took
+    """
+
+    def __init__(self, func, volumes, workers=None, chunksize=64, ordered=False, max_in_flight=None,
+                 file_filter=None):
+        """Create a VolumeMapper object.
+
+        Parameters
+        ----------
+        func : callable
+            Called with the absolute path of each file
+        volumes : list of thumbtack_client.MountedDiskImageVolume.MountedDiskImageVolume
+            The volumes whose files are mapped
+        workers : int, optional
+            The number of worker processes, by default the number of CPUs. With 0, the function
+            is called in the calling process.
+        chunksize : int, optional
+            The number of files sent to a worker at a time
+        ordered : bool, optional
+            Yield results in the order the files were listed instead of as they complete
+        max_in_flight : int, optional
+            The number of batches submitted ahead of the results consumed, by default twice the
+            number of workers
+        file_filter : callable or thumbtack_client.WalkFilter.WalkFilter, optional
+            Limits the files mapped, as for ``safe_walk``.
+        """
+        if chunksize < 1:
+            raise ValueError("chunksize must be at least 1")
+        self.func = func
+        self.volumes = list(volumes)
+        self.workers = os.cpu_count() if workers is None else workers
+        self.chunksize = chunksize
+        self.ordered = ordered
+        self.max_in_flight = max_in_flight
+        self.file_filter = file_filter
+        self.files = 0
+        self.errors = 0
+        self.seconds = 0.0
+
+    def __iter__(self):
+        return self.run()
+
+    def run(self):
+        """Calls the function on every file.
+
+        Yields
+        ------
+        MapResult
+            One per file, in completion order or, if `ordered`, in listing order
+        """
+        start = time.perf_counter()
+        try:
+            for batch in self._results():
+                for result in batch:
+                    self.files += 1
+                    if result.error is not None:
+                        self.errors += 1
+                    yield result
+        finally:
+            self.seconds = time.perf_counter() - start
+            logger.info(
+                f"Mapped {getattr(self.func, '__name__', self.func)} over {self.files} files "
+                f"({self.errors} errors) in {self.seconds:.1f}s"
+            )
+
+    def _batches(self):
+        files = (
+            (volume.index, full_path, path_within_volume)
+            for volume in self.volumes
+            for full_path, path_within_volume in volume.safe_scandir_walk(self.file_filter)
+        )
+        return batched(files, self.chunksize)
+
+    def _results(self):
+        if self.workers == 0:
+            for batch in self._batches():
+                yield _map_batch(self.func, batch)
+            return
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            max_in_flight = self.max_in_flight or self.workers * 2
+            # futures in submission order; for completion order, done futures are removed as they are yielded
+            pending = deque()
+            try:
+                for batch in self._batches():
+                    pending.append(executor.submit(_map_batch, self.func, batch))
+                    while len(pending) >= max_in_flight:
+                        yield from self._drain(pending)
+                while pending:
+                    yield from self._drain(pending)
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def _drain(self, pending):
+        """Yields the next finished batches, waiting for at least one."""
+        if self.ordered:
+            yield pending.popleft().result()
+            return
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.remove(future)
+            yield future.result()
@@ -0,0 +1,210 @@
+import mmap
+import os
+
+
+class VolumeReader(object):
+    """Reads the raw bytes of a volume from the device of a mounted disk image.
+
+    Positions are relative to the start of the volume and every read is checked against the
+    volume's `size`, so a reader never returns bytes of a neighbouring volume. Reads return
+    memoryviews: with `use_mmap` they are views into a read-only memory map of the volume and no
+    bytes are copied; otherwise they are filled with ``preadv`` into a buffer the reader owns.
+    Memory mapping is used when the device allows it, falling back to ``preadv`` otherwise.
+
+    This makes it possible to scan unallocated space or carve files without walking the mounted
+    filesystem. :meth:`chunks` iterates over a range in fixed-size pieces that overlap, so that a
+    signature spanning a chunk boundary is seen whole.
+
+    Examples
+    --------
+    >>> with disk.volume_reader(volume) as reader:
+    ...     for pos, chunk in reader.chunks(chunk_size=1 << 24, overlap=4096):
+    ...         for match in rules.match(data=bytes(chunk)):
+    ...             print(pos, match)
+
+    Attributes
+    ----------
+    device : str
+        The path of the device or image file
+    offset : int
+        The byte offset of the volume on the device
+    size : int
+        The size of the volume in bytes
+    mmapped : bool
+        Whether reads are served from a memory map
+    """
+
+    def __init__(self, device, offset, size, use_mmap=True):
+        """Create a VolumeReader object.
+
+        Parameters
+        ----------
+        device : str
+            The path of the device, e.g. ``MountedDiskImage.device``, or of a raw image file
+        offset : int
+            The byte offset of the volume on the device
+        size : int
+            The size of the volume in bytes
+        use_mmap : bool, optional
+            Whether to try to memory map the volume
+
+        Raises
+        ------
+        ValueError
+            If the volume does not lie within the device
+        """
+        if offset is None or size is None or offset < 0 or size < 0:
+            raise ValueError(f"Invalid volume range: offset={offset!r}, size={size!r}")
+        self.device = device
+        self.offset = offset
+        self.size = size
+        self.mmapped = False
+        self._map = None
+        self._delta = 0
+        self._fd = os.open(device, os.O_RDONLY)
+        try:
+            device_size = os.lseek(self._fd, 0, os.SEEK_END)
+            if offset + size > device_size:
+                raise ValueError(
+                    f"Volume at offset {offset} with size {size} extends past the end of {device} ({device_size} bytes)"
+                )
+            if use_mmap and size:
+                self._mmap()
+        except BaseException:
+            os.close(self._fd)
+            raise
+
+    def _mmap(self):
+        # mmap offsets must be a multiple of the allocation granularity
+        self._delta = self.offset % mmap.ALLOCATIONGRANULARITY
+        try:
+            self._map = mmap.mmap(
+                self._fd, self._delta + self.size, access=mmap.ACCESS_READ, offset=self.offset - self._delta
+            )
+        except (OSError, ValueError, OverflowError):
+            self._map = None
+            self._delta = 0
+            return
+        self.mmapped = True
+
+    def close(self):
+        """Closes the device. Memoryviews from a memory map must be released before."""
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # views are still exported; the map is unmapped when the last one is released
+                pass
+            self._map = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return self.size
+
+    def _check_range(self, pos, length):
+        if pos < 0 or pos > self.size or length < 0:
+            raise ValueError(f"Read of {length} bytes at {pos} is outside the volume ({self.size} bytes)")
+        return min(length, self.size - pos)
+
+    def read(self, pos, length):
+        """Reads up to `length` bytes at `pos` in the volume.
+
+        Fewer bytes are returned at the end of the volume.
+
+        Returns
+        -------
+        memoryview
+            The bytes read
+
+        Raises
+        ------
+        ValueError
+            If `pos` lies outside the volume
+        """
+        length = self._check_range(pos, length)
+        if self._map is not None:
+            start = self._delta + pos
+            return memoryview(self._map)[start:start + length]
+        buf = bytearray(length)
+        n = self.readinto(pos, buf)
+        return memoryview(buf)[:n]
+
+    def readinto(self, pos, buf):
+        """Reads bytes at `pos` in the volume into the writable buffer `buf`.
+
+        Returns
+        -------
+        int
+            The number of bytes read
+        """
+        view = memoryview(buf).cast("B")
+        length = self._check_range(pos, len(view))
+        if self._map is not None:
+            start = self._delta + pos
+            view[:length] = memoryview(self._map)[start:start + length]
+            return length
+        done = 0
+        while done < length:
+            target = view[done:length]
+            if hasattr(os, "preadv"):
+                n = os.preadv(self._fd, [target], self.offset + pos + done)
+            else:
+                data = os.pread(self._fd, len(target), self.offset + pos + done)
+                n = len(data)
+                target[:n] = data
+            if not n:
+                break
+            done += n
+        return done
+
+    def chunks(self, chunk_size=1 << 20, overlap=0, start=0, end=None):
+        """Iterates over the volume, or the range [`start`, `end`) of it, in overlapping chunks.
+
+        Each chunk after the first also holds the last `overlap` bytes of the chunk before it, so a
+        signature of up to ``overlap + 1`` bytes is always contained whole in some chunk.
+
+        Without a memory map, every chunk is read into the same buffer, so a chunk is only valid
+        until the next one is requested; copy it to keep it.
+
+        Parameters
+        ----------
+        chunk_size : int, optional
+            The number of new bytes in each chunk
+        overlap : int, optional
+            The number of bytes repeated from the previous chunk
+        start, end : int, optional
+            The range of the volume to read
+
+        Yields
+        ------
+        tuple (int, memoryview)
+            The position in the volume of the first byte of the chunk, and the chunk
+        """
+        if chunk_size <= 0 or overlap < 0:
+            raise ValueError("chunk_size must be positive and overlap must not be negative")
+        end = self.size if end is None else min(end, self.size)
+        self._check_range(start, end - start)
+
+        if self._map is not None and hasattr(mmap, "MADV_SEQUENTIAL"):
+            self._map.madvise(mmap.MADV_SEQUENTIAL)
+        buf = None
+        pos = start
+        while pos < end:
+            chunk_start = max(start, pos - overlap)
+            length = min(end, pos + chunk_size) - chunk_start
+            if self._map is not None:
+                yield chunk_start, self.read(chunk_start, length)
+            else:
+                if buf is None:
+                    buf = bytearray(chunk_size + overlap)
+                n = self.readinto(chunk_start, memoryview(buf)[:length])
+                yield chunk_start, memoryview(buf)[:n]
+            pos += chunk_size
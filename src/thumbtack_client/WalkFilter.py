@@ -0,0 +1,162 @@
+import fnmatch
+import os
+import re
+
+
+class WalkFilter(object):
+    """A structured filter for walking mounted volumes.
+
+    Unlike a plain `file_filter` callable, a WalkFilter is evaluated against the directory entry
+    and its ``stat`` data before any path work is done, and excluded directories are pruned so
+    that their subtrees are never listed. It can be passed anywhere a `file_filter` is accepted,
+    e.g. ``volume.safe_walk(WalkFilter(exclude_dirs=["Windows/WinSxS"], extensions=[".exe"]))``.
+
+    Attributes
+    ----------
+    exclude_dirs : list of str
+        Glob patterns of directories to prune. Patterns containing a path separator are matched
+        against the directory's path within the volume (e.g. ``Windows/WinSxS``), other patterns
+        are matched against the directory name alone (e.g. ``$Recycle.Bin``).
+    extensions : set of str or None
+        File extensions to include, e.g. ``{".exe", ".dll"}``. None includes all files.
+    min_size, max_size : int or None
+        Inclusive bounds on the file size in bytes.
+    min_mtime, max_mtime : float or None
+        Inclusive bounds on the file modification time, in seconds since the epoch.
+    predicate : callable or None
+        A fallback `file_filter` callable that accepts `mounted_file_path_on_disk` and returns
+        a boolean of whether to yield that file. It is only called for files that pass the
+        other checks.
+    case_sensitive : bool
+        Whether directory patterns and extensions are matched case-sensitively. Defaults to
+        False, since most mounted volumes are NTFS or FAT.
+    """
+
+    def __init__(self, exclude_dirs=None, extensions=None, min_size=None, max_size=None,
+                 min_mtime=None, max_mtime=None, predicate=None, case_sensitive=False):
+        """Create a WalkFilter object.
+
+        Parameters
+        ----------
+        exclude_dirs : iterable of str, optional
+            Glob patterns of directories to prune, using ``/`` as the path separator.
+        extensions : iterable of str, optional
+            File extensions to include, with or without the leading dot.
+        min_size, max_size : int, optional
+            Inclusive bounds on the file size in bytes.
+        min_mtime, max_mtime : float, optional
+            Inclusive bounds on the file modification time, in seconds since the epoch.
+        predicate : callable, optional
+            A fallback `file_filter` callable.
+        case_sensitive : bool, optional
+            Whether to match directory patterns and extensions case-sensitively.
+        """
+        self.exclude_dirs = list(exclude_dirs or [])
+        self.case_sensitive = case_sensitive
+        if extensions is None:
+            self.extensions = None
+        else:
+            self.extensions = {self._normcase(e if e.startswith(".") else "." + e) for e in extensions}
+        self.min_size = min_size
+        self.max_size = max_size
+        self.min_mtime = min_mtime
+        self.max_mtime = max_mtime
+        self.predicate = predicate
+
+        name_patterns = []
+        path_patterns = []
+        for pattern in self.exclude_dirs:
+            pattern = pattern.strip("/")
+            if "/" in pattern:
+                path_patterns.append(pattern.replace("/", os.sep))
+            else:
+                name_patterns.append(pattern)
+        self._name_re = self._compile(name_patterns)
+        self._path_re = self._compile(path_patterns)
+        self.needs_stat = any(v is not None for v in (min_size, max_size, min_mtime, max_mtime))
+
+    def include_dir(self, name, path_within_volume):
+        """Returns whether to descend into a directory.
+
+        Parameters
+        ----------
+        name : str
+            The directory name.
+        path_within_volume : str
+            The path of the directory within the volume.
+
+        Returns
+        -------
+        bool
+            False if the directory matches one of the `exclude_dirs` patterns.
+        """
+        if self._name_re is not None and self._name_re.match(name):
+            return False
+        if self._path_re is not None and self._path_re.match(path_within_volume):
+            return False
+        return True
+
+    def include_entry(self, entry):
+        """Returns whether to yield a file.
+
+        Parameters
+        ----------
+        entry : os.DirEntry
+            The directory entry of the file. Its cached ``stat`` result is reused by later
+            checks, so filtering on size or mtime costs no extra system calls in a safe walk.
+
+        Returns
+        -------
+        bool
+            True if the file passes every configured check.
+        """
+        if self.extensions is not None:
+            ext = os.path.splitext(entry.name)[1]
+            if self._normcase(ext) not in self.extensions:
+                return False
+
+        if self.needs_stat:
+            try:
+                st = entry.stat()
+            except OSError:
+                return False
+            if self.min_size is not None and st.st_size < self.min_size:
+                return False
+            if self.max_size is not None and st.st_size > self.max_size:
+                return False
+            if self.min_mtime is not None and st.st_mtime < self.min_mtime:
+                return False
+            if self.max_mtime is not None and st.st_mtime > self.max_mtime:
+                return False
+
+        if self.predicate is not None and not self.predicate(entry.path):
+            return False
+        return True
+
+    def __call__(self, mounted_file_path_on_disk):
+        """Evaluates the filter against a path, for walks that have no directory entries.
+
+        Directory patterns are not applied, since there is no volume root to measure from.
+        """
+        entry = _PathEntry(mounted_file_path_on_disk)
+        return self.include_entry(entry)
+
+    def _normcase(self, s):
+        return s if self.case_sensitive else s.lower()
+
+    def _compile(self, patterns):
+        if not patterns:
+            return None
+        flags = 0 if self.case_sensitive else re.IGNORECASE
+        return re.compile("|".join(fnmatch.translate(p) for p in patterns), flags)
+
+
+class _PathEntry(object):
+    """The subset of the os.DirEntry interface used by WalkFilter, built from a path."""
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+
+    def stat(self):
+        return os.stat(self.path)
@@ -13,24 +13,46 @@
 # limitations under the License.
 
 import logging
-
-import requests
-import json
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from thumbtack_client import ThumbtackClientException
 from thumbtack_client.ThumbtackClientException import ThumbtackClientException
 from thumbtack_client.DuplicateMountAttemptException import DuplicateMountAttemptException
+from thumbtack_client.ThumbtackServerUnavailableException import ThumbtackServerUnavailableException
+from thumbtack_client.Metrics import endpoint_of
 
 logger = logging.getLogger(__name__)
 
+# requests and json are imported where they are used, so that walk-only processes, e.g. pool
+# workers, can import the volume classes without loading the HTTP stack
+
+BatchResult = namedtuple("BatchResult", ["image_path", "result", "error"])
+
+_CacheEntry = namedtuple("_CacheEntry", ["data", "etag", "last_modified", "fetched_at"])
+
+# methods that are safe to send again when the first attempt may or may not have reached the server
+IDEMPOTENT_METHODS = ("get", "delete")
+RETRY_STATUSES = (502, 503, 504)
+
 
 class ThumbtackClient(object):
     """
     Creates the ThumbtackClient object using the `requests.Session class <http://docs.python-requests.org/en/master/api/?highlight=session#request-sessions>`_
     so that its 'delete', 'get', and 'put' methods can be used to send requests.
+
+    A ``requests.Session`` is not guaranteed to be thread-safe. To share one client across a
+    thread pool, create it with ``thread_safe=True``: each thread then gets its own session,
+    configured with the same timeouts and pool settings. Otherwise, set `pool_maxsize` to at
+    least the number of threads so they do not contend for connections.
     """
 
-    def __init__(self, url="http://127.0.0.1:8208"):
+    def __init__(self, url="http://127.0.0.1:8208", cache_ttl=None, timeout=None, pool_connections=10,
+                 pool_maxsize=10, pool_block=False, keep_alive=True, max_retries=0, backoff_factor=0.5,
+                 backoff_max=30.0, thread_safe=False, metrics=None):
         """
         Initializes the ThumbtackClient object with the `requests.Session class <http://docs.python-requests.org/en/master/api/?highlight=session#request-sessions>`_
 
@@ -38,9 +60,93 @@ class ThumbtackClient(object):
         ----------
         url : str
             default url is http://127.0.0.1:8208
+        cache_ttl : float, optional
+            If set, :meth:`list_images` and :meth:`list_mounted_images` results are cached for
+            `cache_ttl` seconds. Once a result expires it is revalidated with a conditional
+            request (ETag / If-Modified-Since) when the server supports them. Any mount,
+            unmount, add_mountpoint or update_image_dir call made through this client
+            invalidates the cache. Cached lists are shared between callers and must not be
+            modified. Hit and miss counts are kept in :attr:`cache_stats`.
+        timeout : float or tuple (float, float), optional
+            connect and read timeouts in seconds, as accepted by requests. By default requests
+            wait forever.
+        pool_connections : int
+            the number of connection pools to cache, one per host
+        pool_maxsize : int
+            the maximum number of connections kept open to the server
+        pool_block : bool
+            whether to wait for a free connection when all `pool_maxsize` connections are in use,
+            rather than opening a connection that is discarded afterwards
+        keep_alive : bool
+            whether to reuse connections between requests
+        max_retries : int
+            how many times to retry idempotent requests (GET and DELETE) that fail to connect,
+            time out, or receive a 502, 503 or 504 response
+        backoff_factor : float
+            the base delay between retries in seconds. Retry ``n`` waits a random time between 0
+            and ``backoff_factor * 2 ** n`` seconds, capped at `backoff_max`.
+        backoff_max : float
+            the maximum delay between retries in seconds
+        thread_safe : bool
+            give every thread its own session, so the client can be shared across threads
+        metrics : thumbtack_client.Metrics.Metrics, optional
+            records the latency and status of every request, including retries
         """
-        self.session = requests.Session()
+        self.timeout = timeout
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.thread_safe = thread_safe
+        self.metrics = metrics
+        self._local = threading.local()
+        self._session = None if thread_safe else self._new_session()
         self._url = url
+        self.lease_cache = None
+        self.cache_ttl = cache_ttl
+        self.cache_stats = {"hits": 0, "revalidated": 0, "misses": 0}
+        self._cache = {}
+        self._cache_generation = 0
+        self._cache_lock = threading.Lock()
+
+    @property
+    def url(self):
+        """The base url of the Thumbtack server."""
+        return self._url
+
+    @property
+    def session(self):
+        """The ``requests.Session`` used by the calling thread."""
+        if not self.thread_safe:
+            return self._session
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self._new_session()
+        return session
+
+    @session.setter
+    def session(self, session):
+        if self.thread_safe:
+            self._local.session = session
+        else:
+            self._session = session
+
+    def _new_session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize, pool_block=self.pool_block
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        if not self.keep_alive:
+            session.headers["Connection"] = "close"
+        return session
 
     def list_mounted_images(self):
         """
@@ -50,8 +156,18 @@ class ThumbtackClient(object):
             A list of JSON serialized dictionaries of all mounted images in: 'http://127.0.0.1:8208/mounts/'
         """
         url = f"{self._url}/mounts/"
-        response = self._get(url, expected_status=200)
-        return response.json()
+        return self._get_cached(url)
+
+    def list_mounted_disk_images(self):
+        """
+        Returns
+        -------
+        list of MountedDiskImage
+            All mounted images as MountedDiskImage objects, which are built lazily and can be
+            compared and hashed to diff snapshots of mount state
+        """
+        from thumbtack_client.MountedDiskImage import MountedDiskImage
+        return [MountedDiskImage(d) for d in self.list_mounted_images()]
 
     def list_images(self):
         """
@@ -61,8 +177,7 @@ class ThumbtackClient(object):
             A list of JSON serialized dictionaries of all images in: 'http://127.0.0.1:8208/images'
         """
         url = f"{self._url}/images"
-        response = self._get(url, expected_status=200)
-        return response.json()
+        return self._get_cached(url)
 
     def mount_image(self, image_path, creds=None):
         """
@@ -151,52 +266,178 @@ class ThumbtackClient(object):
         response = self._get(url, expected_status=200)
         return response.json()
 
+    def mount_images(self, image_paths, creds=None, concurrency=8, duplicate_timeout=600, poll_interval=1.0):
+        """Mounts several images concurrently.
+
+        Mounts are sent on a pool of `concurrency` threads, so the wall-clock time is bounded by the
+        slowest mounts rather than the sum of all of them. A
+        :class:`~thumbtack_client.DuplicateMountAttemptException.DuplicateMountAttemptException`
+        means another client is already mounting the image, so the mount is retried every
+        `poll_interval` seconds until that attempt finishes or `duplicate_timeout` expires.
+
+        Parameters
+        ----------
+        image_paths : iterable of str
+            file paths of the images to be mounted
+        creds : dict or callable, optional
+            credentials passed to :meth:`mount_image` for every image, or a callable that accepts
+            an image path and returns its credentials
+        concurrency : int
+            the maximum number of mount requests in flight
+        duplicate_timeout : float
+            how long to wait for another client's mount attempt, in seconds
+        poll_interval : float
+            how often to retry while another client's mount attempt is in progress, in seconds
+
+        Yields
+        ------
+        BatchResult
+            A tuple of (image_path, MountedDiskImage or None, exception or None) for each image,
+            in the order the mounts finish. Any exception raised for one image, including errors
+            reading a malformed response, is reported in its result rather than raised.
+        """
+        from thumbtack_client.MountedDiskImage import MountedDiskImage
+
+        def mount(image_path):
+            image_creds = creds(image_path) if callable(creds) else creds
+            deadline = time.monotonic() + duplicate_timeout
+            while True:
+                try:
+                    return MountedDiskImage(self.mount_image(image_path, creds=image_creds))
+                except DuplicateMountAttemptException:
+                    if time.monotonic() + poll_interval > deadline:
+                        raise
+                    logger.debug(f'Waiting for another mount attempt of "{image_path}"')
+                    time.sleep(poll_interval)
+
+        return self._run_batch(mount, image_paths, concurrency)
+
+    def unmount_images(self, image_paths, concurrency=8):
+        """Unmounts several images concurrently.
+
+        Parameters
+        ----------
+        image_paths : iterable of str
+            file paths of the images to be unmounted
+        concurrency : int
+            the maximum number of unmount requests in flight
+
+        Yields
+        ------
+        BatchResult
+            A tuple of (image_path, response dict or None, exception or None) for each image,
+            in the order the unmounts finish. Any exception raised for one image is reported in
+            its result rather than raised.
+        """
+        return self._run_batch(self.unmount_image, image_paths, concurrency)
+
+    def _run_batch(self, func, image_paths, concurrency):
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {executor.submit(func, image_path): image_path for image_path in image_paths}
+            try:
+                for future in as_completed(futures):
+                    try:
+                        result = BatchResult(futures[future], future.result(), None)
+                    except Exception as e:
+                        # e.g. a malformed response; the other images of the batch still finish
+                        result = BatchResult(futures[future], None, e)
+                    yield result
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def lease(self, image_path, creds=None):
+        """Leases a mounted image for the duration of a ``with`` block.
+
+        Images stay mounted between leases until they are evicted by :attr:`lease_cache`, so
+        jobs that touch the same image one after another share a single mount. Assign a
+        :class:`~thumbtack_client.MountLeaseCache.MountLeaseCache` to :attr:`lease_cache` to
+        configure the idle TTL and capacity limits. By default idle images are unmounted after
+        five minutes by a background thread that checks every minute; call
+        ``lease_cache.close()`` to stop it and unmount the idle images.
+
+        Parameters
+        ----------
+        image_path : str
+            file path of the image to be mounted
+        creds : dict, optional
+            credentials passed to :meth:`mount_image`
+
+        Returns
+        -------
+        context manager
+            yields the MountedDiskImage
+
+        Examples
+        --------
+        >>> with client.lease("/images/a.E01") as disk:
+        ...     for volume in disk.mounted_volumes:
+        ...         ...
+        """
+        with self._cache_lock:
+            if self.lease_cache is None:
+                from thumbtack_client.MountLeaseCache import MountLeaseCache
+                self.lease_cache = MountLeaseCache(self, reap_interval=60)
+        return self.lease_cache.lease(image_path, creds=creds)
+
     def create_key(self, creds):
-        method = None
-        key = None
-        key_full = None
-
-        if not creds:
-            return None
-
-        if creds["type"] == "bitlocker":
-            method = creds["authentication_method"]
-            if method == "password":
-                method_short = "p"
-                key = creds["authentication_value"]
-            elif method == "recovery_key":
-                method_short = "r"
-                key = creds["bitlocker_recovery_key"]
-            elif method == "startup_key_filepath":
-                method_short = "s"
-                key = creds["bitlocker_startup_key_filepath"]
-            elif method == "fvek":
-                method_short = "k"
-                key = creds["bitlocker_fvek"]
-
-        if creds["type"] == "luks":
-            method = creds["authentication_method"]
-            if method == "password":
-                method_short = "p"
-                key = creds["authentication_value"]
-            elif method == "key_file":
-                method_short = "f"
-                key = creds["luks_key_file"]
-            elif method == "master_key_file":
-                method_short = "m"
-                key = creds["luks_master_key_file"]
-
-        key_full = {"key": f"{method_short}:{key}"}
-        return key_full
+        return _create_key(creds)
+
+    def invalidate_cache(self):
+        """Discards cached :meth:`list_images` and :meth:`list_mounted_images` results."""
+        with self._cache_lock:
+            self._cache.clear()
+            self._cache_generation += 1
+
+    def _get_cached(self, url):
+        if self.cache_ttl is None:
+            return self._get(url, expected_status=200).json()
+
+        with self._cache_lock:
+            entry = self._cache.get(url)
+            generation = self._cache_generation
+            if entry is not None and time.monotonic() - entry.fetched_at < self.cache_ttl:
+                self.cache_stats["hits"] += 1
+                return entry.data
+
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        fetched_at = time.monotonic()
+        response = self._get(url, expected_status=[200, 304], headers=headers)
+
+        if response.status_code == 304:
+            data = entry.data
+            counter = "revalidated"
+        else:
+            data = response.json()
+            counter = "misses"
+        with self._cache_lock:
+            self.cache_stats[counter] += 1
+            # a mutating call made while this request was in flight may have changed the result
+            if generation == self._cache_generation:
+                self._cache[url] = _CacheEntry(
+                    data, response.headers.get("ETag"), response.headers.get("Last-Modified"), fetched_at
+                )
+        return data
 
     def _put(self, url, expected_status=None, **kwargs):
-        return self._do_method_checked("put", url, expected_status, **kwargs)
+        try:
+            return self._do_method_checked("put", url, expected_status, **kwargs)
+        finally:
+            self.invalidate_cache()
 
     def _get(self, url, expected_status=None, **kwargs):
         return self._do_method_checked("get", url, expected_status, **kwargs)
 
     def _delete(self, url, expected_status=None, **kwargs):
-        return self._do_method_checked("delete", url, expected_status, **kwargs)
+        try:
+            return self._do_method_checked("delete", url, expected_status, **kwargs)
+        finally:
+            self.invalidate_cache()
 
     def _do_method_checked(self, method, url, expected_status, **kwargs):
         """This checks that the received response to the requested method was successful, otherwise
@@ -219,22 +460,115 @@ class ThumbtackClient(object):
             The value returned when the specified method is requested of the ThumbtackClient
         session
         """
-        response = None
-        try:
-            response = getattr(self.session, method)(url, **kwargs)
-        except requests.ConnectionError as e:
-            raise ThumbtackClientException(str(e))
-        if expected_status is not None:
-            if not hasattr(expected_status, "__iter__"):
-                expected_status = [expected_status]
-
-            if response.status_code not in expected_status:
-                msg = f"Unexpected status {response.status_code} from {response.url} ({response.request.method}); expected {expected_status}"
-                if response.text:
-                    msg_text = json.loads(response.text)['message']
-                    msg += f" - response text: {msg_text}" 
-                if "Mount attempt is already in progress for this image." in msg_text:
-                    raise DuplicateMountAttemptException(msg)
-                else:
-                    raise ThumbtackClientException(msg)
+        import requests
+
+        kwargs.setdefault("timeout", self.timeout)
+        retries = self.max_retries if method in IDEMPOTENT_METHODS else 0
+        attempt = 0
+        while True:
+            response = None
+            if self.metrics is not None:
+                start = time.perf_counter()
+            try:
+                response = getattr(self.session, method)(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if self.metrics is not None:
+                    self._observe(method, url, "error", start)
+                if attempt >= retries:
+                    raise ThumbtackServerUnavailableException(str(e))
+                logger.debug(f"Retrying {method.upper()} {url} after error: {e}")
+            else:
+                if self.metrics is not None:
+                    self._observe(method, url, response.status_code, start)
+                if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                    break
+                logger.debug(f"Retrying {method.upper()} {url} after status {response.status_code}")
+            time.sleep(self._backoff(attempt))
+            attempt += 1
+
+        _check_status(response.status_code, expected_status, response.url, response.request.method, response.text)
         return response
+
+    def _observe(self, method, url, status, start):
+        self.metrics.observe_request(method.upper(), endpoint_of(self._url, url), status, time.perf_counter() - start)
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_factor * 2 ** attempt))
+
+
+def _check_status(status_code, expected_status, url, method, text):
+    """Raises the exception matching an unexpected response status.
+
+    Parameters
+    ----------
+    status_code : int
+        The HTTP status of the response
+    expected_status: int, list of int, or None
+        HTTP response codes that are expected
+    url : str
+        The url of the request, for the error message
+    method : str
+        The HTTP method of the request, for the error message
+    text : str
+        The response body; Thumbtack puts the reason for an error in its 'message' field
+    """
+    if expected_status is None:
+        return
+    if not hasattr(expected_status, "__iter__"):
+        expected_status = [expected_status]
+
+    if status_code not in expected_status:
+        msg = f"Unexpected status {status_code} from {url} ({method}); expected {expected_status}"
+        msg_text = ""
+        if text:
+            import json
+
+            try:
+                msg_text = str(json.loads(text)["message"])
+            except (ValueError, KeyError, TypeError):
+                msg_text = text
+            msg += f" - response text: {msg_text}"
+        if "Mount attempt is already in progress for this image." in msg_text:
+            raise DuplicateMountAttemptException(msg)
+        else:
+            raise ThumbtackClientException(msg)
+
+
+def _create_key(creds):
+    """Builds the 'key' query parameter Thumbtack expects from a credentials dictionary."""
+    method = None
+    key = None
+    key_full = None
+
+    if not creds:
+        return None
+
+    if creds["type"] == "bitlocker":
+        method = creds["authentication_method"]
+        if method == "password":
+            method_short = "p"
+            key = creds["authentication_value"]
+        elif method == "recovery_key":
+            method_short = "r"
+            key = creds["bitlocker_recovery_key"]
+        elif method == "startup_key_filepath":
+            method_short = "s"
+            key = creds["bitlocker_startup_key_filepath"]
+        elif method == "fvek":
+            method_short = "k"
+            key = creds["bitlocker_fvek"]
+
+    if creds["type"] == "luks":
+        method = creds["authentication_method"]
+        if method == "password":
+            method_short = "p"
+            key = creds["authentication_value"]
+        elif method == "key_file":
+            method_short = "f"
+            key = creds["luks_key_file"]
+        elif method == "master_key_file":
+            method_short = "m"
+            key = creds["luks_master_key_file"]
+
+    key_full = {"key": f"{method_short}:{key}"}
+    return key_full
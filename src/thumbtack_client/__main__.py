@@ -0,0 +1,5 @@
+import sys
+
+from thumbtack_client.cli import main
+
+sys.exit(main())
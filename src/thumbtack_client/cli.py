@@ -0,0 +1,246 @@
+"""Command-line interface to a Thumbtack server, installed as thumbtack-client.
+
+Every subcommand writes newline-delimited JSON to standard output, one record per line, so the
+output can be piped into ``jq`` or other tools::
+
+    thumbtack-client --url http://thumbtack:8208 list
+    thumbtack-client mount /images/a.E01 /images/b.E01
+    thumbtack-client walk /images/a.E01 --workers 8 | jq -r 'select(.size > 1e9) | .path'
+    thumbtack-client walk --path /mnt/evidence/vol2 --no-stat > listing.ndjson
+    thumbtack-client unmount /images/a.E01
+    thumbtack-client image-dir /srv/images
+"""
+import argparse
+import json
+import os
+import sys
+from json.encoder import encode_basestring_ascii
+
+DEFAULT_URL = "http://127.0.0.1:8208"
+
+# walk records are written in blocks of this many bytes
+WRITE_BUFFER = 1 << 20
+
+
+def _client(args):
+    from thumbtack_client import ThumbtackClient
+    return ThumbtackClient(args.url, timeout=args.timeout)
+
+
+def _write_json(out, records):
+    for record in records:
+        out.write(json.dumps(record).encode("utf-8") + b"\n")
+
+
+def _cmd_list(args, out):
+    client = _client(args)
+    _write_json(out, client.list_mounted_images() if args.mounted else client.list_images())
+
+
+def _cmd_mount(args, out):
+    failed = False
+    for r in _client(args).mount_images(args.images, creds=args.creds, concurrency=args.concurrency):
+        failed = failed or r.error is not None
+        mount = _disk_record(r.result) if r.result is not None else None
+        _write_json(out, [{"image_path": r.image_path, "mount": mount, "error": _error(r.error)}])
+    return 1 if failed else 0
+
+
+# the authentication methods ThumbtackClient.create_key understands for each encryption type
+CREDS_METHODS = {
+    "bitlocker": ("password", "recovery_key", "startup_key_filepath", "fvek"),
+    "luks": ("password", "key_file", "master_key_file"),
+}
+
+
+def _parse_creds(parser, text):
+    """Parses and checks --creds, reporting malformed credentials as a usage error."""
+    from thumbtack_client import _create_key
+    try:
+        creds = json.loads(text)
+    except ValueError as e:
+        parser.error(f"invalid --creds {text!r}: {e}")
+    if not isinstance(creds, dict) or creds.get("type") not in CREDS_METHODS:
+        parser.error(f'invalid --creds {text!r}: expected a JSON object with "type" one of {sorted(CREDS_METHODS)}')
+    methods = CREDS_METHODS[creds["type"]]
+    if creds.get("authentication_method") not in methods:
+        parser.error(f'invalid --creds {text!r}: "authentication_method" must be one of {list(methods)}')
+    try:
+        _create_key(creds)
+    except KeyError as e:
+        parser.error(f"invalid --creds {text!r}: missing {e}")
+    return creds
+
+
+def _cmd_unmount(args, out):
+    failed = False
+    for r in _client(args).unmount_images(args.images, concurrency=args.concurrency):
+        failed = failed or r.error is not None
+        _write_json(out, [{"image_path": r.image_path, "result": r.result, "error": _error(r.error)}])
+    return 1 if failed else 0
+
+
+def _cmd_image_dir(args, out):
+    client = _client(args)
+    if args.image_dir:
+        _write_json(out, [client.update_image_dir(args.image_dir)])
+    else:
+        _write_json(out, [client.get_image_dir()])
+
+
+def _disk_record(disk):
+    from thumbtack_client.MountedDiskImageVolume import VOLUME_FIELDS
+    return {
+        "name": disk.name,
+        "mountpoint": disk.mountpoint,
+        "device": disk.device,
+        "volumes": [{f: getattr(v, f) for f in VOLUME_FIELDS} for v in disk.volumes],
+    }
+
+
+def _error(error):
+    return None if error is None else str(error)
+
+
+def _disks(args):
+    """Returns the MountedDiskImage objects to walk."""
+    from thumbtack_client.MountedDiskImage import MountedDiskImage, is_mount_of
+
+    if args.path:
+        disk = MountedDiskImage({"mountpoint": None, "name": "local", "volumes": [], "paths": None})
+        disk.volumes = [_local_volume(path, i) for i, path in enumerate(args.path)]
+        return [disk]
+
+    client = _client(args)
+    mounted = client.list_mounted_images()
+    disks = []
+    for image_path in args.images:
+        mount = next((m for m in mounted if is_mount_of(m, image_path)), None)
+        if mount is None:
+            if not args.mount:
+                raise SystemExit(f"{image_path} is not mounted; pass --mount to mount it")
+            mount = client.mount_image(image_path)
+        disks.append(MountedDiskImage(mount))
+    return disks
+
+
+def _local_volume(path, index):
+    from thumbtack_client.MountedDiskImageVolume import MountedDiskImageVolume
+    return MountedDiskImageVolume({
+        "fsdescription": None, "fstype": None, "index": index, "label": None,
+        "mountpoint": os.path.abspath(path), "offset": None, "size": None,
+    })
+
+
+def _walk_results(disks, args):
+    """Yields (image name, volume index, absolute path, path in volume) for every walked file."""
+    if args.workers > 1:
+        from thumbtack_client.ParallelWalker import ParallelWalker
+        for r in ParallelWalker(disks, workers=args.workers, safe=args.safe):
+            yield r
+        return
+    from thumbtack_client.ScandirWalker import ScandirWalker
+    for disk in disks:
+        for volume in disk.mounted_volumes:
+            for full_path, path_within_volume in ScandirWalker(volume.mountpoint, safe=args.safe).walk():
+                yield disk.name, volume.index, full_path, path_within_volume
+
+
+def _cmd_walk(args, out):
+    if bool(args.images) == bool(args.path):
+        raise SystemExit("walk needs either image paths or --path")
+    disks = _disks(args)
+    prefixes = {}
+    chunks = []
+    buffered = 0
+    stat = os.stat
+    for image_name, volume_index, full_path, path_within_volume in _walk_results(disks, args):
+        prefix = prefixes.get((image_name, volume_index))
+        if prefix is None:
+            prefix = prefixes[(image_name, volume_index)] = (
+                f'{{"image": {encode_basestring_ascii(image_name)}, "volume": {json.dumps(volume_index)}, "path": '
+            )
+        line = prefix + encode_basestring_ascii(path_within_volume)
+        if args.stat:
+            try:
+                st = stat(full_path)
+            except OSError:
+                line += ', "size": null, "mtime": null}\n'
+            else:
+                line += f', "size": {st.st_size}, "mtime": {st.st_mtime!r}}}\n'
+        else:
+            line += "}\n"
+        chunks.append(line)
+        buffered += len(line)
+        if buffered >= WRITE_BUFFER:
+            out.write("".join(chunks).encode("ascii"))
+            chunks = []
+            buffered = 0
+    out.write("".join(chunks).encode("ascii"))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="thumbtack-client", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--url", default=os.environ.get("THUMBTACK_URL", DEFAULT_URL),
+                        help=f"the Thumbtack server, by default $THUMBTACK_URL or {DEFAULT_URL}")
+    parser.add_argument("--timeout", type=float, help="request timeout in seconds")
+    sub = parser.add_subparsers(dest="command", metavar="command")
+    sub.required = True
+
+    p = sub.add_parser("list", help="list the images the server can mount")
+    p.add_argument("--mounted", action="store_true", help="list the mounted images instead")
+    p.set_defaults(func=_cmd_list)
+
+    p = sub.add_parser("mount", help="mount images")
+    p.add_argument("images", nargs="+")
+    p.add_argument("--creds", help="credentials as JSON, e.g. "
+                   '{"type": "bitlocker", "authentication_method": "password", "authentication_value": "..."}')
+    p.add_argument("--concurrency", type=int, default=8)
+    p.set_defaults(func=_cmd_mount)
+
+    p = sub.add_parser("unmount", help="unmount images")
+    p.add_argument("images", nargs="+")
+    p.add_argument("--concurrency", type=int, default=8)
+    p.set_defaults(func=_cmd_unmount)
+
+    p = sub.add_parser("image-dir", help="show or change the server's image directory")
+    p.add_argument("image_dir", nargs="?")
+    p.set_defaults(func=_cmd_image_dir)
+
+    p = sub.add_parser("walk", help="list the files of mounted images as NDJSON")
+    p.add_argument("images", nargs="*", help="image paths mounted on the server")
+    p.add_argument("--path", action="append", help="walk this local directory instead; can be repeated")
+    p.add_argument("--mount", action="store_true", help="mount images that are not mounted yet")
+    p.add_argument("--safe", action="store_true", help="skip broken symlinks, unreadable and special files")
+    p.add_argument("--no-stat", dest="stat", action="store_false", help="leave out size and mtime")
+    p.add_argument("--workers", type=int, default=1, help="walk volumes with this many threads")
+    p.set_defaults(func=_cmd_walk)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, "creds", None):
+        args.creds = _parse_creds(parser, args.creds)
+    from thumbtack_client.DuplicateMountAttemptException import DuplicateMountAttemptException
+    from thumbtack_client.ThumbtackClientException import ThumbtackClientException
+
+    out = sys.stdout.buffer
+    try:
+        status = args.func(args, out) or 0
+        out.flush()
+    except BrokenPipeError:
+        # the reader went away, e.g. `| head`; don't complain when the interpreter flushes stdout
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    except (ThumbtackClientException, DuplicateMountAttemptException) as e:
+        sys.stderr.write(f"thumbtack-client: {e}\n")
+        return 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+from thumbtack_client.FakeThumbtackServer import FakeThumbtackServer
+from thumbtack_client.MountedDiskImageVolume import MountedDiskImageVolume
+
+
+@pytest.fixture
+def thumbtack_server():
+    with FakeThumbtackServer() as server:
+        yield server
+
+
+def _volume_at(mountpoint):
+    return MountedDiskImageVolume({
+        "fsdescription": "primary volume",
+        "fstype": "ntfs",
+        "index": 2,
+        "label": "test",
+        "mountpoint": str(mountpoint),
+        "offset": 1048576,
+        "size": 1073741824,
+    })
+
+
+@pytest.fixture
+def make_volume():
+    """Returns a factory of volumes mounted at a given directory."""
+    return _volume_at
+
+
+@pytest.fixture
+def volume(tmp_path, make_volume):
+    (tmp_path / "Windows" / "System32").mkdir(parents=True)
+    (tmp_path / "Users" / "bob").mkdir(parents=True)
+    (tmp_path / "pagefile.sys").write_bytes(b"\0" * 10)
+    (tmp_path / "Windows" / "notepad.exe").write_bytes(b"MZ")
+    (tmp_path / "Windows" / "System32" / "cmd.exe").write_bytes(b"MZ" * 100)
+    (tmp_path / "Users" / "bob" / "notes.txt").write_text("hello")
+    os.symlink(str(tmp_path / "missing"), str(tmp_path / "Users" / "broken.lnk"))
+    os.symlink(str(tmp_path / "Windows"), str(tmp_path / "Users" / "windir"))
+    os.mkfifo(str(tmp_path / "Users" / "pipe"))
+    return make_volume(tmp_path)
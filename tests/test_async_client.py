@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from thumbtack_client import DuplicateMountAttemptException, ThumbtackClientException
+from thumbtack_client.AsyncThumbtackClient import AsyncThumbtackClient
+from thumbtack_client.ThumbtackServerUnavailableException import ThumbtackServerUnavailableException
+
+
+def test_async_client_round_trip(thumbtack_server):
+    async def scenario():
+        async with AsyncThumbtackClient(thumbtack_server.url) as client:
+            images = await client.list_images()
+            mounts = await asyncio.gather(*(client.mount_image(i["full_path"]) for i in images))
+            mounted = await client.list_mounted_images()
+            await client.unmount_image("/images/a.E01")
+            return mounts, mounted, await client.list_mounted_images()
+
+    mounts, mounted, remaining = asyncio.run(scenario())
+    assert sorted(m["name"] for m in mounts) == ["a.E01", "b.E01"]
+    assert len(mounted) == 2
+    assert [m["name"] for m in remaining] == ["b.E01"]
+
+
+def test_async_client_image_dir_and_creds(thumbtack_server):
+    creds = {"type": "luks", "authentication_method": "password", "authentication_value": "hunter2"}
+
+    async def scenario():
+        async with AsyncThumbtackClient(thumbtack_server.url) as client:
+            await client.update_image_dir("/cases/42")
+            await client.add_mountpoint(image_path="/images/a.E01")
+            return await client.get_image_dir(), await client.mount_image("/images/a.E01", creds=creds)
+
+    image_dir, mount = asyncio.run(scenario())
+    assert image_dir == "/cases/42"
+    assert mount["name"] == "a.E01"
+    assert ("PUT", "/mounts/images/a.E01", {"key": "p:hunter2"}) in thumbtack_server.requests
+    assert ("PUT", "/add_mountpoint", {"image_path": "/images/a.E01"}) in thumbtack_server.requests
+
+
+def test_async_client_error_mapping(thumbtack_server):
+    thumbtack_server.in_progress.add("/images/a.E01")
+
+    async def scenario(path):
+        async with AsyncThumbtackClient(thumbtack_server.url) as client:
+            await client.mount_image(path)
+
+    with pytest.raises(DuplicateMountAttemptException):
+        asyncio.run(scenario("/images/a.E01"))
+    with pytest.raises(ThumbtackClientException, match="not found"):
+        asyncio.run(scenario("/images/missing.E01"))
+
+
+def test_async_client_connection_error():
+    async def scenario():
+        async with AsyncThumbtackClient("http://127.0.0.1:1") as client:
+            await client.list_images()
+
+    with pytest.raises(ThumbtackClientException):
+        asyncio.run(scenario())
+
+
+def test_async_client_timeout(thumbtack_server):
+    import aiohttp
+
+    thumbtack_server.latency = 0.5
+
+    async def scenario():
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=0.1)) as session:
+            await AsyncThumbtackClient(thumbtack_server.url, session=session).list_images()
+
+    with pytest.raises(ThumbtackServerUnavailableException, match="timed out"):
+        asyncio.run(scenario())
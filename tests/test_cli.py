@@ -0,0 +1,69 @@
+import json
+import os
+
+import pytest
+
+from thumbtack_client.cli import main
+
+
+def records(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def test_cli_list_mount_unmount_image_dir(thumbtack_server, capsys):
+    url = ["--url", thumbtack_server.url]
+    assert main(url + ["list"]) == 0
+    assert [r["full_path"] for r in records(capsys)] == ["/images/a.E01", "/images/b.E01"]
+
+    assert main(url + ["mount", "/images/a.E01", "/images/missing.E01"]) == 1
+    mounted = {r["image_path"]: r for r in records(capsys)}
+    assert mounted["/images/a.E01"]["mount"]["name"] == "a.E01"
+    assert "not found" in mounted["/images/missing.E01"]["error"]
+
+    assert main(url + ["list", "--mounted"]) == 0
+    assert [r["name"] for r in records(capsys)] == ["a.E01"]
+    assert main(url + ["unmount", "/images/a.E01"]) == 0
+    assert records(capsys)[0]["error"] is None
+
+    assert main(url + ["image-dir", "/srv/images"]) == 0
+    assert main(url + ["image-dir"]) == 0
+    assert records(capsys) == ["/srv/images", "/srv/images"]
+
+
+def test_cli_walk_mounted_image(thumbtack_server, volume, tmp_path_factory, capsys):
+    root = tmp_path_factory.mktemp("mounts")
+    os.makedirs(str(root / "a.E01"))
+    os.symlink(volume.mountpoint, str(root / "a.E01" / "vol2"))
+    thumbtack_server.mount_root = str(root)
+
+    url = ["--url", thumbtack_server.url]
+    expected = sorted(p for _, p in volume.safe_walk())
+    for workers in ("1", "4"):
+        assert main(url + ["walk", "/images/a.E01", "--mount", "--safe", "--workers", workers]) == 0
+        walked = records(capsys)
+        assert sorted(r["path"] for r in walked) == expected
+        cmd = next(r for r in walked if r["path"].endswith("cmd.exe"))
+        assert (cmd["image"], cmd["volume"], cmd["size"]) == ("a.E01", 2, 200)
+        assert isinstance(cmd["mtime"], float)
+
+
+def test_cli_walk_local_path(volume, capsys):
+    assert main(["walk", "--path", volume.mountpoint, "--no-stat"]) == 0
+    walked = records(capsys)
+    assert sorted(r["path"] for r in walked) == sorted(p for _, p in volume.walk())
+    assert set(walked[0]) == {"image", "volume", "path"}
+
+
+def test_cli_mount_creds(thumbtack_server, capsys):
+    url = ["--url", thumbtack_server.url]
+    creds = '{"type": "bitlocker", "authentication_method": "password", "authentication_value": "hunter2"}'
+    assert main(url + ["mount", "/images/a.E01", "--creds", creds]) == 0
+    assert ("PUT", "/mounts/images/a.E01", {"key": "p:hunter2"}) in thumbtack_server.requests
+
+    for bad in ("{not json", '{"type": "bitlocker", "value": "x"}', '["p"]',
+                '{"type": "luks", "authentication_method": "fvek", "authentication_value": "x"}',
+                '{"type": "luks", "authentication_method": "key_file"}'):
+        with pytest.raises(SystemExit) as e:
+            main(url + ["mount", "/images/a.E01", "--creds", bad])
+        assert e.value.code == 2
+        assert "invalid --creds" in capsys.readouterr().err
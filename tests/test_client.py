@@ -1,8 +1,12 @@
+import threading
+
 import pytest
+import requests
 import responses
 
 import thumbtack_client
 import thumbtack_client.MountedDiskImage
+from thumbtack_client.MountedDiskImageVolume import MountedDiskImageVolume
 
 
 @pytest.fixture
@@ -41,3 +45,121 @@ def test_list_mounts_populated(client):
 
     response = client.list_mounted_images()
     assert len(response) > 0
+
+
+def test_mount_images_batch(thumbtack_server):
+    client = thumbtack_client.ThumbtackClient(thumbtack_server.url)
+    results = {r.image_path: r for r in client.mount_images(["/images/a.E01", "/images/b.E01", "/images/c.E01"])}
+
+    assert results["/images/a.E01"].result.name == "a.E01"
+    assert results["/images/b.E01"].result.mounted_volumes[0].index == 2
+    assert isinstance(results["/images/c.E01"].error, thumbtack_client.ThumbtackClientException)
+
+    results = list(client.unmount_images(["/images/a.E01", "/images/b.E01"], concurrency=2))
+    assert all(r.error is None for r in results)
+    assert thumbtack_server.mounts == {}
+
+
+def test_mount_images_reports_malformed_responses(thumbtack_server):
+    disk = thumbtack_server.disk
+
+    def malformed_disk(image_path):
+        return {"name": "b.E01"} if image_path == "/images/b.E01" else disk(image_path)
+
+    thumbtack_server.disk = malformed_disk
+    client = thumbtack_client.ThumbtackClient(thumbtack_server.url)
+    results = {r.image_path: r for r in client.mount_images(["/images/a.E01", "/images/b.E01", "/images/c.E01"])}
+
+    assert results["/images/a.E01"].result.name == "a.E01"
+    assert results["/images/b.E01"].result is None
+    assert isinstance(results["/images/b.E01"].error, KeyError)
+    assert isinstance(results["/images/c.E01"].error, thumbtack_client.ThumbtackClientException)
+
+
+def test_mount_images_waits_for_duplicate_attempt(thumbtack_server):
+    client = thumbtack_client.ThumbtackClient(thumbtack_server.url)
+    thumbtack_server.in_progress.add("/images/a.E01")
+    threading.Timer(0.2, thumbtack_server.in_progress.clear).start()
+
+    [result] = client.mount_images(["/images/a.E01"], poll_interval=0.05)
+    assert result.error is None
+    assert result.result.name == "a.E01"
+
+    thumbtack_server.in_progress.add("/images/b.E01")
+    [result] = client.mount_images(["/images/b.E01"], duplicate_timeout=0.1, poll_interval=0.05)
+    assert isinstance(result.error, thumbtack_client.DuplicateMountAttemptException)
+
+
+@responses.activate
+def test_list_images_cache_ttl():
+    client = thumbtack_client.ThumbtackClient(cache_ttl=60)
+    responses.add(responses.GET, 'http://127.0.0.1:8208/images', '[1, 2, 3]')
+
+    assert client.list_images() == [1, 2, 3]
+    assert client.list_images() == [1, 2, 3]
+    assert len(responses.calls) == 1
+    assert client.cache_stats == {"hits": 1, "revalidated": 0, "misses": 1}
+
+    responses.add(responses.PUT, 'http://127.0.0.1:8208/image_dir', '"/cases"')
+    client.update_image_dir("/cases")
+    client.list_images()
+    assert client.cache_stats["misses"] == 2
+
+
+@responses.activate
+def test_list_mounts_conditional_request():
+    client = thumbtack_client.ThumbtackClient(cache_ttl=0)
+    responses.add(responses.GET, 'http://127.0.0.1:8208/mounts/', '[1]', headers={"ETag": '"v1"'})
+    responses.add(responses.GET, 'http://127.0.0.1:8208/mounts/', status=304)
+
+    assert client.list_mounted_images() == [1]
+    assert client.list_mounted_images() == [1]
+    assert responses.calls[1].request.headers["If-None-Match"] == '"v1"'
+    assert client.cache_stats == {"hits": 0, "revalidated": 1, "misses": 1}
+
+
+@responses.activate
+def test_idempotent_requests_are_retried():
+    client = thumbtack_client.ThumbtackClient(max_retries=2, backoff_factor=0)
+    responses.add(responses.GET, 'http://127.0.0.1:8208/images', body=requests.ConnectionError("refused"))
+    responses.add(responses.GET, 'http://127.0.0.1:8208/images', status=503)
+    responses.add(responses.GET, 'http://127.0.0.1:8208/images', '[1]')
+
+    assert client.list_images() == [1]
+    assert len(responses.calls) == 3
+
+
+@responses.activate
+def test_mounts_are_not_retried():
+    client = thumbtack_client.ThumbtackClient(max_retries=2, backoff_factor=0)
+    responses.add(responses.PUT, 'http://127.0.0.1:8208/mounts/images/a.E01', body=requests.ReadTimeout("slow"))
+
+    with pytest.raises(thumbtack_client.ThumbtackClientException):
+        client.mount_image("/images/a.E01")
+    assert len(responses.calls) == 1
+
+
+def test_timeout_and_thread_safe_sessions(thumbtack_server):
+    client = thumbtack_client.ThumbtackClient(thumbtack_server.url, timeout=(1, 5), thread_safe=True)
+    sessions = []
+    threads = [threading.Thread(target=lambda: sessions.append(client.session) or client.list_images()) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(set(map(id, sessions))) == 3
+    assert client.session not in sessions
+
+
+def test_list_mounted_disk_images_snapshots(thumbtack_server):
+    client = thumbtack_client.ThumbtackClient(thumbtack_server.url)
+    client.mount_image("/images/a.E01")
+    before = set(client.list_mounted_disk_images())
+    client.mount_image("/images/b.E01")
+    after = client.list_mounted_disk_images()
+
+    [added] = set(after) - before
+    assert added.name == "b.E01"
+    assert added.mounted_volumes == [MountedDiskImageVolume(thumbtack_server.mounts["/images/b.E01"]["volumes"][0])]
+    assert not hasattr(added, "__dict__")
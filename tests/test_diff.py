@@ -0,0 +1,75 @@
+import os
+import shutil
+
+import pytest
+
+from thumbtack_client.VolumeDiff import listing_digest, load_listing, sorted_listing
+
+
+def changed_copy(volume, tmp_path_factory, make_volume):
+    copy = tmp_path_factory.mktemp("copy") / "vol"
+    shutil.copytree(volume.mountpoint, str(copy), symlinks=True, ignore=shutil.ignore_patterns("pipe"))
+    os.remove(str(copy / "pagefile.sys"))
+    (copy / "Windows" / "evil.dll").write_bytes(b"MZ")
+    (copy / "Users" / "bob" / "notes.txt").write_text("hello, world")
+    # same size and mtime, different content
+    cmd = copy / "Windows" / "System32" / "cmd.exe"
+    st = os.stat(str(cmd))
+    cmd.write_bytes(b"ZM" * 100)
+    os.utime(str(cmd), ns=(st.st_atime_ns, st.st_mtime_ns))
+    return make_volume(copy)
+
+
+def test_sorted_listing_spills_to_disk(volume):
+    in_memory = list(sorted_listing(volume))
+    assert [e.path_within_volume for e in in_memory] == sorted(p for _, p in volume.safe_walk())
+    assert list(sorted_listing(volume, max_in_memory=1)) == in_memory
+
+
+def test_volume_diff(volume, tmp_path_factory, make_volume):
+    other = changed_copy(volume, tmp_path_factory, make_volume)
+
+    diff = volume.diff(other, compare_mtime=False, max_in_memory=2)
+    assert [(d.status, d.path_within_volume, d.reasons) for d in diff] == [
+        ("changed", os.path.join("Users", "bob", "notes.txt"), ("size",)),
+        ("added", os.path.join("Windows", "evil.dll"), ()),
+        ("removed", "pagefile.sys", ()),
+    ]
+    assert (diff.added, diff.removed, diff.changed, diff.unchanged) == (1, 1, 1, 2)
+
+    diff = volume.diff(other, digest="sha256", compare_mtime=False)
+    changed = {d.path_within_volume: d.reasons for d in diff if d.status == "changed"}
+    assert changed[os.path.join("Windows", "System32", "cmd.exe")] == ("hash",)
+
+
+def test_diff_against_saved_listing(volume, tmp_path_factory, make_volume):
+    listing = str(tmp_path_factory.mktemp("listings") / "baseline.jsonl")
+    assert volume.save_listing(listing, digest="sha256", max_in_memory=1) == 4
+    assert [e.path_within_volume for e in load_listing(listing)] == [e.path_within_volume for e in sorted_listing(volume)]
+
+    other = changed_copy(volume, tmp_path_factory, make_volume)
+    statuses = {d.path_within_volume: d.status for d in other.diff(listing, digest="sha256", compare_mtime=False)}
+    assert statuses == {
+        os.path.join("Users", "bob", "notes.txt"): "changed",
+        os.path.join("Windows", "System32", "cmd.exe"): "changed",
+        os.path.join("Windows", "evil.dll"): "removed",
+        "pagefile.sys": "added",
+    }
+
+
+def test_diff_refuses_listing_hashed_with_other_digest(volume, tmp_path_factory):
+    listing = str(tmp_path_factory.mktemp("listings") / "baseline.jsonl")
+    volume.save_listing(listing, digest="md5")
+    assert listing_digest(listing) == "md5"
+    with pytest.raises(ValueError, match="md5"):
+        list(volume.diff(listing, digest="sha256"))
+    assert list(volume.diff(listing, digest="md5")) == []
+
+
+def test_diff_refuses_unhashed_listing_when_digest_requested(volume, tmp_path_factory):
+    listing = str(tmp_path_factory.mktemp("listings") / "baseline.jsonl")
+    volume.save_listing(listing)
+    assert listing_digest(listing) is None
+    with pytest.raises(ValueError, match="without hashes"):
+        list(volume.diff(listing, digest="sha256"))
+    assert list(volume.diff(listing)) == []
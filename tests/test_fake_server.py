@@ -0,0 +1,44 @@
+import time
+
+import pytest
+
+from thumbtack_client import ThumbtackClient
+from thumbtack_client.DuplicateMountAttemptException import DuplicateMountAttemptException
+from thumbtack_client.FakeThumbtackServer import FakeThumbtackServer
+from thumbtack_client.ThumbtackClientException import ThumbtackClientException
+
+
+def test_fake_server_latency():
+    with FakeThumbtackServer(latency=0.05, record_requests=False) as server:
+        client = ThumbtackClient(server.url)
+        start = time.perf_counter()
+        client.list_images()
+        assert time.perf_counter() - start >= 0.05
+        assert server.request_count == 1
+        assert server.requests == []
+
+
+def test_fake_server_injected_errors():
+    with FakeThumbtackServer(error_rate=1.0, error_status=500) as server:
+        client = ThumbtackClient(server.url)
+        with pytest.raises(ThumbtackClientException, match="Injected error"):
+            client.list_images()
+        server.error_rate = 0.0
+        assert len(client.list_images()) == 2
+
+
+def test_fake_server_mount_in_progress():
+    with FakeThumbtackServer(in_progress_rate=1.0) as server:
+        client = ThumbtackClient(server.url)
+        with pytest.raises(DuplicateMountAttemptException):
+            client.mount_image("/images/a.E01")
+        assert client.list_mounted_images() == []
+
+
+def test_fake_server_stop_closes_kept_alive_connections():
+    server = FakeThumbtackServer().start()
+    client = ThumbtackClient(server.url, max_retries=0)
+    client.list_images()
+    server.stop()
+    with pytest.raises(ThumbtackClientException):
+        client.list_images()
@@ -0,0 +1,34 @@
+import subprocess
+import sys
+
+import pytest
+
+WALK_MODULES = [
+    "thumbtack_client",
+    "thumbtack_client.MountedDiskImage",
+    "thumbtack_client.MountedDiskImageVolume",
+    "thumbtack_client.ParallelWalker",
+    "thumbtack_client.ScandirWalker",
+    "thumbtack_client.VolumeHasher",
+    "thumbtack_client.VolumeMapper",
+]
+
+
+def loaded_modules(statement):
+    out = subprocess.check_output([sys.executable, "-c", f"{statement}; import sys; print(' '.join(sys.modules))"])
+    return set(out.decode().split())
+
+
+@pytest.mark.parametrize("module", WALK_MODULES)
+def test_walk_modules_do_not_import_http_stack(module):
+    modules = loaded_modules(f"import {module}")
+    assert not {"requests", "urllib3", "aiohttp"} & modules
+
+
+def test_volume_module_does_not_import_process_pool():
+    modules = loaded_modules("import thumbtack_client.MountedDiskImageVolume")
+    assert "concurrent.futures.process" not in modules
+
+
+def test_client_imports_requests_when_used():
+    assert "requests" in loaded_modules("from thumbtack_client import ThumbtackClient; ThumbtackClient()")
@@ -0,0 +1,36 @@
+import os
+
+
+def test_index_answers_walks_and_queries(volume, tmp_path_factory, make_volume):
+    db_path = str(tmp_path_factory.mktemp("index") / "index.db")
+    with volume.file_index(db_path, "a.E01") as index:
+        assert sorted(index.walk()) == sorted(volume.walk())
+        assert sorted(index.walk(safe=True)) == sorted(volume.safe_walk())
+        assert [p for _, p in index.find_extensions(["EXE"])] == [
+            os.path.join("Windows", "System32", "cmd.exe"), os.path.join("Windows", "notepad.exe"),
+        ]
+        assert [p for _, p in index.glob("Users/*.txt")] == [os.path.join("Users", "bob", "notes.txt")]
+        assert index.stat("pagefile.sys")[0] == 10
+
+    # the same image mounted elsewhere reuses the index
+    moved = make_volume("/mnt/elsewhere")
+    with moved.file_index(db_path, "a.E01") as index:
+        assert ("/mnt/elsewhere/pagefile.sys", "pagefile.sys") in list(index.walk())
+
+
+def test_index_incremental_refresh(volume, tmp_path_factory):
+    db_path = str(tmp_path_factory.mktemp("index") / "index.db")
+    volume.file_index(db_path, "a.E01").close()
+
+    root = volume.mountpoint
+    os.makedirs(os.path.join(root, "Users", "alice"))
+    with open(os.path.join(root, "Users", "alice", "new.doc"), "w") as f:
+        f.write("new")
+    os.remove(os.path.join(root, "Windows", "System32", "cmd.exe"))
+    os.rmdir(os.path.join(root, "Windows", "System32"))
+
+    with volume.file_index(db_path, "a.E01") as index:
+        # two directories changed: Users gained alice and Windows lost System32; alice is new
+        assert index.refresh() == 3
+        assert sorted(index.walk()) == sorted(volume.walk())
+        assert index.refresh() == 0
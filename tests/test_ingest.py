@@ -0,0 +1,88 @@
+import threading
+
+import thumbtack_client
+from thumbtack_client.FakeThumbtackServer import FakeThumbtackServer
+from thumbtack_client.IngestionScheduler import IngestionScheduler, smallest_first
+from thumbtack_client.Metrics import Metrics
+
+SIZES = {"images/c.E01": 30, "images/a.E01": 10, "images/b.E01": 20}
+
+
+def by_size(image):
+    return SIZES[image["relative_path"]]
+
+
+def test_ingests_smallest_first_and_unmounts():
+    with FakeThumbtackServer(images=["/images/c.E01", "/images/a.E01", "/images/b.E01"]) as server:
+        client = thumbtack_client.ThumbtackClient(server.url)
+        processed = []
+        metrics = Metrics()
+        scheduler = IngestionScheduler(client, lambda disk: processed.append(disk.name), concurrency=1, workers=1,
+                                       max_mounted=1, priority=by_size, metrics=metrics)
+        added, removed = scheduler.poll()
+        assert sorted(added) == sorted(SIZES) and removed == []
+        assert scheduler.wait_idle(timeout=5)
+        scheduler.stop()
+
+        assert processed == ["a.E01", "b.E01", "c.E01"]
+        assert server.mounts == {}
+        assert scheduler.processed == 3 and scheduler.failed == 0 and scheduler.mounts == 3
+        assert metrics.time_to_mount.count == 3 and metrics.queue_depth == 0
+        assert "thumbtack_client_time_to_mount_seconds_count 3" in metrics.to_prometheus()
+
+
+def test_slow_processing_holds_back_mounts():
+    images = [f"/images/{i}.E01" for i in range(5)]
+    with FakeThumbtackServer(images=images) as server:
+        client = thumbtack_client.ThumbtackClient(server.url)
+        release = threading.Event()
+        scheduler = IngestionScheduler(client, lambda disk: release.wait(5), concurrency=4, workers=1, max_mounted=2)
+        scheduler.poll()
+        assert not scheduler.wait_idle(timeout=0.3)
+
+        assert len(server.mounts) == 2
+        assert scheduler.in_flight == 2 and scheduler.queue_depth == 3
+        release.set()
+        assert scheduler.wait_idle(timeout=5)
+        scheduler.stop()
+        assert scheduler.processed == 5 and server.mounts == {}
+
+
+def test_polls_pick_up_added_and_removed_images(thumbtack_server):
+    client = thumbtack_client.ThumbtackClient(thumbtack_server.url, cache_ttl=60)
+    release = threading.Event()
+    scheduler = IngestionScheduler(client, lambda disk: release.wait(5), workers=1, max_mounted=1,
+                                   skip_existing=True)
+    assert scheduler.poll() == (["images/a.E01", "images/b.E01"], [])
+    assert scheduler.discovered == 0 and scheduler.in_flight == 0
+
+    thumbtack_server.images += ["/images/c.E01", "/images/d.E01"]
+    assert scheduler.poll() == (["images/c.E01", "images/d.E01"], [])
+    assert scheduler.in_flight == 1 and scheduler.queue_depth == 1
+
+    # d.E01 is still queued behind c.E01, so it is dropped without being mounted
+    thumbtack_server.images.remove("/images/d.E01")
+    assert scheduler.poll() == ([], ["images/d.E01"])
+    release.set()
+    assert scheduler.wait_idle(timeout=5)
+    scheduler.stop()
+    assert scheduler.dropped == 1 and scheduler.processed == 1
+    assert not any(path == "/mounts/images/d.E01" for _, path, _ in thumbtack_server.requests)
+
+
+def test_failed_processing_is_counted_and_unmounted(thumbtack_server):
+    def process(disk):
+        raise RuntimeError("scanner crashed")
+
+    client = thumbtack_client.ThumbtackClient(thumbtack_server.url)
+    with IngestionScheduler(client, process, poll_interval=60) as scheduler:
+        assert scheduler.wait_idle(timeout=5)
+        assert scheduler.failed == 2 and scheduler.processed == 0
+    assert thumbtack_server.mounts == {}
+
+
+def test_smallest_first_uses_reported_or_file_size(tmp_path):
+    (tmp_path / "small.E01").write_bytes(b"\0" * 10)
+    assert smallest_first({"size": 5}) == (0, 5)
+    assert smallest_first({"full_path": str(tmp_path / "small.E01")}) == (0, 10)
+    assert smallest_first({"full_path": str(tmp_path / "missing.E01")}) > (0, 1 << 60)
@@ -0,0 +1,60 @@
+import threading
+import time
+
+import thumbtack_client
+from thumbtack_client.MountLeaseCache import MountLeaseCache
+
+
+def mount_count(server, image_path):
+    return sum(1 for method, path, _ in server.requests if method == "PUT" and path == "/mounts" + image_path)
+
+
+def test_lease_keeps_image_mounted_between_jobs(thumbtack_server):
+    client = thumbtack_client.ThumbtackClient(thumbtack_server.url)
+    for _ in range(3):
+        with client.lease("/images/a.E01") as disk:
+            assert disk.name == "a.E01"
+
+    assert mount_count(thumbtack_server, "/images/a.E01") == 1
+    assert "/images/a.E01" in thumbtack_server.mounts
+    # idle images are reaped without further calls
+    assert client.lease_cache._reaper.is_alive()
+    client.lease_cache.close()
+    assert thumbtack_server.mounts == {}
+
+
+def test_lease_coalesces_concurrent_mounts(thumbtack_server):
+    client = thumbtack_client.ThumbtackClient(thumbtack_server.url)
+    cache = MountLeaseCache(client)
+    disks = []
+
+    def job():
+        with cache.lease("/images/a.E01") as disk:
+            disks.append(disk)
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=job) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(disks) == 8 and all(d is disks[0] for d in disks)
+    assert mount_count(thumbtack_server, "/images/a.E01") == 1
+
+
+def test_lease_eviction(thumbtack_server):
+    client = thumbtack_client.ThumbtackClient(thumbtack_server.url)
+    cache = MountLeaseCache(client, idle_ttl=None, max_devices=1)
+
+    with cache.lease("/images/a.E01"):
+        with cache.lease("/images/b.E01"):
+            # both leased, so neither can be evicted
+            assert sorted(thumbtack_server.mounts) == ["/images/a.E01", "/images/b.E01"]
+        # b is idle and over the device limit
+        assert list(thumbtack_server.mounts) == ["/images/a.E01"]
+    assert cache.mounted == ["/images/a.E01"]
+
+    cache.idle_ttl = 0
+    assert cache.evict_idle() == ["/images/a.E01"]
+    assert thumbtack_server.mounts == {}
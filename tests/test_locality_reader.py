@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+from thumbtack_client.LocalityReader import DEFAULT_MAX_FILE_SIZE, ORDERS
+
+
+def contents(volume):
+    result = {}
+    for full_path, path_within_volume in volume.safe_walk():
+        with open(full_path, "rb") as f:
+            result[path_within_volume] = f.read()
+    return result
+
+
+@pytest.mark.parametrize("order", ORDERS)
+def test_read_files_in_any_order(volume, order):
+    reader = volume.read_files(order=order, batch_size=2, readahead=1)
+    data = {p: bytes(view) for p, view in reader}
+    assert data == contents(volume)
+    assert (reader.files, reader.bytes, reader.errors) == (4, 217, 0)
+    assert reader.order_used in ORDERS
+
+
+def test_read_files_by_inode(volume):
+    reader = volume.read_files(order="inode")
+    inodes = [os.stat(os.path.join(volume.mountpoint, p)).st_ino for p, _ in reader]
+    assert inodes == sorted(inodes)
+
+
+def test_read_files_skips_large_files(volume):
+    reader = volume.read_files(max_file_size=10, readahead=0)
+    assert sorted(p for p, _ in reader) == sorted([
+        "pagefile.sys", os.path.join("Windows", "notepad.exe"), os.path.join("Users", "bob", "notes.txt"),
+    ])
+    assert reader.skipped_large == 1
+    assert volume.read_files().max_file_size == DEFAULT_MAX_FILE_SIZE
+    assert volume.read_files(max_file_size=None).max_file_size is None
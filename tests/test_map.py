@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+from thumbtack_client.MountedDiskImage import MountedDiskImage
+
+
+def size_of(path):
+    if path.endswith("notes.txt"):
+        raise ValueError("cannot parse notes")
+    return os.path.getsize(path)
+
+
+EXPECTED_SIZES = {
+    "pagefile.sys": 10,
+    os.path.join("Windows", "notepad.exe"): 2,
+    os.path.join("Windows", "System32", "cmd.exe"): 200,
+}
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_volume_map_captures_errors(volume, workers):
+    mapper = volume.map(size_of, workers=workers, chunksize=1)
+    results = {r.path_within_volume: r for r in mapper}
+    assert {p: r.result for p, r in results.items() if r.error is None} == EXPECTED_SIZES
+
+    failed = results[os.path.join("Users", "bob", "notes.txt")]
+    assert isinstance(failed.error, ValueError)
+    assert "cannot parse notes" in failed.error.traceback
+    assert (mapper.files, mapper.errors) == (4, 1)
+
+
+def test_volume_map_ordered(volume):
+    walk_order = [p for _, p in volume.safe_scandir_walk()]
+    results = list(volume.map(size_of, workers=2, chunksize=1, ordered=True))
+    assert [r.path_within_volume for r in results] == walk_order
+
+
+def test_disk_image_map(volume):
+    disk = MountedDiskImage({"mountpoint": None, "name": "a.E01", "volumes": [], "paths": None})
+    disk.volumes = [volume]
+    results = list(disk.map(size_of, workers=0))
+    assert {r.volume_index for r in results} == {2}
+    assert len(results) == 4
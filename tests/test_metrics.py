@@ -0,0 +1,51 @@
+import logging
+import os
+
+import responses
+
+import thumbtack_client
+from thumbtack_client.Metrics import Metrics
+from thumbtack_client.MountedDiskImageVolume import MountedDiskImageVolume
+
+
+@responses.activate
+def test_request_metrics_and_hooks():
+    metrics = Metrics()
+    events = []
+    metrics.add_hook(lambda event, data: events.append((event, data["endpoint"], data["status"])))
+    client = thumbtack_client.ThumbtackClient(metrics=metrics)
+    responses.add(responses.PUT, 'http://127.0.0.1:8208/mounts/images/a.E01', '{}')
+    responses.add(responses.GET, 'http://127.0.0.1:8208/mounts/', '[]')
+
+    client.mount_image("/images/a.E01")
+    client.list_mounted_images()
+    client.list_mounted_images()
+
+    assert metrics.statuses[("GET", "/mounts/", 200)] == 2
+    assert metrics.requests[("PUT", "/mounts/{image_path}")].count == 1
+    assert events[0] == ("request", "/mounts/{image_path}", 200)
+    text = metrics.to_prometheus()
+    assert 'thumbtack_client_requests_total{method="GET",endpoint="/mounts/",status="200"} 2' in text
+    assert 'thumbtack_client_request_seconds_count{method="PUT",endpoint="/mounts/{image_path}"} 1' in text
+
+
+def test_walk_metrics_and_sampled_skip_logging(tmp_path, caplog):
+    for i in range(25):
+        os.symlink(str(tmp_path / "missing"), str(tmp_path / f"broken{i}"))
+    (tmp_path / "a.txt").write_bytes(b"x" * 100)
+    volume = MountedDiskImageVolume({
+        "fsdescription": None, "fstype": None, "index": 1, "label": None,
+        "mountpoint": str(tmp_path), "offset": 0, "size": 0,
+    })
+
+    metrics = Metrics()
+    with caplog.at_level(logging.INFO, logger="thumbtack_client"):
+        assert len(list(volume.safe_scandir_walk(metrics=metrics))) == 1
+        assert len(list(volume.safe_walk(metrics=metrics))) == 1
+
+    assert metrics.walk_files == 2
+    assert metrics.walk_bytes == 200
+    assert metrics.walk_skips == {"broken_symlink": 50}
+    # ten sampled lines and a summary per walk
+    assert len(caplog.records) == 22
+    assert "25 broken_symlink" in caplog.records[-1].getMessage()
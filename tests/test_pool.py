@@ -0,0 +1,86 @@
+import pytest
+
+import thumbtack_client
+from thumbtack_client.FakeThumbtackServer import FakeThumbtackServer
+from thumbtack_client.ThumbtackClientPool import ThumbtackClientPool, _contains
+from thumbtack_client.ThumbtackServerUnavailableException import ThumbtackServerUnavailableException
+
+
+@pytest.fixture
+def servers():
+    servers = [FakeThumbtackServer(), FakeThumbtackServer()]
+    for server in servers:
+        server.images.append("/images/c.E01")
+        server.start()
+    yield servers
+    for server in servers:
+        server.stop()
+
+
+def test_pool_least_loaded_placement_and_routing(servers):
+    pool = ThumbtackClientPool([s.url for s in servers])
+    for image in ["/images/a.E01", "/images/b.E01", "/images/c.E01"]:
+        pool.mount_image(image)
+
+    assert sorted(len(s.mounts) for s in servers) == [1, 2]
+    # already mounted images stay where they are
+    owner = pool.owner_of("/images/a.E01")
+    pool.mount_image("/images/a.E01")
+    assert pool.owner_of("/images/a.E01") == owner
+
+    # a new pool has to ask the servers who owns the mount
+    ThumbtackClientPool([s.url for s in servers]).unmount_image("/images/a.E01")
+    assert sum(len(s.mounts) for s in servers) == 2
+
+
+def test_pool_lists_mounts_once_per_refresh_interval(servers):
+    pool = ThumbtackClientPool([s.url for s in servers], refresh_interval=60)
+    for image in ["/images/a.E01", "/images/b.E01", "/images/c.E01"]:
+        pool.mount_image(image)
+
+    # the mounts made through the pool are counted without listing the servers again
+    assert sorted(len(s.mounts) for s in servers) == [1, 2]
+    assert [sum(1 for method, path, _ in s.requests if path == "/mounts/") for s in servers] == [1, 1]
+
+
+def test_pool_skips_server_that_fails_to_list_mounts(servers):
+    class BrokenClient(thumbtack_client.ThumbtackClient):
+        def list_mounted_images(self):
+            raise thumbtack_client.ThumbtackClientException("500 Internal Server Error")
+
+    pool = ThumbtackClientPool([BrokenClient(servers[0].url), servers[1].url])
+    for image in ["/images/a.E01", "/images/b.E01"]:
+        pool.mount_image(image)
+        assert pool.owner_of(image) == servers[1].url
+    assert servers[0].mounts == {}
+
+
+def test_pool_consistent_hash_is_stable(servers):
+    pool = ThumbtackClientPool([s.url for s in servers], policy="consistent_hash")
+    owners = {}
+    for image in ["/images/a.E01", "/images/b.E01", "/images/c.E01"]:
+        pool.mount_image(image)
+        owners[image] = pool.owner_of(image)
+    pool.unmount_image("/images/a.E01")
+
+    again = ThumbtackClientPool([s.url for s in reversed(servers)], policy="consistent_hash")
+    for image, owner in owners.items():
+        again.mount_image(image)
+        assert again.owner_of(image) == owner
+
+
+def test_pool_fails_over_to_reachable_server(servers):
+    pool = ThumbtackClientPool(["http://127.0.0.1:1", servers[0].url], policy="consistent_hash")
+    for image in ["/images/a.E01", "/images/b.E01", "/images/c.E01"]:
+        pool.mount_image(image)
+        assert pool.owner_of(image) == servers[0].url
+
+    with pytest.raises(ThumbtackServerUnavailableException):
+        ThumbtackClientPool(["http://127.0.0.1:1"]).mount_image("/images/a.E01")
+
+
+def test_contains_matches_documented_fields():
+    mounts = [{"mountpoint": "/tmp/thumbtack/a.E01", "name": "a.E01", "volumes": [], "paths": None}]
+    assert _contains(mounts, "/images/a.E01")
+    assert _contains(mounts, "images/a.E01")
+    assert not _contains(mounts, "/images/b.E01")
@@ -0,0 +1,107 @@
+import os
+import shutil
+
+from thumbtack_client.ResultCache import ResultCache
+
+CALLS = []
+
+
+def count_mz(path):
+    CALLS.append(path)
+    with open(path, "rb") as f:
+        return f.read().count(b"MZ")
+
+
+def test_result_cache_skips_files_seen_on_other_volumes(volume, tmp_path_factory, make_volume):
+    db_path = str(tmp_path_factory.mktemp("cache") / "results.db")
+    copy = tmp_path_factory.mktemp("copy") / "vol"
+    shutil.copytree(volume.mountpoint, str(copy), symlinks=True, ignore=shutil.ignore_patterns("pipe"))
+    other = make_volume(copy)
+
+    del CALLS[:]
+    with ResultCache(db_path) as cache:
+        first = cache.run(count_mz, volume.safe_scandir_walk())
+        results = {p: (r, cached) for _, p, r, cached in first}
+        assert results[os.path.join("Windows", "System32", "cmd.exe")] == (100, False)
+        assert (first.hits, first.misses, first.hit_rate) == (0, 4, 0.0)
+
+    with ResultCache(db_path) as cache:
+        second = cache.run(count_mz, other.safe_scandir_walk())
+        results = {p: (r, cached) for _, p, r, cached in second}
+        assert results[os.path.join("Windows", "System32", "cmd.exe")] == (100, True)
+        assert (second.hits, second.misses, second.hit_rate) == (4, 0, 1.0)
+        assert second.bytes_skipped == 10 + 2 + 200 + 5
+    assert len(CALLS) == 4
+
+
+def test_result_cache_verifies_partial_matches(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.db"), partial_size=4)
+    a = tmp_path / "a.bin"
+    b = tmp_path / "b.bin"
+    a.write_bytes(b"HEAD" + b"\0" * 100 + b"TAIL")
+    # same size and ends, different middle
+    b.write_bytes(b"HEAD" + b"\1" * 100 + b"TAIL")
+    assert cache.fingerprint(str(a)) == cache.fingerprint(str(b))
+
+    cache.put("analytic", str(a), "a")
+    assert cache.get("analytic", str(a)) == (True, "a")
+    assert cache.get("analytic", str(b)) == (False, None)
+    assert cache.get("other analytic", str(a)) == (False, None)
+
+    cache.flush()
+    unverified = ResultCache(str(tmp_path / "results.db"), partial_size=4, verify=False)
+    assert unverified.get("analytic", str(b)) == (True, "a")
+    unverified.close()
+    cache.close()
+
+
+def test_result_cache_evicts_least_recently_used(tmp_path):
+    paths = []
+    for i in range(10):
+        path = tmp_path / f"f{i}"
+        path.write_bytes(bytes([i]) * 10)
+        paths.append(str(path))
+
+    with ResultCache(str(tmp_path / "results.db"), max_bytes=2000) as cache:
+        for path in paths:
+            cache.put("analytic", path, "x" * 500)
+            cache.flush()
+        assert cache.get("analytic", paths[-1])[0]
+        assert not cache.get("analytic", paths[0])[0]
+        assert cache._stored_bytes <= 2000
+
+
+def test_result_cache_counts_every_full_hash(tmp_path):
+    files = []
+    for name in ("a.bin", "b.bin"):
+        path = tmp_path / name
+        path.write_bytes(name.encode() * 100)
+        files.append((str(path), name))
+
+    with ResultCache(str(tmp_path / "results.db"), partial_size=4) as cache:
+        # new results are keyed by a full hash, and hits are verified with one
+        first = cache.run(len, files, analytic="len")
+        assert [r for _, _, r, _ in first] == [len(files[0][0]), len(files[1][0])]
+        assert (first.misses, first.full_hashes) == (2, 2)
+        second = cache.run(len, files, analytic="len")
+        list(second)
+        assert (second.hits, second.full_hashes) == (2, 2)
+        assert cache.full_hashes == 4
+
+
+def test_result_cache_shared_between_connections(tmp_path):
+    db_path = str(tmp_path / "results.db")
+    a_file = tmp_path / "a.bin"
+    b_file = tmp_path / "b.bin"
+    a_file.write_bytes(b"a" * 10)
+    b_file.write_bytes(b"b" * 10)
+
+    with ResultCache(db_path, timeout=1) as first, ResultCache(db_path, timeout=1) as second:
+        first.put("analytic", str(a_file), "a")
+        # a hit only records its last-used time in memory until the next flush
+        assert first.get("analytic", str(a_file)) == (True, "a")
+        second.put("analytic", str(b_file), "b")
+        second.flush()
+        assert second.get("analytic", str(a_file)) == (True, "a")
+        assert first.get("analytic", str(b_file)) == (True, "b")
+        first.flush()
@@ -0,0 +1,89 @@
+import json
+import os
+
+import pytest
+
+from thumbtack_client.ResumableWalker import FILES, ResumableWalker, WorkUnit, merge_units, plan_units, walk_key
+
+
+@pytest.fixture
+def tree(volume):
+    root = volume.mountpoint
+    for d in ["a", os.path.join("a", "x"), "b", os.path.join("b", "y", "z")]:
+        os.makedirs(os.path.join(root, d), exist_ok=True)
+    for f in ["a/1", "a/2", "a/x/3", "b/4", "b/y/z/5", "b/y/z/6", "top"]:
+        with open(os.path.join(root, f), "w") as fh:
+            fh.write(f)
+    return volume
+
+
+def test_resumable_walk_order_and_resume(tree):
+    full = list(tree.resumable_walk())
+    paths = [p for _, p in full]
+    assert sorted(full) == sorted(tree.safe_walk())
+    assert paths == sorted(paths, key=walk_key)
+    # files of a directory come before its subdirectories
+    assert paths.index("pagefile.sys") < paths.index(os.path.join("Users", "bob", "notes.txt"))
+
+    for stop in range(len(full)):
+        walker = tree.resumable_walk()
+        it = iter(walker)
+        head = [next(it) for _ in range(stop + 1)]
+        # the file being processed when the walk stopped is not done yet
+        cursor = walker.cursor
+        assert (cursor is None) == (stop == 0)
+        rest = list(tree.resumable_walk(cursor=cursor))
+        assert head[:stop] + rest == full
+
+
+def test_resumable_walk_checkpoints(tree, tmp_path_factory):
+    checkpoint = str(tmp_path_factory.mktemp("jobs") / "walk.json")
+    full = list(tree.resumable_walk())
+
+    it = iter(tree.resumable_walk(checkpoint_path=checkpoint, checkpoint_every=1))
+    done = [next(it) for _ in range(4)]
+    del it
+
+    resumed = tree.resumable_walk(checkpoint_path=checkpoint)
+    assert done[:3] + list(resumed) == full
+    assert resumed.done
+    assert list(tree.resumable_walk(checkpoint_path=checkpoint)) == []
+
+
+def test_work_units_merge_without_duplicates_or_gaps(tree):
+    full = list(tree.resumable_walk())
+    units = tree.plan_walk(units=6)
+    assert len(units) >= 6
+    units = [WorkUnit(*u) for u in json.loads(json.dumps(units))]
+
+    outputs = {unit: list(tree.resumable_walk(unit=unit)) for unit in reversed(units)}
+    assert list(merge_units(units, outputs)) == full
+
+    with pytest.raises(ValueError, match="No output"):
+        list(merge_units(units, dict(list(outputs.items())[1:])))
+    duplicated = dict(outputs)
+    busy = next(u for u in units if outputs[u])
+    duplicated[busy] = outputs[busy] + outputs[busy][-1:]
+    with pytest.raises(ValueError, match="yielded twice"):
+        list(merge_units(units, duplicated))
+
+
+def test_work_units_split_large_directories(tmp_path):
+    # one directory holds most of the files, like Windows/WinSxS
+    for d, n in [("big", 40), ("small", 3), (os.path.join("small", "deep"), 2)]:
+        os.makedirs(tmp_path / d)
+        for i in range(n):
+            (tmp_path / d / f"{i:02}").write_text(d)
+    (tmp_path / "top").write_text("top")
+    root = str(tmp_path)
+    full = list(ResumableWalker(root))
+
+    units = plan_units(root, count=4)
+    units = [WorkUnit(*u) for u in json.loads(json.dumps(units))]
+    outputs = {unit: list(ResumableWalker(root, unit=unit)) for unit in units}
+    assert max(len(items) for items in outputs.values()) <= -(-len(full) // 4)
+    assert sum(1 for u in units if u.kind == FILES and u.path == "big") > 1
+    assert list(merge_units(units, outputs)) == full
+
+    with pytest.raises(ValueError, match="does not belong"):
+        list(merge_units(units, {u: outputs[units[-1]] if u == units[0] else [] for u in units}))
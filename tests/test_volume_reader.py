@@ -0,0 +1,78 @@
+import mmap
+
+import pytest
+
+from thumbtack_client.MountedDiskImage import MountedDiskImage
+from thumbtack_client.VolumeReader import VolumeReader
+
+# the volume starts off a page boundary, to exercise the mmap offset alignment
+OFFSET = mmap.ALLOCATIONGRANULARITY + 512
+SIZE = 100000
+
+
+@pytest.fixture
+def device(tmp_path):
+    data = bytes(range(256)) * (SIZE // 256 + 1)
+    path = tmp_path / "nbd0"
+    path.write_bytes(b"\xff" * OFFSET + data[:SIZE] + b"\xee" * 4096)
+    return str(path), data[:SIZE]
+
+
+@pytest.mark.parametrize("use_mmap", [True, False])
+def test_volume_reader_reads_within_bounds(device, use_mmap):
+    path, data = device
+    with VolumeReader(path, OFFSET, SIZE, use_mmap=use_mmap) as reader:
+        assert reader.mmapped is use_mmap
+        chunk = reader.read(1000, 300)
+        assert isinstance(chunk, memoryview)
+        assert chunk == data[1000:1300]
+        # reads are cut off at the end of the volume, not the end of the device
+        assert reader.read(SIZE - 10, 100) == data[-10:]
+        assert reader.read(SIZE, 10) == b""
+        with pytest.raises(ValueError):
+            reader.read(-1, 10)
+        with pytest.raises(ValueError):
+            reader.read(SIZE + 1, 10)
+
+        buf = bytearray(50)
+        assert reader.readinto(SIZE - 20, buf) == 20
+        assert buf[:20] == data[-20:]
+        del chunk
+
+
+@pytest.mark.parametrize("use_mmap", [True, False])
+def test_volume_reader_chunks_overlap(device, use_mmap):
+    path, data = device
+    with VolumeReader(path, OFFSET, SIZE, use_mmap=use_mmap) as reader:
+        covered = bytearray()
+        previous_end = 0
+        for pos, chunk in reader.chunks(chunk_size=4096, overlap=16):
+            assert chunk == data[pos:pos + len(chunk)]
+            assert pos == max(0, previous_end - 16)
+            covered += chunk[previous_end - pos:]
+            previous_end = pos + len(chunk)
+        assert covered == data
+
+        chunks = [(pos, bytes(chunk)) for pos, chunk in reader.chunks(chunk_size=1000, start=500, end=2600)]
+        assert [(pos, len(chunk)) for pos, chunk in chunks] == [(500, 1000), (1500, 1000), (2500, 100)]
+
+
+def test_volume_reader_rejects_volume_past_device_end(device):
+    path, _ = device
+    with pytest.raises(ValueError, match="extends past the end"):
+        VolumeReader(path, OFFSET, SIZE + 8192)
+
+
+def test_mounted_disk_image_volume_reader(device):
+    path, data = device
+    disk = MountedDiskImage({
+        "mountpoint": "/tmp/thumbtack/a.E01",
+        "name": "a.E01",
+        "paths": {"nbd": path},
+        "volumes": [{
+            "fsdescription": None, "fstype": "ntfs", "index": 2, "label": None,
+            "mountpoint": "/tmp/thumbtack/a.E01/vol2", "offset": OFFSET, "size": SIZE,
+        }],
+    })
+    with disk.volume_reader(disk.volumes[0]) as reader:
+        assert bytes(reader.read(0, 4)) == data[:4]
@@ -0,0 +1,110 @@
+import hashlib
+import os
+
+import pytest
+
+from thumbtack_client.Metrics import Metrics
+from thumbtack_client.MountedDiskImage import MountedDiskImage
+from thumbtack_client.ParallelWalker import ParallelWalker
+from thumbtack_client.WalkFilter import WalkFilter
+
+
+def test_scandir_walk_matches_walk(volume):
+    assert list(volume.scandir_walk()) == list(volume.walk())
+
+
+def test_safe_scandir_walk_matches_safe_walk(volume):
+    expected = list(volume.safe_walk())
+    assert list(volume.safe_scandir_walk()) == expected
+    assert sorted(p for _, p in expected) == [
+        os.path.join("Users", "bob", "notes.txt"),
+        os.path.join("Windows", "System32", "cmd.exe"),
+        os.path.join("Windows", "notepad.exe"),
+        "pagefile.sys",
+    ]
+
+
+def test_scandir_walk_file_filter(volume):
+    found = [p for _, p in volume.safe_scandir_walk(lambda x: x.endswith(".exe"))]
+    assert sorted(found) == [os.path.join("Windows", "System32", "cmd.exe"), os.path.join("Windows", "notepad.exe")]
+
+
+def test_scandir_walk_file_filter_errors_propagate(volume):
+    def file_filter(path):
+        return os.path.getsize(path) >= 0
+
+    with pytest.raises(FileNotFoundError):
+        list(volume.walk(file_filter))
+    with pytest.raises(FileNotFoundError):
+        list(volume.scandir_walk(file_filter))
+
+
+def test_walk_filter_prunes_excluded_dirs(volume, monkeypatch):
+    listed = []
+    real_scandir = os.scandir
+    monkeypatch.setattr(os, "scandir", lambda p: listed.append(p) or real_scandir(p))
+
+    walk_filter = WalkFilter(exclude_dirs=["windows/system32"], extensions=["EXE"])
+    assert [p for _, p in volume.safe_walk(walk_filter)] == [os.path.join("Windows", "notepad.exe")]
+    assert not any(p.endswith("System32") for p in listed)
+
+
+def test_walk_filter_size_and_predicate(volume):
+    walk_filter = WalkFilter(exclude_dirs=["Users"], min_size=3, predicate=lambda x: "page" not in x)
+    assert [p for _, p in volume.walk(walk_filter)] == [os.path.join("Windows", "System32", "cmd.exe")]
+
+
+def make_image(name, *volumes):
+    image = MountedDiskImage({"mountpoint": None, "name": name, "volumes": [], "paths": None})
+    image.volumes = image.mounted_volumes = list(volumes)
+    return image
+
+
+def test_parallel_walker_tags_results(volume, tmp_path_factory, make_volume):
+    other = make_volume(tmp_path_factory.mktemp("other"))
+    other.index = 3
+    with open(os.path.join(other.mountpoint, "boot.ini"), "w") as f:
+        f.write("[boot loader]")
+
+    metrics = Metrics()
+    walker = ParallelWalker([make_image("a.E01", volume), make_image("b.E01", other)], workers=4, safe=True, metrics=metrics)
+    results = list(walker)
+    assert metrics.walk_files == len(results) == 5
+    assert metrics.walk_skips == {"broken_symlink": 1, "not_regular": 1}
+    expected = [("a.E01", 2, p) for _, p in volume.safe_walk()] + [("b.E01", 3, "boot.ini")]
+    assert sorted((r.image_name, r.volume_index, r.path_within_volume) for r in results) == sorted(expected)
+
+
+def test_parallel_walker_stops_when_abandoned(tmp_path, make_volume):
+    for d in range(20):
+        (tmp_path / str(d)).mkdir()
+        for f in range(50):
+            (tmp_path / str(d) / str(f)).touch()
+
+    walker = ParallelWalker(make_image("a.E01", make_volume(tmp_path)), workers=4, queue_size=1, batch_size=1)
+    results = walker.walk()
+    next(results)
+    results.close()
+    assert walker.cancelled
+    assert not any(t.is_alive() for t in walker._threads)
+
+
+def test_parallel_walker_reraises_worker_errors(volume):
+    def explode(path):
+        raise ValueError(path)
+
+    with pytest.raises(ValueError):
+        list(ParallelWalker(make_image("a.E01", volume), workers=2, file_filter=explode))
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_hash_files(volume, workers):
+    hasher = volume.hash_files(workers=workers, buffer_size=64)
+    results = {path: (size, digests) for path, size, digests in hasher}
+
+    size, digests = results[os.path.join("Windows", "System32", "cmd.exe")]
+    assert size == 200
+    assert digests["md5"] == hashlib.md5(b"MZ" * 100).hexdigest()
+    assert digests["sha256"] == hashlib.sha256(b"MZ" * 100).hexdigest()
+    assert len(results) == 4
+    assert hasher.files == 4 and hasher.bytes == 217